@@ -6,11 +6,12 @@ from flask_jwt_extended import JWTManager
 
 
 from src.config import settings
-from src.extensions import db, migrate
+from src.extensions import db, migrate, sock
 
 load_dotenv()
 
-def create_app():
+def create_app(*, start_workers=None):
+    """start_workers: run background jobs in this process (default: settings.MOOD_ROLLUP_ENABLED)."""
     app = Flask(__name__)
 
     allowed_origins = ["http://localhost:3000", "http://127.0.0.1:3000","https://web.postman.com"]
@@ -35,10 +36,17 @@ def create_app():
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=30)
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=7)
 
+    # WebSocket (flask-sock): keepalive pings; cap frames like HTTP uploads
+    app.config["SOCK_SERVER_OPTIONS"] = {
+        "ping_interval": 25,
+        "max_message_size": settings.FER_MAX_IMAGE_BYTES,
+    }
+
     # Init extensions
     db.init_app(app)
     JWTManager(app)
     migrate.init_app(app, db)
+    sock.init_app(app)
     
 
     # Import models so Alembic / create_all can discover them
@@ -47,6 +55,8 @@ def create_app():
         from src.models.users import Users 
         from src.models.messages import Messages 
         from src.models.active_sessions import ActiveSessions
+        from src.models.mood import MoodEvents, MoodRollups, MoodRollupState
+        from src.models.ingest_jobs import IngestJobs
         # …or, if you prefer to use the package exports:
         # from src.models import Users, UserQuery, Summary  # noqa: F401
 
@@ -55,14 +65,24 @@ def create_app():
     from src.routes.auth import auth_bp
     from src.routes.chat import chat_bp
     from src.routes.fer import fer_bp
+    from src.routes.admin import admin_bp
+    from src.routes.mood import mood_bp
     app.register_blueprint(hello_bp, url_prefix="/api")
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(chat_bp, url_prefix="/api/chat")
     app.register_blueprint(fer_bp, url_prefix="/api/fer") 
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
+    app.register_blueprint(mood_bp, url_prefix="/api/mood")
+
+    # Background mood rollups (hourly/daily trend buckets): server processes only,
+    # never scripts (init_db.py, ...) that just need the app context
+    if settings.MOOD_ROLLUP_ENABLED if start_workers is None else start_workers:
+        from src.controllers.mood_service import start_rollup_worker
+        start_rollup_worker(app)
 
 
     return app
 
 if __name__ == "__main__":
-    app = create_app()
+    app = create_app(start_workers=True)
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,203 @@
+# scripts/bench_fer_stages.py
+"""
+Per-stage timings of the FER pipeline, as a regression baseline for every FER
+optimization. Runs offline on the synthetic faces from fer_synthetic.py; pass
+--images to add rows for recorded captures (any JPEG/PNG files).
+
+Stages, per image size:
+    b64_decode        _b64_to_bytes (data URL -> bytes)
+    exif              _exif_orientation (header only)
+    decode_gray       _decode_image_bytes (OpenCV grayscale decode + orientation)
+    detect_full       _detect_largest_face on the whole frame
+    detect_roi        _detect_largest_face in the padded ROI around the last box
+    crop              _crop_face (crop + resize to the 48x48 model input)
+    dhash             perceptual hash used by the per-session result cache
+    legacy_*          the pre-refactor path (PIL RGB decode + exif_transpose,
+                      RGB->BGR, BGR->gray, full-resolution detect, PIL
+                      resize/grayscale/to-tensor transform) for comparison
+and the backend forward pass for every (--batches x --threads) combination.
+
+Run from apps/server (the model path is relative):
+    python scripts/bench_fer_stages.py --iters 20 --out bench_stages.json
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Time the stages directly: no micro-batching wait, no worker processes.
+os.environ.setdefault("FER_BATCH_MAX_WAIT_MS", "0")
+os.environ["FER_WORKERS"] = "0"
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image, ImageOps  # noqa: E402
+
+from fer_synthetic import RESOLUTIONS, encode_jpeg, synthetic_frame, to_data_uri  # noqa: E402
+from src.config import settings  # noqa: E402
+from src.controllers import fer_service as fs  # noqa: E402
+from src.controllers.fer_backends import load_backend, resolve_backend  # noqa: E402
+from src.controllers.fer_cache import dhash  # noqa: E402
+from src.controllers.fer_tracker import FaceTracker  # noqa: E402
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _summary(samples_ms):
+    s = sorted(samples_ms)
+    return {
+        "mean_ms": round(statistics.fmean(s), 4),
+        "p50_ms": round(s[len(s) // 2], 4),
+        "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))], 4),
+    }
+
+
+def _time(fn, iters, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return _summary(samples)
+
+
+# -------------------------------------------------------------
+# Pre-refactor pipeline, reproduced for comparison
+# -------------------------------------------------------------
+def _legacy_decode(img_bytes: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+    return ImageOps.exif_transpose(img)
+
+
+def _legacy_detect(bgr: np.ndarray):
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return fs._face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+
+
+def _legacy_transform(pil_rgb: Image.Image, box) -> np.ndarray:
+    x, y, w, h = box
+    face = pil_rgb.crop((x, y, x + w, y + h)).resize((48, 48), Image.BILINEAR).convert("L")
+    return (np.asarray(face, dtype=np.float32) / 255.0)[None, None, :, :]
+
+
+# -------------------------------------------------------------
+# Stages
+# -------------------------------------------------------------
+def bench_image(name: str, jpeg: bytes, iters: int) -> dict:
+    data_uri = to_data_uri(jpeg)
+    gray = fs._decode_image_bytes(jpeg)
+    h, w = gray.shape[:2]
+    box = fs._detect_largest_face(gray)
+
+    stages = {
+        "b64_decode": _time(lambda: fs._b64_to_bytes(data_uri), iters),
+        "exif": _time(lambda: fs._exif_orientation(jpeg), iters),
+        "decode_gray": _time(lambda: fs._decode_image_bytes(jpeg), iters),
+        "detect_full": _time(lambda: fs._detect_largest_face(gray), iters),
+        "dhash": _time(lambda: dhash(gray, settings.FER_CACHE_HASH_SIZE), iters),
+    }
+    if box is not None:
+        tracker = FaceTracker(ttl_s=60.0, pad=settings.FER_TRACK_PAD, max_sessions=1)
+        tracker.update("bench", gray.shape, box)
+        roi, _ = tracker.roi_for("bench", gray.shape)
+        min_face = int(box[2] * 0.5)
+        stages["detect_roi"] = _time(lambda: fs._detect_largest_face(gray, roi=roi, min_face=min_face), iters)
+        stages["crop"] = _time(lambda: fs._crop_face(gray, box), iters)
+
+    pil = _legacy_decode(jpeg)
+    rgb = np.array(pil)
+    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    stages["legacy_pil_decode"] = _time(lambda: _legacy_decode(jpeg), iters)
+    stages["legacy_rgb_to_bgr"] = _time(lambda: cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR), iters)
+    stages["legacy_detect_full"] = _time(lambda: _legacy_detect(bgr), iters)
+    if box is not None:
+        stages["legacy_transform"] = _time(lambda: _legacy_transform(pil, box), iters)
+
+    return {
+        "size": name, "width": w, "height": h, "jpeg_bytes": len(jpeg),
+        "face_found": box is not None, "stages": stages,
+    }
+
+
+def bench_forward(batches, threads, iters: int) -> list:
+    rows = []
+    crop = np.random.default_rng(0).random((1, 48, 48), dtype=np.float32)
+    for t in threads:
+        backend = load_backend(settings.FER_BACKEND, settings.FER_MODEL_PATH, t)
+        for b in batches:
+            x = np.ascontiguousarray(np.repeat(crop[None], b, axis=0))
+            timing = _time(lambda: backend.predict(x), iters, warmup=5)
+            timing["images_per_s"] = round(b / (timing["mean_ms"] / 1000.0), 1)
+            rows.append({"threads": t, "batch": b, **timing})
+            print(f"forward threads={t:<2} batch={b:<4} {timing['mean_ms']:8.3f} ms", file=sys.stderr)
+    return rows
+
+
+def _recorded(paths):
+    for root in paths:
+        files = [root] if os.path.isfile(root) else [
+            os.path.join(root, n) for n in sorted(os.listdir(root))]
+        for path in files:
+            if os.path.splitext(path)[1].lower() in IMG_EXTS:
+                with open(path, "rb") as f:
+                    yield os.path.basename(path), f.read()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=20)
+    ap.add_argument("--sizes", default=",".join(r[0] for r in RESOLUTIONS),
+                    help="comma-separated subset of: " + ",".join(r[0] for r in RESOLUTIONS))
+    ap.add_argument("--images", nargs="*", default=[], help="recorded images (files or directories)")
+    ap.add_argument("--batches", default="1,4,16,64", help="forward-pass batch sizes")
+    ap.add_argument("--threads", default="1,2,4", help="intra-op thread counts for the forward pass")
+    ap.add_argument("--out", default=None, help="write JSON results here (default: stdout)")
+    args = ap.parse_args()
+
+    wanted = set(args.sizes.split(","))
+    images = [(name, encode_jpeg(synthetic_frame(w, h)), "synthetic")
+              for name, w, h in RESOLUTIONS if name in wanted]
+    images += [(name, data, "recorded") for name, data in _recorded(args.images)]
+
+    results = []
+    for name, jpeg, source in images:
+        row = bench_image(name, jpeg, args.iters)
+        row["source"] = source
+        results.append(row)
+        st = row["stages"]
+        print(f"{name:>12}: decode {st['decode_gray']['mean_ms']:8.2f} ms | "
+              f"detect {st['detect_full']['mean_ms']:8.2f} ms | "
+              f"legacy detect {st['legacy_detect_full']['mean_ms']:8.2f} ms", file=sys.stderr)
+
+    forward = bench_forward([int(b) for b in args.batches.split(",")],
+                            [int(t) for t in args.threads.split(",")], args.iters)
+
+    report = {
+        "benchmark": "fer_stages",
+        "iters": args.iters,
+        "backend": resolve_backend(settings.FER_BACKEND, settings.FER_MODEL_PATH),
+        "model_path": settings.FER_MODEL_PATH,
+        "detect_max_side": settings.FER_DETECT_MAX_SIDE,
+        "opencv_threads": cv2.getNumThreads(),
+        "cpu_count": os.cpu_count(),
+        "images": results,
+        "forward": forward,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# scripts/bench_fer_upload.py
+"""
+Benchmark /api/fer/detect_emotion (base64-in-JSON) against
+/api/fer/detect_emotion/upload (raw image/jpeg and multipart) on synthetic frames.
+
+Run from apps/server (the model path is relative):
+    python scripts/bench_fer_upload.py --iters 30 --out bench_upload.json
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Single-client benchmark: don't let the micro-batcher's wait window skew latencies.
+os.environ.setdefault("FER_BATCH_MAX_WAIT_MS", "0")
+
+from flask import Flask  # noqa: E402
+
+from fer_synthetic import RESOLUTIONS, encode_jpeg, synthetic_frame, to_data_uri  # noqa: E402
+from src.routes.fer import fer_bp  # noqa: E402
+
+
+def _summary(samples_ms):
+    s = sorted(samples_ms)
+    return {
+        "mean_ms": round(statistics.fmean(s), 3),
+        "p50_ms": round(s[len(s) // 2], 3),
+        "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))], 3),
+    }
+
+
+def _time(fn, iters, warmup=3):
+    status = None
+    for _ in range(warmup):
+        status = fn().status_code
+    samples = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples, status
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=20)
+    ap.add_argument("--sizes", default=",".join(r[0] for r in RESOLUTIONS),
+                    help="comma-separated subset of: " + ",".join(r[0] for r in RESOLUTIONS))
+    ap.add_argument("--out", default=None, help="write JSON results here (default: stdout)")
+    args = ap.parse_args()
+
+    app = Flask(__name__)
+    app.register_blueprint(fer_bp, url_prefix="/api/fer")
+    client = app.test_client()
+
+    wanted = set(args.sizes.split(","))
+    results = []
+    for name, w, h in RESOLUTIONS:
+        if name not in wanted:
+            continue
+        jpeg = encode_jpeg(synthetic_frame(w, h))
+        body_json = json.dumps({"photo": to_data_uri(jpeg)})
+
+        variants = {
+            "json_base64": lambda: client.post(
+                "/api/fer/detect_emotion", data=body_json, content_type="application/json"),
+            "raw_jpeg": lambda: client.post(
+                "/api/fer/detect_emotion/upload", data=jpeg, content_type="image/jpeg"),
+            "multipart": lambda: client.post(
+                "/api/fer/detect_emotion/upload",
+                data={"photo": (io.BytesIO(jpeg), "frame.jpg", "image/jpeg")},
+                content_type="multipart/form-data"),
+        }
+        row = {"size": name, "width": w, "height": h,
+               "jpeg_bytes": len(jpeg), "json_bytes": len(body_json), "variants": {}}
+        for vname, fn in variants.items():
+            samples, status = _time(fn, args.iters)
+            row["variants"][vname] = {"status": status, **_summary(samples)}
+        base = row["variants"]["json_base64"]["mean_ms"]
+        row["raw_speedup_vs_json"] = round(base / row["variants"]["raw_jpeg"]["mean_ms"], 3)
+        results.append(row)
+        print(f"{name:>6}: json {base:8.2f} ms | raw {row['variants']['raw_jpeg']['mean_ms']:8.2f} ms | "
+              f"multipart {row['variants']['multipart']['mean_ms']:8.2f} ms", file=sys.stderr)
+
+    report = {"benchmark": "fer_upload", "iters": args.iters, "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
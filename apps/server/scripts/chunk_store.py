@@ -0,0 +1,71 @@
+# scripts/chunk_store.py
+"""
+Import / export / inspect the single-file KB chunk store
+(src/controllers/chunk_store.py).
+
+Run from apps/server:
+    python scripts/chunk_store.py import scripts/kb_rag/rag/chunks kb_chunks.kbs [--zstd]
+    python scripts/chunk_store.py export kb_chunks.kbs /tmp/chunks
+    python scripts/chunk_store.py stat kb_chunks.kbs
+    python scripts/chunk_store.py get kb_chunks.kbs "<doc_id>#chunk_0001"
+Then point embedding.py --store and KB_CHUNK_STORE (serving) at the file.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.controllers.chunk_store import ChunkStore, export_dir, import_dir  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("import", help="pack a chunks/<doc>/chunk_XXXX.txt tree into a store file")
+    p.add_argument("chunks_dir")
+    p.add_argument("store")
+    p.add_argument("--zstd", action="store_true", help="compress each chunk's text (needs zstandard)")
+    p = sub.add_parser("export", help="write a store back out as chunk files")
+    p.add_argument("store")
+    p.add_argument("chunks_dir")
+    p = sub.add_parser("stat", help="row count, docs, sizes")
+    p.add_argument("store")
+    p = sub.add_parser("get", help="print one chunk by id")
+    p.add_argument("store")
+    p.add_argument("chunk_id")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == "import":
+        n = import_dir(args.chunks_dir, args.store, compress=args.zstd)
+        print(f"packed {n} chunks into {args.store} ({os.path.getsize(args.store)} bytes) "
+              f"in {time.perf_counter() - t0:.2f}s")
+    elif args.cmd == "export":
+        n = export_dir(args.store, args.chunks_dir)
+        print(f"wrote {n} chunk files under {args.chunks_dir} in {time.perf_counter() - t0:.2f}s")
+    elif args.cmd == "stat":
+        with ChunkStore(args.store) as store:
+            docs = {cid.split("#", 1)[0] for cid in store.ids()}
+            print(json.dumps({
+                "chunks": len(store),
+                "docs": len(docs),
+                "compressed": store.compressed,
+                "bytes": os.path.getsize(args.store),
+                "info": store.info,
+            }, indent=2))
+    else:
+        with ChunkStore(args.store) as store:
+            rec = store.get(args.chunk_id)
+        if rec is None:
+            raise SystemExit(f"unknown chunk id: {args.chunk_id}")
+        print(json.dumps(rec["meta"], indent=2, ensure_ascii=False))
+        print()
+        print(rec["text"])
+
+
+if __name__ == "__main__":
+    main()
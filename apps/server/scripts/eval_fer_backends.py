@@ -0,0 +1,142 @@
+# scripts/eval_fer_backends.py
+"""
+Accuracy-parity and latency report for FER inference backends.
+
+The held-out set uses the ImageFolder layout of train_dataset (one sub-folder per
+class: happy/, sad/, neutral/). Labels are matched to serving class order by
+folder name. Without --holdout, synthetic faces are used and only parity with
+the reference and latency are reported.
+
+Run from apps/server:
+    python scripts/eval_fer_backends.py --holdout ../../val_dataset \
+        --artifacts emotion_cnn.pth exported/emotion_cnn.pt exported/emotion_cnn.int8.pt \
+                    exported/emotion_cnn.onnx exported/emotion_cnn.int8.onnx \
+        --out backend_report.json
+The first artifact is the parity reference.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.controllers.fer_backends import load_backend, resolve_backend  # noqa: E402
+
+CLASSES = ["happy", "sad", "neutral"]  # serving order (fer_service._classes)
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _prep(gray: np.ndarray) -> np.ndarray:
+    face = cv2.resize(gray, (48, 48), interpolation=cv2.INTER_AREA)
+    return (face.astype(np.float32) / 255.0)[None, :, :]
+
+
+def load_holdout(root: str):
+    xs, ys = [], []
+    for label, cls in enumerate(CLASSES):
+        cls_dir = os.path.join(root, cls)
+        if not os.path.isdir(cls_dir):
+            continue
+        for name in sorted(os.listdir(cls_dir)):
+            if os.path.splitext(name)[1].lower() not in IMG_EXTS:
+                continue
+            gray = cv2.imread(os.path.join(cls_dir, name), cv2.IMREAD_GRAYSCALE)
+            if gray is not None:
+                xs.append(_prep(gray))
+                ys.append(label)
+    if not xs:
+        raise SystemExit(f"No images found under {root}/{{{','.join(CLASSES)}}}")
+    return np.stack(xs), np.array(ys)
+
+
+def load_synthetic(n: int):
+    from fer_synthetic import synthetic_face
+
+    return np.stack([_prep(synthetic_face(96, seed)) for seed in range(n)]), None
+
+
+def _predict_all(backend, x: np.ndarray, batch: int = 256) -> np.ndarray:
+    return np.concatenate([backend.predict(x[i:i + batch]) for i in range(0, len(x), batch)])
+
+
+def _latency(backend, x: np.ndarray, batch: int, iters: int):
+    xb = np.ascontiguousarray(np.resize(x, (batch,) + x.shape[1:]))
+    for _ in range(5):
+        backend.predict(xb)
+    samples = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        backend.predict(xb)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "batch": batch,
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "images_per_s": round(batch / (statistics.fmean(samples) / 1000.0), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--holdout", default=None, help="ImageFolder-style held-out set")
+    ap.add_argument("--artifacts", nargs="+", default=["emotion_cnn.pth"])
+    ap.add_argument("--synthetic", type=int, default=256, help="synthetic samples when no --holdout")
+    ap.add_argument("--iters", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=1, help="intra-op threads per backend")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    x, y = load_holdout(args.holdout) if args.holdout else load_synthetic(args.synthetic)
+
+    reference = None
+    rows = []
+    for path in args.artifacts:
+        t0 = time.perf_counter()
+        backend = load_backend("auto", path, threads=args.threads)
+        load_ms = (time.perf_counter() - t0) * 1000.0
+        probs = _predict_all(backend, x)
+        if reference is None:
+            reference = probs
+
+        row = {
+            "artifact": path,
+            "backend": resolve_backend("auto", path),
+            "size_bytes": os.path.getsize(path),
+            "load_ms": round(load_ms, 2),
+            "accuracy": float((probs.argmax(1) == y).mean()) if y is not None else None,
+            "top1_agreement": float((probs.argmax(1) == reference.argmax(1)).mean()),
+            "max_abs_prob_diff": float(np.abs(probs - reference).max()),
+            "mean_abs_prob_diff": float(np.abs(probs - reference).mean()),
+            "latency": [_latency(backend, x, b, args.iters) for b in (1, 16, 64)],
+        }
+        rows.append(row)
+        acc = f"{row['accuracy']:.4f}" if row["accuracy"] is not None else "n/a"
+        print(f"{path}: acc={acc} agree={row['top1_agreement']:.4f} "
+              f"maxdiff={row['max_abs_prob_diff']:.2e} b1_p50={row['latency'][0]['p50_ms']}ms",
+              file=sys.stderr)
+
+    report = {
+        "samples": int(len(x)),
+        "labelled": y is not None,
+        "reference": args.artifacts[0],
+        "threads": args.threads,
+        "results": rows,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
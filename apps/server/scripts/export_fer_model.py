@@ -0,0 +1,93 @@
+# scripts/export_fer_model.py
+"""
+Export the TinyCNN FER weights to serving artifacts fer_service can load:
+
+    <out>/emotion_cnn.pt         TorchScript, fp32        (FER_BACKEND=torchscript)
+    <out>/emotion_cnn.int8.pt    TorchScript, dynamic int8 Linear layers
+    <out>/emotion_cnn.onnx       ONNX, fp32, dynamic batch (FER_BACKEND=onnx)
+    <out>/emotion_cnn.int8.onnx  ONNX, dynamic int8 weights (onnxruntime.quantization)
+
+Run from apps/server:
+    python scripts/export_fer_model.py --weights emotion_cnn.pth --out-dir exported
+Then check them with scripts/eval_fer_backends.py.
+"""
+import argparse
+import os
+import sys
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+import torch.nn as nn  # noqa: E402
+
+from src.controllers.fer_model import TinyCNN  # noqa: E402
+
+
+def _load(weights: str) -> TinyCNN:
+    model = TinyCNN()
+    model.load_state_dict(torch.load(weights, map_location="cpu"))
+    return model.eval()
+
+
+def export_torchscript(model: nn.Module, path: str) -> None:
+    example = torch.zeros(1, 1, 48, 48)
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, example)
+    scripted = torch.jit.freeze(scripted)
+    scripted.save(path)
+
+
+def export_torchscript_int8(model: nn.Module, path: str) -> None:
+    # Dynamic quantization covers the Linear layers (the bulk of TinyCNN's weights: fc1 is 4608x64).
+    qmodel = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        scripted = torch.jit.trace(qmodel, torch.zeros(1, 1, 48, 48))
+    scripted.save(path)
+
+
+def export_onnx(model: nn.Module, path: str, opset: int) -> None:
+    torch.onnx.export(
+        model,
+        (torch.zeros(1, 1, 48, 48),),
+        path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+
+
+def export_onnx_int8(src_path: str, path: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src_path, path, weight_type=QuantType.QInt8)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", default="emotion_cnn.pth")
+    ap.add_argument("--out-dir", default="exported")
+    ap.add_argument("--opset", type=int, default=17)
+    ap.add_argument("--skip-onnx", action="store_true", help="only write TorchScript artifacts")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    model = _load(args.weights)
+    out = lambda name: os.path.join(args.out_dir, name)  # noqa: E731
+
+    export_torchscript(model, out("emotion_cnn.pt"))
+    print(f"wrote {out('emotion_cnn.pt')}")
+    export_torchscript_int8(model, out("emotion_cnn.int8.pt"))
+    print(f"wrote {out('emotion_cnn.int8.pt')}")
+
+    if not args.skip_onnx:
+        export_onnx(model, out("emotion_cnn.onnx"), args.opset)
+        print(f"wrote {out('emotion_cnn.onnx')}")
+        export_onnx_int8(out("emotion_cnn.onnx"), out("emotion_cnn.int8.onnx"))
+        print(f"wrote {out('emotion_cnn.int8.onnx')}")
+
+
+if __name__ == "__main__":
+    main()
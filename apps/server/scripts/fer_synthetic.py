@@ -0,0 +1,67 @@
+# scripts/fer_synthetic.py
+"""
+Deterministic synthetic camera frames for FER benchmarks, so they run offline
+without shipping real photos. The drawn face is simple but is picked up by the
+Haar frontal-face cascade fer_service uses, so the full pipeline is exercised.
+"""
+import base64
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+def synthetic_face(size: int = 256, seed: int = 0) -> np.ndarray:
+    """Grayscale (size, size) uint8 cartoon face: head, brows, eyes, nose, mouth."""
+    rng = np.random.default_rng(seed)
+    s = size / 256.0
+    c = size // 2
+    img = np.full((size, size), 90, np.uint8)
+    cv2.ellipse(img, (c, c), (int(80 * s), int(105 * s)), 0, 0, 360, 200, -1)
+    for dx in (-35, 35):
+        cv2.ellipse(img, (c + int(dx * s), c - int(25 * s)), (int(20 * s), int(9 * s)), 0, 0, 360, 40, -1)
+        cv2.line(img, (c + int((dx - 22) * s), c - int(48 * s)), (c + int((dx + 22) * s), c - int(48 * s)),
+                 60, max(1, int(6 * s)))
+    cv2.ellipse(img, (c, c + int(10 * s)), (int(8 * s), int(22 * s)), 0, 0, 360, 170, -1)
+    cv2.ellipse(img, (c, c + int(50 * s)), (int(30 * s), int(10 * s)), 0, 0, 360, 60, -1)
+    img = cv2.GaussianBlur(img, (0, 0), 2 * s)
+    return np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0, face_frac: float = 0.4) -> np.ndarray:
+    """
+    BGR (height, width, 3) frame with one synthetic face roughly centred on a
+    noisy gradient background. `face_frac` is the face size relative to the short side.
+    """
+    rng = np.random.default_rng(seed)
+    grad = np.linspace(60, 160, width, dtype=np.float32)[None, :].repeat(height, axis=0)
+    bg = np.clip(grad + rng.normal(0, 12, (height, width)), 0, 255).astype(np.uint8)
+
+    fs = max(48, int(min(width, height) * face_frac))
+    face = synthetic_face(fs, seed)
+    x0 = (width - fs) // 2 + int(rng.integers(-fs // 8, fs // 8 + 1))
+    y0 = (height - fs) // 2 + int(rng.integers(-fs // 8, fs // 8 + 1))
+    x0, y0 = min(max(0, x0), width - fs), min(max(0, y0), height - fs)
+    bg[y0:y0 + fs, x0:x0 + fs] = face
+    return cv2.cvtColor(bg, cv2.COLOR_GRAY2BGR)
+
+
+def encode_jpeg(bgr: np.ndarray, quality: int = 90) -> bytes:
+    ok, enc = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encode failed")
+    return enc.tobytes()
+
+
+def to_data_uri(jpeg: bytes) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+
+
+# Named resolutions used across the benchmark scripts (width, height).
+RESOLUTIONS: Tuple[Tuple[str, int, int], ...] = (
+    ("320p", 480, 320),
+    ("720p", 1280, 720),
+    ("1080p", 1920, 1080),
+    ("4k", 3840, 2160),
+    ("12mp", 4032, 3024),
+)
@@ -0,0 +1,190 @@
+# scripts/ingest_worker.py
+"""
+Runs the knowledge-base ingestion jobs queued through /api/admin/ingest/jobs
+(src/controllers/ingest_service.py). Keep it out of the web processes:
+one long-lived worker per deployment is enough, jobs run one at a time.
+
+Each job runs scripts/kb_rag/rag/chunking.py and/or embedding.py as a
+subprocess (reindex = chunk, then embed) with KB_SOURCES_DIR / KB_CHUNKS_DIR
+from settings. Their output is parsed into progress counters; progress, the
+last output lines and a heartbeat are written every INGEST_HEARTBEAT_S, and a
+cancel request terminates the subprocess. Jobs whose worker stopped
+heartbeating for INGEST_STALE_S are failed as 'worker_lost'.
+
+Run from apps/server:
+    python scripts/ingest_worker.py [--once]
+"""
+import argparse
+import collections
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Add project root (folder containing app.py) to PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from src.config import settings  # noqa: E402
+from src.controllers import ingest_service  # noqa: E402
+from src.extensions import db  # noqa: E402
+
+RAG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb_rag", "rag")
+LOG_LINES = 40
+TERMINATE_GRACE_S = 10
+
+_CHUNK_TOTAL_RE = re.compile(r"^Chunking (\d+) docs")
+_CHUNK_DOC_RE = re.compile(r": wrote (\d+) chunks to ")
+_EMBED_RE = re.compile(r"\[progress\] queued (\d+) \| embedded (\d+) \| reused (\d+) \| upserted (\d+)")
+
+
+def create_worker_app() -> Flask:
+    """Database only: the worker never loads the chat / FER models."""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = settings.SQLALCHEMY_DATABASE_URI
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def build_steps(kind: str, args: dict) -> list:
+    """[(phase, argv)] for a job; flags come from the whitelisted job args only."""
+    chunk = ["chunking.py", "--engine", args.get("engine", "gemini")]
+    embed = ["embedding.py"]
+    if args.get("force"):
+        chunk.append("--force")
+        embed.append("--force")
+    if args.get("store"):
+        chunk += ["--store", settings.KB_CHUNK_STORE]
+        embed += ["--store", settings.KB_CHUNK_STORE]
+    if args.get("versioned", ingest_service.JOB_DEFAULTS["versioned"]):
+        embed.append("--versioned")
+    if args.get("no_dedup"):
+        embed.append("--no-dedup")
+
+    steps = []
+    if kind in ("chunk", "reindex"):
+        steps.append(("chunk", chunk))
+    if kind in ("embed", "reindex"):
+        steps.append(("embed", embed))
+    return steps
+
+
+class StepOutput:
+    """Reads a subprocess' stdout on a thread: keeps the last lines and the progress counters."""
+
+    def __init__(self, proc: subprocess.Popen, progress: dict):
+        self.lines = collections.deque(maxlen=LOG_LINES)
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read, args=(proc.stdout,), daemon=True)
+        self._thread.start()
+
+    def _read(self, stream):
+        for line in stream:
+            line = line.rstrip()
+            with self._lock:
+                self.lines.append(line)
+                self._parse(line)
+
+    def _parse(self, line: str):
+        p = self.progress
+        if m := _CHUNK_TOTAL_RE.match(line):
+            p["docs_total"] = int(m.group(1))
+        elif m := _CHUNK_DOC_RE.search(line):
+            p["docs_done"] = p.get("docs_done", 0) + 1
+            p["chunks_written"] = p.get("chunks_written", 0) + int(m.group(1))
+        elif m := _EMBED_RE.search(line):
+            p["queued"], p["embedded"], p["reused"], p["upserted"] = map(int, m.groups())
+        if line:
+            p["message"] = line[-200:]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.progress), "\n".join(self.lines)
+
+    def join(self):
+        self._thread.join(timeout=5)
+
+
+def run_job(job: dict) -> None:
+    job_id = job["job_id"]
+    env = {**os.environ, "PYTHONUNBUFFERED": "1",
+           "KB_SOURCES_DIR": settings.KB_SOURCES_DIR, "KB_CHUNKS_DIR": settings.KB_CHUNKS_DIR}
+    progress, log_tail = {}, ""
+    for phase, argv in build_steps(job["kind"], job["args"]):
+        progress = {"phase": phase}
+        print(f"[{job_id}] {phase}: {' '.join(argv)}")
+        proc = subprocess.Popen([sys.executable, "-u", *argv], cwd=RAG_DIR, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        out = StepOutput(proc, progress)
+        cancelled = False
+        try:
+            while proc.poll() is None:
+                time.sleep(settings.INGEST_HEARTBEAT_S)
+                progress, log_tail = out.snapshot()
+                if ingest_service.heartbeat(job_id, progress, log_tail) and not cancelled:
+                    cancelled = True
+                    proc.terminate()
+                    try:
+                        proc.wait(timeout=TERMINATE_GRACE_S)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+        except BaseException:
+            proc.kill()
+            raise
+        out.join()
+        progress, log_tail = out.snapshot()
+
+        if cancelled:
+            ingest_service.finish_job(job_id, "cancelled", exit_code=proc.returncode,
+                                      progress=progress, log_tail=log_tail)
+            return
+        if proc.returncode != 0:
+            ingest_service.finish_job(job_id, "failed", exit_code=proc.returncode, error=f"{phase}_failed",
+                                      progress=progress, log_tail=log_tail)
+            return
+    progress["phase"] = "done"
+    ingest_service.finish_job(job_id, "succeeded", exit_code=0, progress=progress, log_tail=log_tail)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="run at most one job, then exit")
+    args = ap.parse_args()
+
+    worker = ingest_service.worker_name()
+    app = create_worker_app()
+    print(f"Ingest worker {worker}: sources={settings.KB_SOURCES_DIR} chunks={settings.KB_CHUNKS_DIR}")
+    with app.app_context():
+        while True:
+            reaped = ingest_service.reap_stale_jobs()
+            if reaped:
+                print(f"Failed {reaped} stale job(s) (worker_lost)")
+            job = ingest_service.claim_next_job(worker)
+            if job is None:
+                if args.once:
+                    return
+                time.sleep(settings.INGEST_POLL_S)
+                continue
+
+            print(f"[{job['job_id']}] {job['kind']} {job['args']} (by {job['created_by']})")
+            try:
+                run_job(job)
+            except KeyboardInterrupt:
+                db.session.rollback()
+                ingest_service.finish_job(job["job_id"], "failed", error="worker_stopped")
+                raise
+            except Exception as e:
+                db.session.rollback()
+                ingest_service.finish_job(job["job_id"], "failed", error=f"worker_error: {e!r}"[:500])
+            print(f"[{job['job_id']}] {ingest_service.get_job(job['job_id'])['status']}")
+            if args.once:
+                return
+
+
+if __name__ == "__main__":
+    main()
@@ -1,179 +1,432 @@
-# 02_chunk_with_gemini.py  (patched loader)
-import io, os, re, json, glob, pathlib
-from typing import List, Dict, Any
-from urllib.parse import urlparse
-from slugify import slugify
-
-from dotenv import load_dotenv
-import google.generativeai as genai
-
-# ------------- Config -------------
-load_dotenv()
-
-GEMINI_API_KEY = os.environ["GOOGLE_API_KEY"]
-
-CHUNK_MODEL = "gemini-2.0-flash"   # keep as you set; switch to gemini-1.5-pro if needed
-INPUT_DIR   = "/Users/mathieufiani/work/Dev/hackaton/hophacks-2025-v2/apps/server/scripts/kb_rag/sources"
-OUTPUT_DIR  = "./chunks"
-
-TARGET_TOKENS = 600
-MIN_TOKENS    = 200
-MAX_INPUT_CHARS = 40000
-
-# ------------- Init -------------
-genai.configure(api_key=GEMINI_API_KEY)
-pathlib.Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-
-# ------------- Helpers -------------
-CTRL_ILLEGAL_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F]')  # keep \t,\n,\r
-
-def load_loose_json(path: str) -> Dict[str, Any]:
-    """
-    1) Try strict JSON.
-    2) If it fails (e.g., content has raw newlines), extract "url" and "content"
-       with regex and return a proper Python dict.
-    """
-    raw = open(path, "r", encoding="utf-8-sig", errors="strict").read()
-    # normalize newlines and strip illegal control chars (but keep \n \t \r)
-    raw = raw.replace("\r\n", "\n").replace("\r", "\n")
-    raw = CTRL_ILLEGAL_RE.sub(" ", raw)
-
-    # 1) strict path
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        pass
-
-    # 2) loose path (regex extraction)
-    m_url = re.search(r'"url"\s*:\s*"([^"]+)"', raw)
-    if not m_url:
-        raise ValueError(f"{path}: could not find a valid \"url\" field")
-
-    # capture everything between "content":" and the last closing quote before the final }
-    m_content = re.search(r'"content"\s*:\s*"(.*)"\s*}\s*$', raw, re.S)
-    if not m_content:
-        # handle trailing whitespace/newlines after }
-        m_content = re.search(r'"content"\s*:\s*"(.*)"\s*}\s*[\n\s]*$', raw, re.S)
-    if not m_content:
-        raise ValueError(f"{path}: could not parse the \"content\" field")
-
-    url = m_url.group(1)
-    content_raw = m_content.group(1)
-
-    # Undo common pseudo-escaping (if any) and convert to real Python text
-    # - keep the actual newlines we just read; json.dump will escape later if needed
-    content_text = content_raw
-
-    return {"url": url, "content": content_text}
-
-def window_text(text: str, max_chars: int) -> List[str]:
-    if len(text) <= max_chars:
-        return [text]
-    parts = re.split(r"\n{2,}", text)
-    windows, cur = [], ""
-    for p in parts:
-        if len(cur) + len(p) + 2 <= max_chars:
-            cur = f"{cur}\n\n{p}" if cur else p
-        else:
-            if cur: windows.append(cur)
-            cur = p
-    if cur:
-        windows.append(cur)
-    return windows
-
-def gemini_chunk(content: str, url: str) -> Dict[str, Any]:
-    prompt = f"""
-        You are a document chunker. Split the document into context-aware chunks aligned with natural sections/paragraphs.
-
-        Rules:
-        - Aim for ~{TARGET_TOKENS} tokens per chunk (acceptable >= {MIN_TOKENS}).
-        - Keep sentences intact; prefer headings/section boundaries.
-        - Return STRICT JSON only (no prose/markdown) with schema:
-        {{
-        "doc_url": "{url}",
-        "chunks": [
-            {{"section_title":"string","start_char":int,"end_char":int,"text":"string"}}
-        ]
-        }}
-        - Each chunk's "text" must be a contiguous excerpt of the original, matching [start_char, end_char).
-
-        Document:
-        <<<DOC_START>>>
-        {content}
-        <<<DOC_END>>>
-    """.strip()
-
-    model = genai.GenerativeModel(CHUNK_MODEL)
-    resp = model.generate_content(prompt)
-    txt = resp.text or ""
-    try:
-        return json.loads(txt)
-    except Exception:
-        m = re.search(r"\{.*\}", txt, re.S)
-        if not m:
-            raise RuntimeError("Gemini did not return JSON.")
-        return json.loads(m.group(0))
-
-def write_chunk_files(doc_slug: str, url: str, host: str, chunks: List[Dict[str, Any]]) -> int:
-    out_dir = pathlib.Path(OUTPUT_DIR) / doc_slug
-    out_dir.mkdir(parents=True, exist_ok=True)
-    count = 0
-    for i, ch in enumerate(chunks, 1):
-        text = (ch.get("text") or "").strip()
-        if not text:
-            continue
-        header = (
-            f"URL: {url}\nSOURCE: {host}\nSECTION: {ch.get('section_title','')}\n"
-            f"START: {ch.get('start_char')}\nEND: {ch.get('end_char')}\n\n"
-        )
-        (out_dir / f"chunk_{i:04d}.txt").write_text(header + text, encoding="utf-8")
-        count += 1
-    return count
-
-# ------------- Main -------------
-if __name__ == "__main__":
-    files = glob.glob(os.path.join(INPUT_DIR, "*.json"))
-
-    if not files:
-        print(f"No JSON files in {INPUT_DIR}")
-        raise SystemExit(0)
-
-    total_files, total_chunks = 0, 0
-    for path in files:
-        try:
-            obj = load_loose_json(path)
-        except Exception as e:
-            print(f"[ERROR] {e}")
-            continue
-
-        url = (obj.get("url") or "").strip()
-        content = (obj.get("content") or "").strip()
-        if not url or not content:
-            print(f"[SKIP] Missing url/content: {path}")
-            continue
-
-        host = urlparse(url).netloc or "unknown-host"
-        doc_slug = slugify(url, max_length=120)
-
-        all_chunks: List[Dict[str, Any]] = []
-        for w_idx, win in enumerate(window_text(content, MAX_INPUT_CHARS), 1):
-            try:
-                result = gemini_chunk(win, url)
-                chunks = result.get("chunks", [])
-                if len(content) > len(win):
-                    base = content.find(win)
-                    for c in chunks:
-                        if isinstance(c.get("start_char"), int):
-                            c["start_char"] = base + c["start_char"]
-                        if isinstance(c.get("end_char"), int):
-                            c["end_char"] = base + c["end_char"]
-                all_chunks.extend(chunks)
-            except Exception as e:
-                print(f"[WARN] Chunking window {w_idx} failed for {path}: {e}")
-
-        wrote = write_chunk_files(doc_slug, url, host, all_chunks)
-        print(f"{path}: wrote {wrote} chunks to ./chunks/{doc_slug}/")
-        total_files += 1
-        total_chunks += wrote
-
-    print(f"Done. Processed {total_files} docs; wrote {total_chunks} chunk files.")
+# 02_chunk_with_gemini.py  (patched loader)
+#
+# Incremental + concurrent:
+#   - windows from all changed sources are chunked in parallel (MAX_WORKERS threads)
+#   - rate limits / transient API errors are retried with exponential backoff;
+#     a 429 pauses every worker, not just the one that got it
+#   - OUTPUT_DIR/_manifest.json records each source's content hash; unchanged
+#     sources are skipped, and per-window results are cached in OUTPUT_DIR/.cache
+#     so an edit only re-chunks the windows that changed
+#   - each document's chunk dir is written to a temp dir and swapped in whole
+#
+# --engine local swaps gemini_chunk for the deterministic offline chunker in
+# local_chunker.py (no API key needed; sources are spread over processes).
+#
+# --store repacks OUTPUT_DIR into a single-file chunk store after the run
+# (what embedding.py --store and serving read).
+#
+#   python chunking.py [--engine gemini|local] [--workers 8] [--force] [--store kb_chunks.kbs [--zstd]]
+import io, os, re, sys, json, glob, pathlib, shutil, hashlib, random, threading, time, argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+from slugify import slugify
+
+from dotenv import load_dotenv
+
+import local_chunker
+
+# apps/server on the path for the shared chunk store
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[3]))
+from src.controllers.chunk_store import import_dir  # noqa: E402
+
+# ------------- Config -------------
+load_dotenv()
+
+CHUNK_MODEL = "gemini-2.0-flash"   # keep as you set; switch to gemini-1.5-pro if needed
+_HERE       = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR   = os.getenv("KB_SOURCES_DIR", os.path.join(os.path.dirname(_HERE), "sources"))
+OUTPUT_DIR  = os.getenv("KB_CHUNKS_DIR", os.path.join(_HERE, "chunks"))
+
+TARGET_TOKENS = 600
+MIN_TOKENS    = 200
+MAX_INPUT_CHARS = 40000
+
+MAX_WORKERS   = 8         # concurrent Gemini calls
+MAX_RETRIES   = 6
+BACKOFF_BASE  = 2.0       # seconds; doubles per attempt (+ jitter)
+BACKOFF_MAX   = 60.0
+PROMPT_VERSION = 1        # bump when the prompt changes to invalidate cached windows
+
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "_manifest.json")
+CACHE_DIR     = os.path.join(OUTPUT_DIR, ".cache")
+
+# ------------- Init -------------
+pathlib.Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+pathlib.Path(CACHE_DIR).mkdir(parents=True, exist_ok=True)
+
+_genai = None
+_genai_lock = threading.Lock()
+
+def _gemini():
+    """Imports + configures google.generativeai on first use (local runs never need it)."""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+            _genai = genai
+    return _genai
+
+# ------------- Helpers -------------
+CTRL_ILLEGAL_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F]')  # keep \t,\n,\r
+
+def load_loose_json(path: str) -> Dict[str, Any]:
+    """
+    1) Try strict JSON.
+    2) If it fails (e.g., content has raw newlines), extract "url" and "content"
+       with regex and return a proper Python dict.
+    """
+    raw = open(path, "r", encoding="utf-8-sig", errors="strict").read()
+    # normalize newlines and strip illegal control chars (but keep \n \t \r)
+    raw = raw.replace("\r\n", "\n").replace("\r", "\n")
+    raw = CTRL_ILLEGAL_RE.sub(" ", raw)
+
+    # 1) strict path
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+
+    # 2) loose path (regex extraction)
+    m_url = re.search(r'"url"\s*:\s*"([^"]+)"', raw)
+    if not m_url:
+        raise ValueError(f"{path}: could not find a valid \"url\" field")
+
+    # capture everything between "content":" and the last closing quote before the final }
+    m_content = re.search(r'"content"\s*:\s*"(.*)"\s*}\s*$', raw, re.S)
+    if not m_content:
+        # handle trailing whitespace/newlines after }
+        m_content = re.search(r'"content"\s*:\s*"(.*)"\s*}\s*[\n\s]*$', raw, re.S)
+    if not m_content:
+        raise ValueError(f"{path}: could not parse the \"content\" field")
+
+    url = m_url.group(1)
+    content_raw = m_content.group(1)
+
+    # Undo common pseudo-escaping (if any) and convert to real Python text
+    # - keep the actual newlines we just read; json.dump will escape later if needed
+    content_text = content_raw
+
+    return {"url": url, "content": content_text}
+
+def window_text(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    parts = re.split(r"\n{2,}", text)
+    windows, cur = [], ""
+    for p in parts:
+        if len(cur) + len(p) + 2 <= max_chars:
+            cur = f"{cur}\n\n{p}" if cur else p
+        else:
+            if cur: windows.append(cur)
+            cur = p
+    if cur:
+        windows.append(cur)
+    return windows
+
+def gemini_chunk(content: str, url: str) -> Dict[str, Any]:
+    prompt = f"""
+        You are a document chunker. Split the document into context-aware chunks aligned with natural sections/paragraphs.
+
+        Rules:
+        - Aim for ~{TARGET_TOKENS} tokens per chunk (acceptable >= {MIN_TOKENS}).
+        - Keep sentences intact; prefer headings/section boundaries.
+        - Return STRICT JSON only (no prose/markdown) with schema:
+        {{
+        "doc_url": "{url}",
+        "chunks": [
+            {{"section_title":"string","start_char":int,"end_char":int,"text":"string"}}
+        ]
+        }}
+        - Each chunk's "text" must be a contiguous excerpt of the original, matching [start_char, end_char).
+
+        Document:
+        <<<DOC_START>>>
+        {content}
+        <<<DOC_END>>>
+    """.strip()
+
+    model = _gemini().GenerativeModel(CHUNK_MODEL)
+    resp = model.generate_content(prompt)
+    txt = resp.text or ""
+    try:
+        return json.loads(txt)
+    except Exception:
+        m = re.search(r"\{.*\}", txt, re.S)
+        if not m:
+            raise RuntimeError("Gemini did not return JSON.")
+        return json.loads(m.group(0))
+
+def write_chunk_files(doc_slug: str, url: str, host: str, chunks: List[Dict[str, Any]]) -> int:
+    """
+    Writes the doc's chunks into a temp dir, then swaps it for OUTPUT_DIR/<slug>:
+    readers never see a half-written doc, and chunks from an older, longer
+    version don't linger.
+    """
+    final_dir = pathlib.Path(OUTPUT_DIR) / doc_slug
+    out_dir = pathlib.Path(OUTPUT_DIR) / f".tmp-{doc_slug}-{os.getpid()}"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    count = 0
+    for i, ch in enumerate(chunks, 1):
+        text = (ch.get("text") or "").strip()
+        if not text:
+            continue
+        header = (
+            f"URL: {url}\nSOURCE: {host}\nSECTION: {ch.get('section_title','')}\n"
+            f"START: {ch.get('start_char')}\nEND: {ch.get('end_char')}\n\n"
+        )
+        (out_dir / f"chunk_{i:04d}.txt").write_text(header + text, encoding="utf-8")
+        count += 1
+
+    old_dir = pathlib.Path(OUTPUT_DIR) / f".old-{doc_slug}-{os.getpid()}"
+    if final_dir.exists():
+        os.replace(final_dir, old_dir)
+    os.replace(out_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return count
+
+# ------------- Retry / rate limiting -------------
+_cooldown_lock = threading.Lock()
+_cooldown_until = 0.0   # shared: a 429 on any worker pauses all of them
+
+def _is_rate_limit(e: Exception) -> bool:
+    name = type(e).__name__
+    return name in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+def _is_transient(e: Exception) -> bool:
+    name = type(e).__name__
+    return name in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+                    "GatewayTimeout", "Aborted") or isinstance(e, (ConnectionError, TimeoutError))
+
+def _wait_cooldown():
+    while True:
+        with _cooldown_lock:
+            delay = _cooldown_until - time.monotonic()
+        if delay <= 0:
+            return
+        time.sleep(delay)
+
+def call_with_retry(fn, *args, **kwargs):
+    """
+    Retries rate limits (429 / ResourceExhausted), transient server errors and
+    unparseable model output with exponential backoff + jitter.
+    """
+    global _cooldown_until
+    for attempt in range(MAX_RETRIES + 1):
+        _wait_cooldown()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            retryable = _is_rate_limit(e) or _is_transient(e) or isinstance(e, (RuntimeError, json.JSONDecodeError))
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+            if _is_rate_limit(e):
+                with _cooldown_lock:
+                    _cooldown_until = max(_cooldown_until, time.monotonic() + delay)
+            else:
+                time.sleep(delay)
+
+# ------------- Manifest / cache -------------
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _atomic_write_json(path: str, obj: Any):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def load_manifest() -> Dict[str, Any]:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"version": 1, "docs": {}}
+
+ENGINE = "gemini"   # set from --engine
+
+def _params_key() -> str:
+    if ENGINE == "local":
+        return f"local|{TARGET_TOKENS}|{MIN_TOKENS}|{local_chunker.MAX_TOKENS}|v{local_chunker.CHUNKER_VERSION}"
+    return f"{CHUNK_MODEL}|{TARGET_TOKENS}|{MIN_TOKENS}|{MAX_INPUT_CHARS}|v{PROMPT_VERSION}"
+
+def _window_cache_path(win: str, url: str) -> str:
+    return os.path.join(CACHE_DIR, _sha256(f"{_params_key()}|{url}|{win}") + ".json")
+
+def chunk_window_cached(win: str, url: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """(chunks, from_cache) for one window; results are cached by window content."""
+    path = _window_cache_path(win, url)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f), True
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    result = call_with_retry(gemini_chunk, win, url)
+    chunks = result.get("chunks", [])
+    _atomic_write_json(path, chunks)
+    return chunks, False
+
+# ------------- Main -------------
+def plan_docs(files: List[str], manifest: Dict[str, Any], force: bool) -> Tuple[List[Dict[str, Any]], int]:
+    """Loads sources; returns (docs that need chunking, unchanged count)."""
+    todo, unchanged = [], 0
+    for path in files:
+        try:
+            obj = load_loose_json(path)
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            continue
+
+        url = (obj.get("url") or "").strip()
+        content = (obj.get("content") or "").strip()
+        if not url or not content:
+            print(f"[SKIP] Missing url/content: {path}")
+            continue
+
+        doc_slug = slugify(url, max_length=120)
+        digest = _sha256(f"{_params_key()}|{url}|{content}")
+        prev = manifest["docs"].get(os.path.basename(path))
+        if (not force and prev and prev.get("sha256") == digest
+                and (pathlib.Path(OUTPUT_DIR) / doc_slug).is_dir()):
+            unchanged += 1
+            continue
+
+        todo.append({
+            "path": path,
+            "url": url,
+            "host": urlparse(url).netloc or "unknown-host",
+            "slug": doc_slug,
+            "content": content,
+            "sha256": digest,
+            "windows": window_text(content, MAX_INPUT_CHARS),
+        })
+    return todo, unchanged
+
+def chunk_doc_windows(doc: Dict[str, Any], results: Dict[int, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Reassembles per-window results in order; None if any window failed."""
+    content = doc["content"]
+    all_chunks: List[Dict[str, Any]] = []
+    for w_idx, win in enumerate(doc["windows"]):
+        res = results.get(w_idx)
+        if isinstance(res, Exception):
+            print(f"[WARN] Chunking window {w_idx + 1} failed for {doc['path']}: {res}")
+            return None
+        chunks = [dict(c) for c in res]
+        if len(content) > len(win):
+            base = content.find(win)
+            for c in chunks:
+                if isinstance(c.get("start_char"), int):
+                    c["start_char"] = base + c["start_char"]
+                if isinstance(c.get("end_char"), int):
+                    c["end_char"] = base + c["end_char"]
+        all_chunks.extend(chunks)
+    return all_chunks
+
+def prune_removed(manifest: Dict[str, Any], files: List[str]) -> int:
+    """Drops chunk dirs of sources that no longer exist."""
+    present = {os.path.basename(p) for p in files}
+    live_slugs = {d["slug"] for name, d in manifest["docs"].items() if name in present}
+    removed = 0
+    for name in [n for n in manifest["docs"] if n not in present]:
+        slug = manifest["docs"].pop(name)["slug"]
+        if slug not in live_slugs:
+            shutil.rmtree(pathlib.Path(OUTPUT_DIR) / slug, ignore_errors=True)
+        removed += 1
+    return removed
+
+def chunk_docs_gemini(docs: List[Dict[str, Any]], workers: int) -> Tuple[List[Optional[List[Dict[str, Any]]]], str]:
+    """Fans out every window of every doc at once; per-doc chunks (None = failed)."""
+    results: Dict[Tuple[int, int], Any] = {}
+    cached = called = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(chunk_window_cached, win, doc["url"]): (d_idx, w_idx)
+            for d_idx, doc in enumerate(docs)
+            for w_idx, win in enumerate(doc["windows"])
+        }
+        for fut, key in futures.items():
+            try:
+                chunks, from_cache = fut.result()
+                results[key] = chunks
+                cached += from_cache
+                called += not from_cache
+            except Exception as e:
+                results[key] = e
+
+    out = []
+    for d_idx, doc in enumerate(docs):
+        per_window = {w: r for (d, w), r in results.items() if d == d_idx}
+        out.append(chunk_doc_windows(doc, per_window))
+    return out, f"{called} Gemini calls, {cached} cached windows"
+
+def _local_chunk(content: str, url: str) -> List[Dict[str, Any]]:
+    return local_chunker.chunk_text(content, url, TARGET_TOKENS, MIN_TOKENS)["chunks"]
+
+def chunk_docs_local(docs: List[Dict[str, Any]], workers: int) -> Tuple[List[Optional[List[Dict[str, Any]]]], str]:
+    """Whole documents through local_chunker, one source per task across processes."""
+    out: List[Optional[List[Dict[str, Any]]]] = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_local_chunk, doc["content"], doc["url"]) for doc in docs]
+        for doc, fut in zip(docs, futures):
+            try:
+                out.append(fut.result())
+            except Exception as e:
+                print(f"[WARN] Local chunking failed for {doc['path']}: {e}")
+                out.append(None)
+    return out, "local engine"
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--engine", choices=("gemini", "local"), default="gemini")
+    ap.add_argument("--workers", type=int, default=None,
+                    help=f"concurrent Gemini calls (default {MAX_WORKERS}) / local processes (default: CPUs)")
+    ap.add_argument("--force", action="store_true", help="re-chunk every source (window cache still applies)")
+    ap.add_argument("--store", default=None, help="repack all chunks into this chunk store file when done")
+    ap.add_argument("--zstd", action="store_true", help="compress chunk text in the --store file")
+    args = ap.parse_args()
+    ENGINE = args.engine
+
+    files = sorted(glob.glob(os.path.join(INPUT_DIR, "*.json")))
+
+    if not files:
+        print(f"No JSON files in {INPUT_DIR}")
+        raise SystemExit(0)
+
+    t0 = time.perf_counter()
+    manifest = load_manifest()
+    removed = prune_removed(manifest, files)
+    docs, unchanged = plan_docs(files, manifest, args.force)
+    print(f"Chunking {len(docs)} docs ({unchanged} unchanged, {removed} removed) with the {ENGINE} engine")
+
+    if ENGINE == "local":
+        doc_chunks, stats = chunk_docs_local(docs, args.workers or os.cpu_count() or 1)
+    else:
+        doc_chunks, stats = chunk_docs_gemini(docs, args.workers or MAX_WORKERS)
+
+    total_files, total_chunks, failed = 0, 0, 0
+    for doc, all_chunks in zip(docs, doc_chunks):
+        if all_chunks is None:
+            # keep the previous chunks + manifest entry; the next run retries
+            failed += 1
+            continue
+
+        wrote = write_chunk_files(doc["slug"], doc["url"], doc["host"], all_chunks)
+        manifest["docs"][os.path.basename(doc["path"])] = {
+            "url": doc["url"], "slug": doc["slug"], "sha256": doc["sha256"], "chunks": wrote,
+        }
+        _atomic_write_json(MANIFEST_PATH, manifest)
+        print(f"{doc['path']}: wrote {wrote} chunks to {OUTPUT_DIR}/{doc['slug']}/")
+        total_files += 1
+        total_chunks += wrote
+
+    _atomic_write_json(MANIFEST_PATH, manifest)
+    print(f"Done in {time.perf_counter() - t0:.1f}s. Processed {total_files} docs; wrote {total_chunks} chunk files "
+          f"({unchanged} unchanged, {failed} failed, {removed} removed; "
+          f"{stats}).")
+
+    if args.store:
+        packed = import_dir(OUTPUT_DIR, args.store, compress=args.zstd)
+        print(f"Packed {packed} chunks into {args.store}")
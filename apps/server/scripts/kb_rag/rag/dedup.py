@@ -0,0 +1,132 @@
+# dedup.py
+#
+# Near-duplicate chunk detection (used by embedding.py before embedding).
+#
+# Sources overlap a lot (the same PPD symptom lists on medlineplus / womenshealth
+# / acog pages), so retrieval used to return several copies of one passage.
+# Every chunk gets a MinHash signature over word shingles; LSH banding finds
+# candidate pairs, which are kept when their estimated Jaccard similarity is
+# >= THRESHOLD. Clusters are the connected components of those pairs. The
+# canonical chunk of a cluster is the longest one (ties: smallest id); it
+# carries the other members' URLs as "alias_urls" and the rest are dropped.
+#
+#   python dedup.py [--threshold 0.7]     # report clusters for CHUNKS_DIR, change nothing
+import argparse
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+SHINGLE_WORDS = 5
+NUM_PERM      = 128
+BANDS         = 32          # 32 bands x 4 rows: a pair at Jaccard 0.7 becomes a candidate with p > 0.99
+THRESHOLD     = 0.7         # estimated Jaccard over shingles to count as a duplicate
+SEED          = 1
+
+_PRIME = (1 << 31) - 1      # a * x + b stays < 2^63 for 31-bit a, b, x
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_rng = np.random.default_rng(SEED)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """31-bit hashes of the text's k-word shingles (case/punctuation-insensitive)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) & _PRIME for g in grams),
+                                 dtype=np.uint64, count=len(grams)))
+
+def signature(text: str) -> np.ndarray:
+    """(NUM_PERM,) MinHash signature; all-max for empty text."""
+    sh = shingles(text)
+    if not len(sh):
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    return ((np.outer(_A, sh) + _B[:, None]) % _PRIME).min(axis=1)
+
+def find_clusters(items: List[Tuple[str, str]], threshold: float = THRESHOLD) -> List[List[str]]:
+    """Groups of >= 2 near-duplicate ids among (id, text) items, each sorted by id."""
+    if len(items) < 2:
+        return []
+    ids = [cid for cid, _ in items]
+    sigs = np.stack([signature(text) for _, text in items])
+    rows = NUM_PERM // BANDS
+
+    parent = list(range(len(ids)))
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for b in range(BANDS):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        band = sigs[:, b * rows:(b + 1) * rows]
+        for i in range(len(ids)):
+            buckets[band[i].tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if float((sigs[i] == sigs[j]).mean()) >= threshold:
+                        parent[find(i)] = find(j)
+
+    groups: Dict[int, List[str]] = defaultdict(list)
+    for i, cid in enumerate(ids):
+        groups[find(i)].append(cid)
+    return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+def dedup_records(records: List[tuple], threshold: float = THRESHOLD,
+                  make_record=None) -> Tuple[List[tuple], List[Dict[str, Any]]]:
+    """
+    Keeps one canonical record per near-duplicate cluster of (id, text, meta, hash)
+    records. `make_record(doc_id, cid, text, meta)` rebuilds the canonical with
+    "alias_urls" added to its metadata. Returns (kept records, cluster reports).
+    """
+    by_id = {r[0]: r for r in records}
+    clusters = find_clusters([(r[0], r[1]) for r in records], threshold)
+    dropped = set()
+    replaced: Dict[str, tuple] = {}
+    report = []
+    for ids in clusters:
+        canonical = min(ids, key=lambda cid: (-len(by_id[cid][1]), cid))
+        canon_url = by_id[canonical][2].get("url", "")
+        aliases = sorted({by_id[cid][2].get("url", "") for cid in ids} - {canon_url, ""})
+        if aliases and make_record is not None:
+            r = by_id[canonical]
+            replaced[canonical] = make_record(r[2]["doc_id"], canonical, r[1], {**r[2], "alias_urls": aliases})
+        dropped.update(cid for cid in ids if cid != canonical)
+        report.append({"canonical": canonical, "duplicates": [cid for cid in ids if cid != canonical],
+                       "alias_urls": aliases})
+    kept = [replaced.get(r[0], r) for r in records if r[0] not in dropped]
+    return kept, report
+
+if __name__ == "__main__":
+    import os
+    import pathlib
+    import sys
+
+    sys.path.append(str(pathlib.Path(__file__).resolve().parents[3]))
+    from src.controllers.chunk_store import iter_chunk_dir
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks-dir", default=os.getenv(
+        "KB_CHUNKS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunks")))
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = ap.parse_args()
+
+    items = [(cid, text) for cid, text, _ in iter_chunk_dir(args.chunks_dir)]
+    clusters = find_clusters(items, args.threshold)
+    for ids in clusters:
+        print(f"{len(ids)}: " + ", ".join(ids))
+    removed = sum(len(ids) - 1 for ids in clusters)
+    print(f"{len(items)} chunks, {len(clusters)} near-duplicate clusters, {removed} would be removed")
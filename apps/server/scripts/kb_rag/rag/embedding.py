@@ -1,171 +1,719 @@
-import os
-import pathlib
-import time
-from typing import List, Dict, Any
-
-from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-import google.generativeai as genai
-
-# Load environment variables from .env file
-load_dotenv()
-
-# --- ENV / Config ---
-GEMINI_API_KEY   = os.environ.get("GOOGLE_API_KEY")
-PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
-PINECONE_INDEX   = os.getenv("PINECONE_INDEX", "ppd-v1")
-PINECONE_REGION  = os.getenv("PINECONE_REGION", "us-east-1")
-NAMESPACE        = "ppd"
-
-# Use the recommended model for RAG embeddings and set its dimensionality
-EMBED_MODEL      = "models/text-embedding-004"
-OUTPUT_DIMENSIONALITY = 768
-
-# CORRECTED: Path to the directory containing all the source folders
-CHUNKS_DIR = "/Users/mathieufiani/work/Dev/hackaton/hophacks-2025-v2/apps/server/scripts/kb_rag/rag/chunks"
-
-# Optional: To process only specific sources, add their folder names to this list.
-# Leave the list empty to process all folders inside CHUNKS_DIR.
-ONLY_DOCS = []
-
-# Batch sizes
-EMBED_BATCH = 96   # Gemini list-of-strings per call (max 100)
-UPSERT_BATCH = 96  # Pinecone upsert batch
-
-# --- Helpers ---
-
-def parse_header_and_text(path: pathlib.Path) -> Dict[str, Any]:
-    """Parses a chunk file into metadata and text content."""
-    raw = path.read_text(encoding="utf-8", errors="ignore")
-    header, _, body = raw.partition("\n\n")
-    meta = {"url": "", "source": "", "section": "", "start_char": None, "end_char": None}
-    for line in header.splitlines():
-        if line.startswith("URL:"):
-            meta["url"] = line.split("URL:", 1)[1].strip()
-        elif line.startswith("SOURCE:"):
-            meta["source"] = line.split("SOURCE:", 1)[1].strip()
-        elif line.startswith("SECTION:"):
-            meta["section"] = line.split("SECTION:", 1)[1].strip()
-        elif line.startswith("START:"):
-            v = line.split("START:", 1)[1].strip()
-            meta["start_char"] = int(v) if v.isdigit() else None
-        elif line.startswith("END:"):
-            v = line.split("END:", 1)[1].strip()
-            meta["end_char"] = int(v) if v.isdigit() else None
-    return {"meta": meta, "text": body.strip()}
-
-def chunk_list(xs: List[Any], n: int):
-    """Splits a list into smaller lists of size n."""
-    for i in range(0, len(xs), n):
-        yield xs[i:i + n]
-
-# --- Client Initialization ---
-
-# Configure the Gemini client using the API key
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables.")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initialize Pinecone client
-if not PINECONE_API_KEY:
-    raise ValueError("PINECONE_API_KEY not found in environment variables.")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Ensure index exists with the correct dimension and metric
-if PINECONE_INDEX not in pc.list_indexes().names():
-    print(f"Creating Pinecone index: {PINECONE_INDEX}...")
-    pc.create_index(
-        name=PINECONE_INDEX,
-        dimension=OUTPUT_DIMENSIONALITY,  # Must match your embedding model
-        metric="cosine",                 # Recommended for semantic search
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION),
-    )
-index = pc.Index(PINECONE_INDEX)
-print("Pinecone index is ready.")
-
-# --- Main Execution Logic ---
-
-if __name__ == "__main__":
-    # Resolve which source folders to process
-    all_dirs = [p for p in pathlib.Path(CHUNKS_DIR).glob("*") if p.is_dir()]
-    if ONLY_DOCS:
-        targets = [d for d in all_dirs if d.name in ONLY_DOCS]
-    else:
-        targets = all_dirs
-
-    if not targets:
-        print(f"No matching source folders found in '{CHUNKS_DIR}'. Check the path and your ONLY_DOCS list.")
-        raise SystemExit(0)
-
-    total_vectors = 0
-    t0 = time.time()
-
-    for doc_dir in targets:
-        chunk_paths = sorted(doc_dir.glob("chunk_*.txt"))
-        if not chunk_paths:
-            print(f"[INFO] No chunk files in {doc_dir.name}")
-            continue
-
-        # Read all chunks from the current document directory
-        records = []
-        for cp in chunk_paths:
-            obj = parse_header_and_text(cp)
-            text = obj["text"]
-            meta = obj["meta"]
-            if not text:
-                continue
-            
-            # Create a unique ID for each chunk
-            cid = f"{doc_dir.name}#{cp.stem}"
-            
-            # Prepare metadata, including a truncated text preview for Pinecone
-            metadata_payload = {
-                "url": meta["url"],
-                "source": meta["source"],
-                "doc_id": doc_dir.name,
-                "section": meta["section"],
-                "start_char": meta["start_char"],
-                "end_char": meta["end_char"],
-                "char_len": len(text),
-                "text": text[:4000]  # Pinecone metadata has size limits, truncate text
-            }
-            records.append((cid, text, metadata_payload))
-
-        if not records:
-            print(f"[INFO] No eligible chunks found in {doc_dir.name}")
-            continue
-
-        # Embed and upsert in batches
-        upserted_here = 0
-        for batch in chunk_list(records, EMBED_BATCH):
-            ids   = [r[0] for r in batch]
-            texts = [r[1] for r in batch]
-            metas = [r[2] for r in batch]
-
-            # --- CORRECTED EMBEDDING CALL ---
-            # Embed in one call with task_type tuned for storing documents for search
-            result = genai.embed_content(
-                model=EMBED_MODEL,
-                content=texts,
-                task_type="retrieval_document",  # Use "retrieval_document" for RAG
-                output_dimensionality=OUTPUT_DIMENSIONALITY
-            )
-            embeddings = result['embedding']
-
-            # Prepare vectors for Pinecone upsert
-            vectors_to_upsert = []
-            for _id, _meta, emb in zip(ids, metas, embeddings):
-                vectors_to_upsert.append({"id": _id, "values": emb, "metadata": _meta})
-
-            # Upsert to Pinecone
-            for upsert_batch in chunk_list(vectors_to_upsert, UPSERT_BATCH):
-                try:
-                    index.upsert(vectors=upsert_batch, namespace=NAMESPACE)
-                    upserted_here += len(upsert_batch)
-                    total_vectors += len(upsert_batch)
-                except Exception as e:
-                    print(f"An error occurred during Pinecone upsert: {e}")
-
-        print(f"Processed {doc_dir.name}: upserted {upserted_here} vectors to {PINECONE_INDEX}/{NAMESPACE}")
-
-    print(f"\n✅ Done. Upserted a total of {total_vectors} vectors in {time.time() - t0:.1f}s")
\ No newline at end of file
+# Incremental: CHUNKS_DIR/_embed_manifest.json maps chunk id -> content hash for
+# the index/namespace/model/dimension it was embedded with. Re-runs embed only
+# new or changed chunks and bulk-delete vectors whose chunk files disappeared.
+#
+# Pipelined: chunk parsing, embedding (EMBED_WORKERS threads) and upserts
+# (UPSERT_WORKERS threads) run concurrently, connected by bounded queues.
+# Embed batch size adapts to rate limits (halve on 429, grow back on success);
+# failed upserts are retried with backoff. Progress reports vectors/sec.
+#
+# --store reads chunks from a single-file chunk store (scripts/chunk_store.py
+# import) instead of the chunk_XXXX.txt tree; ids and hashes are identical, so
+# the manifest carries over between the two.
+#
+# Snapshots: every run also writes CHUNKS_DIR/.snapshots/<version> (vectors.npy
+# + ids/hashes/metadata + model/dim, see src/controllers/kb_snapshot.py).
+# Chunks whose content hash matches the latest snapshot (same model/dim) are
+# upserted from it without calling Gemini, so a new index or namespace costs
+# no re-embedding; restore_snapshot.py reloads an index from a snapshot alone.
+#
+# Near-duplicate chunks across sources are collapsed before embedding
+# (dedup.py: MinHash + LSH); the canonical chunk lists the others' URLs in
+# "alias_urls" and the duplicates are dropped from the index like orphans.
+#
+# Blue/green (--versioned): the run builds a fresh namespace NAMESPACE-<version>
+# instead of updating NAMESPACE in place, waits until Pinecone reports all of its
+# vectors, runs the smoke queries (smoke_queries.json) against it, and only then
+# flips the pointer chat_service reads (src/controllers/kb_namespace.py). Older
+# versioned namespaces beyond KEEP_NAMESPACES are deleted. Unchanged chunks come
+# from the snapshot, so a full rebuild costs upserts, not embeddings.
+# --activate <namespace> re-points serving (rollback) without building. Once the
+# pointer names a versioned namespace, runs without --versioned are versioned too.
+#
+#   python embedding.py [--force] [--dry-run] [--store kb_chunks.kbs] [--no-snapshot] [--no-dedup]
+#                       [--versioned | --activate ppd-<version>]
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import queue
+import random
+import signal
+import threading
+import sys
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Set
+
+from dotenv import load_dotenv
+from pinecone import Pinecone, ServerlessSpec
+import google.generativeai as genai
+
+import dedup
+
+# apps/server on the path for the shared chunk store
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[3]))
+from src.controllers.chunk_store import ChunkStore, parse_chunk_file  # noqa: E402
+from src.controllers.kb_snapshot import load_snapshot, write_snapshot  # noqa: E402
+from src.controllers.kb_namespace import (  # noqa: E402
+    gc_namespaces, namespace_counts, read_active, write_active,
+)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# --- ENV / Config ---
+GEMINI_API_KEY   = os.environ.get("GOOGLE_API_KEY")
+PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
+PINECONE_INDEX   = os.getenv("PINECONE_INDEX", "ppd-v1")
+PINECONE_REGION  = os.getenv("PINECONE_REGION", "us-east-1")
+NAMESPACE        = "ppd"
+
+# Use the recommended model for RAG embeddings and set its dimensionality
+EMBED_MODEL      = "models/text-embedding-004"
+OUTPUT_DIMENSIONALITY = 768
+
+# Directory containing one folder of chunk files per source (chunking.py's output)
+CHUNKS_DIR = os.getenv("KB_CHUNKS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunks"))
+
+# Optional: To process only specific sources, add their folder names to this list.
+# Leave the list empty to process all folders inside CHUNKS_DIR.
+ONLY_DOCS = []
+
+# Batch sizes
+EMBED_BATCH = 96   # Gemini list-of-strings per call (max 100)
+UPSERT_BATCH = 96  # Pinecone upsert batch
+DELETE_BATCH = 1000  # Pinecone delete-by-id limit
+FETCH_BATCH = 100    # Pinecone fetch-by-id batch (snapshot backfill)
+MIN_EMBED_BATCH = 4
+EMBED_BATCH_STEP = 8  # additive increase after a successful call
+
+# Pipeline
+EMBED_WORKERS  = 4
+UPSERT_WORKERS = 4
+QUEUE_SIZE     = 1024   # records / vectors buffered between stages
+MAX_RETRIES    = 6
+BACKOFF_BASE   = 1.0    # seconds, doubled per attempt (+ jitter)
+BACKOFF_MAX    = 60.0
+PROGRESS_EVERY = 5.0    # seconds between progress lines (and periodic manifest saves)
+
+# Blue/green publishing (--versioned)
+KEEP_NAMESPACES  = 2      # newest versioned namespaces kept (active + one to roll back to)
+SMOKE_QUERIES    = os.path.join(os.path.dirname(os.path.abspath(__file__)), "smoke_queries.json")
+SMOKE_TOP_K      = 5
+SMOKE_MIN_SCORE  = 0.5    # best match must score at least this (cosine)
+VISIBLE_TIMEOUT  = 300.0  # seconds to wait for upserts to show up in index stats
+
+MANIFEST_PATH = os.path.join(CHUNKS_DIR, "_embed_manifest.json")
+SNAPSHOT_DIR  = os.path.join(CHUNKS_DIR, ".snapshots")
+KEEP_SNAPSHOTS = 3
+
+# --- Helpers ---
+
+def parse_header_and_text(path: pathlib.Path) -> Dict[str, Any]:
+    """Parses a chunk file into metadata and text content."""
+    meta, text = parse_chunk_file(path.read_text(encoding="utf-8", errors="ignore"))
+    return {"meta": meta, "text": text}
+
+def chunk_list(xs: List[Any], n: int):
+    """Splits a list into smaller lists of size n."""
+    for i in range(0, len(xs), n):
+        yield xs[i:i + n]
+
+def content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """Hash of everything that ends up in the vector record (text + metadata)."""
+    payload = json.dumps({"text": text, "meta": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def manifest_target() -> Dict[str, Any]:
+    return {"index": PINECONE_INDEX, "namespace": NAMESPACE,
+            "model": EMBED_MODEL, "dim": OUTPUT_DIMENSIONALITY}
+
+def load_manifest() -> Dict[str, Any]:
+    """Manifest for the current index/namespace/model/dim; a mismatch means start over."""
+    empty = {**manifest_target(), "chunks": {}, "exists": False}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            m = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return empty
+    if any(m.get(k) != v for k, v in manifest_target().items()):
+        print("[INFO] Embedding target changed since the last run; re-embedding everything.")
+        return {**empty, "previous": m}
+    m["exists"] = True
+    return m
+
+def save_manifest(manifest: Dict[str, Any], keep_previous: bool = False):
+    """
+    Atomic write. Mid-run saves keep the previous target's ids (keep_previous)
+    so an interrupted run still deletes them as orphans next time.
+    """
+    drop = ("exists",) if keep_previous else ("exists", "previous")
+    data = {k: v for k, v in manifest.items() if k not in drop}
+    if "previous" in data:
+        data["previous"] = {k: v for k, v in data["previous"].items() if k != "previous"}
+    tmp = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+def list_namespace_ids(prefixes: List[str]) -> Set[str]:
+    """Existing vector ids (serverless list API); empty if the index can't list."""
+    ids: Set[str] = set()
+    try:
+        for prefix in prefixes:
+            for page in index.list(prefix=prefix, namespace=NAMESPACE):
+                ids.update(page)
+    except Exception as e:
+        print(f"[INFO] Could not list existing ids ({e}); orphans from before the manifest are kept.")
+    return ids
+
+def make_record(doc_id: str, cid: str, text: str, meta: Dict[str, Any]) -> tuple:
+    """(id, text, metadata, hash) for one chunk."""
+    # Prepare metadata, including a truncated text preview for Pinecone
+    metadata_payload = {
+        "url": meta["url"],
+        "source": meta["source"],
+        "doc_id": doc_id,
+        "section": meta["section"],
+        "start_char": meta["start_char"],
+        "end_char": meta["end_char"],
+        "char_len": len(text),
+        "text": text[:4000]  # Pinecone metadata has size limits, truncate text
+    }
+    if meta.get("alias_urls"):
+        # Same passage on other pages (near-duplicates folded into this chunk)
+        metadata_payload["alias_urls"] = meta["alias_urls"]
+    return (cid, text, metadata_payload, content_hash(text, metadata_payload))
+
+def fetch_vectors(ids: List[str]) -> Dict[str, List[float]]:
+    """Vectors already in the namespace (backfills a snapshot for chunks embedded before snapshots existed)."""
+    found: Dict[str, List[float]] = {}
+    for batch in chunk_list(ids, FETCH_BATCH):
+        try:
+            res = index.fetch(ids=batch, namespace=NAMESPACE)
+        except Exception as e:
+            print(f"[INFO] Could not fetch vectors for the snapshot ({e}).")
+            break
+        for cid, v in res.vectors.items():
+            found[cid] = v.values
+    return found
+
+def read_records(doc_dir: pathlib.Path) -> List[tuple]:
+    """(id, text, metadata, hash) for every non-empty chunk file in a doc dir."""
+    records = []
+    for cp in sorted(doc_dir.glob("chunk_*.txt")):
+        obj = parse_header_and_text(cp)
+        if not obj["text"]:
+            continue
+        # Create a unique ID for each chunk
+        cid = f"{doc_dir.name}#{cp.stem}"
+        records.append(make_record(doc_dir.name, cid, obj["text"], obj["meta"]))
+    return records
+
+def store_docs(store: ChunkStore) -> Dict[str, List[str]]:
+    """doc id -> its chunk ids, in store order."""
+    docs: Dict[str, List[str]] = defaultdict(list)
+    for cid in store.ids():
+        docs[cid.split("#", 1)[0]].append(cid)
+    return docs
+
+def read_store_records(store: ChunkStore, doc_id: str, ids: List[str]) -> List[tuple]:
+    """Same records as read_records, from the chunk store."""
+    records = []
+    for cid in ids:
+        rec = store.get(cid)
+        if rec["text"]:
+            records.append(make_record(doc_id, cid, rec["text"], rec["meta"]))
+    return records
+
+# --- Client Initialization ---
+
+# Configure the Gemini client using the API key
+if not GEMINI_API_KEY:
+    raise ValueError("GEMINI_API_KEY not found in environment variables.")
+genai.configure(api_key=GEMINI_API_KEY)
+
+# Initialize Pinecone client
+if not PINECONE_API_KEY:
+    raise ValueError("PINECONE_API_KEY not found in environment variables.")
+pc = Pinecone(api_key=PINECONE_API_KEY)
+
+# Ensure index exists with the correct dimension and metric
+if PINECONE_INDEX not in pc.list_indexes().names():
+    print(f"Creating Pinecone index: {PINECONE_INDEX}...")
+    pc.create_index(
+        name=PINECONE_INDEX,
+        dimension=OUTPUT_DIMENSIONALITY,  # Must match your embedding model
+        metric="cosine",                 # Recommended for semantic search
+        spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION),
+    )
+index = pc.Index(PINECONE_INDEX)
+print("Pinecone index is ready.")
+
+# --- Pipeline ---
+
+_DONE = object()  # queue sentinel
+
+def is_rate_limit(e: Exception) -> bool:
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+def backoff(attempt: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+
+class AdaptiveBatch:
+    """
+    Embed batch size shared by all embed workers (AIMD): halved on a rate
+    limit, grown by EMBED_BATCH_STEP after each success. A rate limit also
+    pauses every worker until the cooldown passes.
+    """
+    def __init__(self, start: int, lo: int, hi: int):
+        self.size, self.lo, self.hi = start, lo, hi
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._cooldown_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def success(self):
+        with self._lock:
+            self.size = min(self.hi, self.size + EMBED_BATCH_STEP)
+
+    def throttled(self, attempt: int):
+        with self._lock:
+            self.size = max(self.lo, self.size // 2)
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + backoff(attempt))
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = self.embedded = self.reused = self.upserted = self.failed = self.throttled = 0
+        self.t0 = time.time()
+
+    def add(self, **kw):
+        with self.lock:
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def line(self) -> str:
+        dt = max(1e-9, time.time() - self.t0)
+        return (f"[progress] queued {self.queued} | embedded {self.embedded} | reused {self.reused} "
+                f"| upserted {self.upserted} "
+                f"({self.upserted / dt:.1f} vec/s) | failed {self.failed} | throttled {self.throttled}")
+
+def embed_worker(in_q: "queue.Queue", out_q: "queue.Queue", batcher: AdaptiveBatch, stats: Stats):
+    """Pulls records, embeds them in adaptive batches, pushes (vector, hash) downstream."""
+    done = False
+    while not done:
+        first = in_q.get()
+        if first is _DONE:
+            return
+        batch = [first]
+        while len(batch) < batcher.size:
+            try:
+                r = in_q.get(timeout=0.05)
+            except queue.Empty:
+                break
+            if r is _DONE:
+                done = True
+                break
+            batch.append(r)
+
+        try:
+            embed_batch(batch, out_q, batcher, stats)
+        except Exception as e:
+            # Never let the thread die: the producer would block on a full queue forever
+            print(f"An unexpected error occurred during embedding ({len(batch)} chunks dropped): {e!r}")
+            stats.add(failed=len(batch))
+
+def embed_batch(batch: List[tuple], out_q: "queue.Queue", batcher: AdaptiveBatch, stats: Stats):
+    """Embeds `batch` with retries; consumes it in place, so on an exception `batch` holds what is left."""
+    # Re-slice on every attempt: a rate limit shrinks batcher.size mid-batch
+    attempt = 0
+    while batch:
+        sub = batch[:batcher.size]
+        batcher.wait()
+        try:
+            # Embed in one call with task_type tuned for storing documents for search
+            result = genai.embed_content(
+                model=EMBED_MODEL,
+                content=[r[1] for r in sub],
+                task_type="retrieval_document",  # Use "retrieval_document" for RAG
+                output_dimensionality=OUTPUT_DIMENSIONALITY
+            )
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                print(f"An error occurred during embedding: {e}")
+                stats.add(failed=len(sub))
+                del batch[:len(sub)]
+                attempt = 0
+                continue
+            if is_rate_limit(e):
+                stats.add(throttled=1)
+                batcher.throttled(attempt)
+            else:
+                time.sleep(backoff(attempt))
+            attempt += 1
+            continue
+
+        embeddings = result['embedding']
+        if len(embeddings) != len(sub):
+            raise ValueError(f"got {len(embeddings)} embeddings for {len(sub)} chunks")
+        batcher.success()
+        stats.add(embedded=len(sub))
+        for (cid, _text, meta, h), emb in zip(sub, embeddings):
+            out_q.put(({"id": cid, "values": emb, "metadata": meta}, h))
+        del batch[:len(sub)]
+        attempt = 0
+
+def upsert_worker(in_q: "queue.Queue", manifest: Dict[str, Any], manifest_lock: threading.Lock,
+                  upserted: Dict[str, Any], stats: Stats):
+    """Upserts UPSERT_BATCH vectors at a time with retries; records successes in the manifest (+ `upserted` for the snapshot)."""
+    pending: List[tuple] = []
+
+    def flush():
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                index.upsert(vectors=[v for v, _ in pending], namespace=NAMESPACE)
+                break
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    # not recorded in the manifest -> retried on the next run
+                    print(f"An error occurred during Pinecone upsert: {e}")
+                    stats.add(failed=len(pending))
+                    pending.clear()
+                    return
+                time.sleep(backoff(attempt))
+        with manifest_lock:
+            for v, h in pending:
+                manifest["chunks"][v["id"]] = h
+                upserted[v["id"]] = v["values"]
+        stats.add(upserted=len(pending))
+        pending.clear()
+
+    while True:
+        try:
+            item = in_q.get(timeout=0.5)
+        except queue.Empty:
+            if pending:
+                flush()
+            continue
+        if item is _DONE:
+            if pending:
+                flush()
+            return
+        pending.append(item)
+        if len(pending) >= UPSERT_BATCH:
+            flush()
+
+def load_records(targets: List[tuple], use_dedup: bool, dedup_report: List[Dict[str, Any]]):
+    """
+    Yields lists of records: one per doc as it is read, or, with dedup (which
+    needs the whole corpus), a single deduplicated list.
+    """
+    if not use_dedup:
+        for name, load in targets:
+            recs = load()
+            if not recs:
+                print(f"[INFO] No eligible chunks found in {name}")
+            yield recs
+        return
+    everything: List[tuple] = []
+    for name, load in targets:
+        recs = load()
+        if not recs:
+            print(f"[INFO] No eligible chunks found in {name}")
+        everything.extend(recs)
+    kept, report = dedup.dedup_records(everything, make_record=make_record)
+    dedup_report.extend(report)
+    yield kept
+
+def produce_records(batches, known: Dict[str, str], out_q: "queue.Queue",
+                    records_out: List[tuple], stats: Stats, snapshot=None, upsert_q: Optional["queue.Queue"] = None):
+    """
+    Streams new/changed records (from load_records) to the embedders as they
+    are read. Records whose vector is in `snapshot` skip Gemini.
+    """
+    for recs in batches:
+        records_out.extend(recs)
+        for r in recs:
+            if known.get(r[0]) != r[3]:
+                stats.add(queued=1)
+                vec = snapshot.vector(r[0], r[3]) if snapshot is not None else None
+                if vec is not None:
+                    stats.add(reused=1)
+                    upsert_q.put(({"id": r[0], "values": vec.tolist(), "metadata": r[2]}, r[3]))
+                else:
+                    out_q.put(r)
+
+# --- Blue/green publishing ---
+
+def wait_until_visible(namespace: str, expected: int) -> bool:
+    """Upserts are eventually consistent: wait until the namespace reports every vector."""
+    deadline = time.time() + VISIBLE_TIMEOUT
+    while True:
+        count = namespace_counts(index).get(namespace, 0)
+        if count >= expected:
+            return True
+        if time.time() > deadline:
+            print(f"[ERROR] {namespace} shows {count}/{expected} vectors after {VISIBLE_TIMEOUT:.0f}s")
+            return False
+        time.sleep(2.0)
+
+def _match_refs(m) -> str:
+    md = m["metadata"] or {}
+    return " ".join([md.get("doc_id", ""), md.get("url", "")] + list(md.get("alias_urls", [])))
+
+def smoke_test(namespace: str) -> bool:
+    """Every smoke query must hit a relevant chunk (url/doc id contains "expect") with a decent score."""
+    with open(SMOKE_QUERIES, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    result = genai.embed_content(model=EMBED_MODEL, content=[c["query"] for c in cases],
+                                 task_type="retrieval_query", output_dimensionality=OUTPUT_DIMENSIONALITY)
+    ok = True
+    for case, vec in zip(cases, result["embedding"]):
+        res = index.query(vector=vec, top_k=SMOKE_TOP_K, include_metadata=True, namespace=namespace)
+        matches = res.get("matches", [])
+        best = max((m["score"] for m in matches), default=0.0)
+        expect = case.get("expect", "")
+        hit = not expect or any(expect in _match_refs(m) for m in matches)
+        passed = hit and best >= SMOKE_MIN_SCORE
+        ok = ok and passed
+        print(f"  [{'ok' if passed else 'FAIL'}] {best:.3f} {case['query']}")
+    return ok
+
+def publish(namespace: str, expected: int, **info) -> bool:
+    """Validates `namespace` and points serving at it; then garbage-collects old versions."""
+    print(f"Validating {namespace} ({expected} vectors)...")
+    if not wait_until_visible(namespace, expected) or not smoke_test(namespace):
+        print(f"[ERROR] {namespace} failed validation; serving is unchanged.")
+        return False
+    try:
+        current = read_active(index)
+    except Exception:
+        current = None
+    previous_ns = current["namespace"] if current else NAMESPACE_BASE
+    write_active(index, namespace, OUTPUT_DIMENSIONALITY, previous=previous_ns, **info)
+    print(f"Serving switched: {previous_ns} -> {namespace}")
+    dropped = gc_namespaces(index, NAMESPACE_BASE, protect={namespace, previous_ns}, keep=KEEP_NAMESPACES)
+    if dropped:
+        print(f"Deleted old namespaces: {', '.join(dropped)}")
+    return True
+
+# --- Main Execution Logic ---
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and re-embed every chunk")
+    ap.add_argument("--dry-run", action="store_true", help="print the diff without embedding or deleting")
+    ap.add_argument("--store", default=None, help="read chunks from this chunk store file instead of CHUNKS_DIR")
+    ap.add_argument("--no-snapshot", action="store_true", help="don't write a local embedding snapshot")
+    ap.add_argument("--no-dedup", action="store_true", help="embed near-duplicate chunks too")
+    ap.add_argument("--versioned", action="store_true",
+                    help="build a new namespace, validate it, then switch serving to it (blue/green)")
+    ap.add_argument("--activate", default=None, metavar="NAMESPACE",
+                    help="point serving at an existing namespace (e.g. roll back) and exit")
+    args = ap.parse_args()
+
+    NAMESPACE_BASE = NAMESPACE
+    if args.activate:
+        count = namespace_counts(index).get(args.activate, 0)
+        if not count:
+            raise SystemExit(f"Namespace '{args.activate}' is empty or missing in {PINECONE_INDEX}.")
+        write_active(index, args.activate, OUTPUT_DIMENSIONALITY, vectors=count)
+        print(f"Serving switched to {args.activate} ({count} vectors).")
+        raise SystemExit(0)
+    if not args.versioned:
+        # Once serving follows the pointer, updating the base namespace in place changes nothing served
+        current = read_active(index)
+        if current and current["namespace"] != NAMESPACE_BASE:
+            if ONLY_DOCS:
+                raise SystemExit(f"Serving reads {current['namespace']}, not {NAMESPACE_BASE}: "
+                                 "clear ONLY_DOCS and run with --versioned to publish a new version.")
+            print(f"[INFO] Serving reads {current['namespace']}; building a new version (--versioned).")
+            args.versioned = True
+    if args.versioned and ONLY_DOCS:
+        # A versioned build starts empty and becomes the whole served KB on publish
+        raise SystemExit("--versioned builds the full corpus; clear ONLY_DOCS first.")
+    if args.versioned:
+        # Module global: the workers upsert into NAMESPACE
+        NAMESPACE = f"{NAMESPACE_BASE}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}"
+        print(f"Building versioned namespace {NAMESPACE}")
+
+    # Resolve which docs to process: (name, loader) pairs
+    if args.store:
+        store = ChunkStore(args.store)
+        targets = [(doc, lambda doc=doc, ids=ids: read_store_records(store, doc, ids))
+                   for doc, ids in store_docs(store).items()]
+    else:
+        # Source folders (skip chunking's .cache / temp dirs)
+        targets = [(p.name, lambda p=p: read_records(p)) for p in sorted(pathlib.Path(CHUNKS_DIR).glob("*"))
+                   if p.is_dir() and not p.name.startswith(".")]
+    if ONLY_DOCS:
+        targets = [t for t in targets if t[0] in ONLY_DOCS]
+
+    t0 = time.time()
+    manifest = load_manifest()
+    if not targets and not manifest["chunks"]:
+        print(f"No matching docs found in '{args.store or CHUNKS_DIR}'. Check the path and your ONLY_DOCS list.")
+        raise SystemExit(0)
+    # Snapshots: upserters update manifest["chunks"] while the diff is still being computed
+    previous: Dict[str, str] = dict(manifest["chunks"])
+    known: Dict[str, str] = {} if args.force else previous
+    # Latest local snapshot: reused for any chunk it holds with the same content (unless --force)
+    snapshot = load_snapshot(SNAPSHOT_DIR)
+    if snapshot is not None and not snapshot.matches(EMBED_MODEL, OUTPUT_DIMENSIONALITY):
+        snapshot = None
+    upserted: Dict[str, Any] = {}
+
+    # --- Stage threads: parse -> embed -> upsert ---
+    embed_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_SIZE)
+    upsert_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_SIZE)
+    batcher = AdaptiveBatch(EMBED_BATCH, MIN_EMBED_BATCH, EMBED_BATCH)
+    stats = Stats()
+    manifest_lock = threading.Lock()
+    records: List[tuple] = []
+    dedup_report: List[Dict[str, Any]] = []
+    batches = load_records(targets, not args.no_dedup, dedup_report)
+
+    live = not args.dry_run
+    embedders = [threading.Thread(target=embed_worker, args=(embed_q, upsert_q, batcher, stats), daemon=True)
+                 for _ in range(EMBED_WORKERS)] if live else []
+    upserters = [threading.Thread(target=upsert_worker, args=(upsert_q, manifest, manifest_lock, upserted, stats),
+                                  daemon=True)
+                 for _ in range(UPSERT_WORKERS)] if live else []
+
+    def save_progress(final: bool = False):
+        with manifest_lock:
+            save_manifest(manifest, keep_previous=not final)
+
+    if live:
+        # The ingest worker cancels with SIGTERM: unwind through the `finally` below like Ctrl-C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    for t in embedders + upserters:
+        t.start()
+
+    # Everything upserted so far is saved periodically and on any exit, so an
+    # interrupted run only redoes the chunks it had not upserted yet.
+    completed = False
+    try:
+        if live:
+            producer = threading.Thread(target=produce_records, daemon=True,
+                                        args=(batches, known, embed_q, records, stats,
+                                              None if args.force else snapshot, upsert_q))
+            producer.start()
+        else:
+            for recs in batches:
+                records.extend(recs)
+
+        def report():
+            while any(t.is_alive() for t in embedders + upserters):
+                time.sleep(PROGRESS_EVERY)
+                print(stats.line())
+                if live:
+                    save_progress()
+        threading.Thread(target=report, daemon=True).start()
+
+        if live:
+            producer.join()
+
+        # --- Diff summary (parsing is done; embedding may still be running) ---
+        current_ids = {r[0] for r in records}
+        new = [r for r in records if r[0] not in known]
+        changed = [r for r in records if r[0] in known and known[r[0]] != r[3]]
+        unchanged = len(records) - len(new) - len(changed)
+
+        # Orphans: ids we embedded before (or that exist in the namespace, on the first
+        # run) whose chunk is gone. With ONLY_DOCS, only those docs are considered.
+        in_scope = (lambda cid: cid.split("#", 1)[0] in ONLY_DOCS) if ONLY_DOCS else (lambda cid: True)
+        previous_ids = set(previous) | set(manifest.get("previous", {}).get("chunks", {}))
+        if args.versioned:
+            previous_ids = set()  # fresh namespace: nothing to delete
+        elif not manifest["exists"]:
+            prefixes = [f"{d}#" for d in ONLY_DOCS] if ONLY_DOCS else [""]
+            previous_ids |= list_namespace_ids(prefixes)
+        orphans = sorted(cid for cid in previous_ids if in_scope(cid) and cid not in current_ids)
+
+        dupes = sum(len(c["duplicates"]) for c in dedup_report)
+        print(f"Dedup: {len(dedup_report)} near-duplicate clusters, {dupes} chunks removed")
+        if args.dry_run:
+            for c in dedup_report:
+                print(f"  keep {c['canonical']}  drop {', '.join(c['duplicates'])}")
+        print(f"Diff: {len(new)} new, {len(changed)} changed, {unchanged} unchanged, {len(orphans)} to delete")
+        if args.dry_run:
+            raise SystemExit(0)
+
+        # --- Delete orphans in bulk (concurrently with the tail of the pipeline) ---
+        deleted = 0
+        for batch in chunk_list(orphans, DELETE_BATCH):
+            try:
+                index.delete(ids=batch, namespace=NAMESPACE)
+                deleted += len(batch)
+                with manifest_lock:
+                    for cid in batch:
+                        manifest["chunks"].pop(cid, None)
+            except Exception as e:
+                print(f"An error occurred during Pinecone delete: {e}")
+
+        # --- Drain: embedders first, then upserters ---
+        for _ in embedders:
+            embed_q.put(_DONE)
+        for t in embedders:
+            t.join()
+        for _ in upserters:
+            upsert_q.put(_DONE)
+        for t in upserters:
+            t.join()
+        completed = True
+    finally:
+        if live:
+            save_progress(final=completed)
+
+    # --- Snapshot: every chunk now in the namespace, with its vector ---
+    snap_note = "no snapshot"
+    if not args.no_snapshot:
+        in_index = [r for r in records if manifest["chunks"].get(r[0]) == r[3]]
+        vectors: Dict[str, Any] = {}
+        backfill = []
+        for r in in_index:
+            vec = upserted.get(r[0])
+            if vec is None and snapshot is not None:
+                vec = snapshot.vector(r[0], r[3])
+            if vec is None:
+                backfill.append(r[0])
+            else:
+                vectors[r[0]] = vec
+        if backfill:
+            vectors.update(fetch_vectors(backfill))
+        rows = [(r[0], r[3], r[2], vectors[r[0]]) for r in in_index if r[0] in vectors]
+        # Same ids + hashes => same vectors (reused from it), unless --force re-embedded them
+        same = (snapshot is not None and not args.force
+                and [(cid, h) for cid, h, _, _ in rows] == list(zip(snapshot.ids, snapshot.hashes)))
+        if same:
+            snap_note = f"snapshot {snapshot.version} unchanged"
+        elif rows:
+            version = write_snapshot(SNAPSHOT_DIR, rows, model=EMBED_MODEL, dim=OUTPUT_DIMENSIONALITY,
+                                     extra={"index": PINECONE_INDEX, "namespace": NAMESPACE},
+                                     keep=KEEP_SNAPSHOTS)
+            snap_note = f"snapshot {version} ({len(rows)} vectors, {len(in_index) - len(rows)} missing)"
+
+    elapsed = time.time() - t0
+    print(f"\n✅ Done in {elapsed:.1f}s: upserted {stats.upserted} vectors "
+          f"({len(new)} new, {len(changed)} changed; {stats.upserted / max(elapsed, 1e-9):.1f} vec/s), "
+          f"{stats.reused} from the snapshot; skipped {unchanged} unchanged, {dupes} near-duplicates, "
+          f"deleted {deleted} orphans, "
+          f"{stats.failed} failed, {stats.throttled} rate-limited calls (final embed batch {batcher.size}) "
+          f"-> {PINECONE_INDEX}/{NAMESPACE}; {snap_note}")
+
+    if args.versioned:
+        if stats.failed:
+            print(f"[ERROR] {stats.failed} chunks failed; not switching serving to an incomplete {NAMESPACE}.")
+            raise SystemExit(1)
+        if not publish(NAMESPACE, len(manifest["chunks"]), vectors=len(manifest["chunks"]), model=EMBED_MODEL):
+            raise SystemExit(1)
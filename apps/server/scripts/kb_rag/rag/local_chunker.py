@@ -0,0 +1,138 @@
+# local_chunker.py
+#
+# Deterministic, offline alternative to gemini_chunk (used by chunking.py --engine local).
+# Same output shape: {"doc_url": url, "chunks": [{"section_title", "start_char", "end_char", "text"}]}
+# where every chunk's text == content[start_char:end_char].
+#
+# Splitting preference: headings > paragraphs > lines > sentences > words.
+# Tokens are counted locally with a word/punctuation regex (close enough to
+# subword counts for sizing; no tokenizer download needed).
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+TARGET_TOKENS = 600
+MIN_TOKENS    = 200
+MAX_TOKENS    = 900      # hard cap for a single chunk
+CHUNKER_VERSION = 1      # bump when the algorithm changes (invalidates the manifest)
+
+TOKEN_RE    = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+PARA_RE     = re.compile(r"[^\n]*\S[^\n]*(?:\n[^\n]*\S[^\n]*)*")   # runs of non-blank lines
+LINE_RE     = re.compile(r"[^\n]*\S[^\n]*")
+SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+[\"'”’)\]]*(?=\s)|$)", re.S)
+MD_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+
+# (start, end, is_heading) spans into the original text
+Span = Tuple[int, int, bool]
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+def _is_heading(line: str, next_line: Optional[str]) -> bool:
+    s = line.strip()
+    if MD_HEADING_RE.match(line):
+        return True
+    if not s or len(s) > 80 or len(s.split()) > 10:
+        return False
+    if s[-1] in ".,;:" or not (s[0].isupper() or s[0].isdigit()):
+        return False
+    # A heading introduces body text: the next line is a real paragraph line
+    return next_line is not None and len(next_line.strip()) > 80
+
+def _units(text: str) -> List[Span]:
+    """Paragraph-level spans; heading lines become their own spans."""
+    spans: List[Span] = []
+    for para in PARA_RE.finditer(text):
+        lines = list(LINE_RE.finditer(text, para.start(), para.end()))
+        run_start = None
+        for i, ln in enumerate(lines):
+            nxt = lines[i + 1].group(0) if i + 1 < len(lines) else None
+            if _is_heading(ln.group(0), nxt):
+                if run_start is not None:
+                    spans.append((run_start, lines[i - 1].end(), False))
+                    run_start = None
+                spans.append((ln.start(), ln.end(), True))
+            elif run_start is None:
+                run_start = ln.start()
+        if run_start is not None:
+            spans.append((run_start, lines[-1].end(), False))
+    return spans
+
+def _split_big(text: str, start: int, end: int, max_tokens: int) -> List[Span]:
+    """Breaks an oversized span into line, then sentence, then word pieces."""
+    if count_tokens(text[start:end]) <= max_tokens:
+        return [(start, end, False)]
+    for regex in (LINE_RE, SENTENCE_RE):
+        parts = [(m.start(), m.end()) for m in regex.finditer(text, start, end)]
+        if len(parts) > 1:
+            out: List[Span] = []
+            for s, e in parts:
+                out.extend(_split_big(text, s, e, max_tokens))
+            return out
+    # single huge "sentence": cut on whitespace every max_tokens tokens
+    out, piece_start, n = [], start, 0
+    for m in TOKEN_RE.finditer(text, start, end):
+        if n == max_tokens:
+            out.append((piece_start, m.start(), False))
+            piece_start, n = m.start(), 0
+        n += 1
+    out.append((piece_start, end, False))
+    return out
+
+def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def chunk_text(content: str, url: str = "",
+               target_tokens: int = TARGET_TOKENS,
+               min_tokens: int = MIN_TOKENS,
+               max_tokens: int = MAX_TOKENS) -> Dict[str, Any]:
+    units: List[Span] = []
+    for s, e, is_heading in _units(content):
+        units.extend([(s, e, True)] if is_heading else _split_big(content, s, e, max_tokens))
+
+    # Greedy packing: prefer to break before headings, never exceed max_tokens
+    chunks: List[Dict[str, Any]] = []
+    section = ""
+    cur_start = cur_end = None
+    cur_tokens = 0
+    cur_section = ""
+
+    def flush():
+        nonlocal cur_start, cur_end, cur_tokens
+        if cur_start is not None:
+            s, e = _trim(content, cur_start, cur_end)
+            if s < e:
+                chunks.append({"section_title": cur_section, "start_char": s, "end_char": e,
+                               "tokens": cur_tokens})
+        cur_start = cur_end = None
+        cur_tokens = 0
+
+    for s, e, is_heading in units:
+        n = count_tokens(content[s:e])
+        if cur_start is not None:
+            over_target = cur_tokens + n > target_tokens and cur_tokens >= min_tokens
+            over_max = cur_tokens + n > max_tokens
+            if (is_heading and cur_tokens >= min_tokens) or over_target or over_max:
+                flush()
+        if is_heading:
+            section = content[s:e].strip().lstrip("#").strip()
+        if cur_start is None:
+            cur_start, cur_section = s, section
+        cur_end = e
+        cur_tokens += n
+    flush()
+
+    # Fold a short tail into its predecessor when it fits
+    if len(chunks) > 1 and chunks[-1]["tokens"] < min_tokens \
+            and chunks[-2]["tokens"] + chunks[-1]["tokens"] <= max_tokens:
+        tail = chunks.pop()
+        chunks[-1]["end_char"] = tail["end_char"]
+        chunks[-1]["tokens"] += tail["tokens"]
+
+    for c in chunks:
+        c["text"] = content[c["start_char"]:c["end_char"]]
+        del c["tokens"]
+    return {"doc_url": url, "chunks": chunks}
@@ -0,0 +1,100 @@
+# restore_snapshot.py
+#
+# Bulk-loads a Pinecone index/namespace from a local embedding snapshot written
+# by embedding.py (chunks/.snapshots/<version>). No Gemini calls: after an index
+# loss, or to populate a new index/namespace, this is pure local I/O + upserts.
+#
+# --write-manifest also records the loaded chunks in chunks/_embed_manifest.json
+# for that target, so the next embedding.py run against it is incremental.
+#
+#   python restore_snapshot.py [--snapshot latest|<version>] [--index ppd-v1] [--namespace ppd]
+#                              [--workers 4] [--batch 96] [--write-manifest]
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+
+from dotenv import load_dotenv
+from pinecone import Pinecone, ServerlessSpec
+
+# apps/server on the path for the shared snapshot format
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[3]))
+from src.controllers.kb_snapshot import bulk_load, load_snapshot  # noqa: E402
+
+load_dotenv()
+
+# --- ENV / Config ---
+PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
+PINECONE_INDEX   = os.getenv("PINECONE_INDEX", "ppd-v1")
+PINECONE_REGION  = os.getenv("PINECONE_REGION", "us-east-1")
+NAMESPACE        = "ppd"
+
+CHUNKS_DIR   = os.getenv("KB_CHUNKS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunks"))
+SNAPSHOT_DIR = os.path.join(CHUNKS_DIR, ".snapshots")
+MANIFEST_PATH = os.path.join(CHUNKS_DIR, "_embed_manifest.json")
+
+MAX_RETRIES  = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX  = 60.0
+
+def upsert_with_retry(index, namespace: str, ids, vectors, metadata):
+    batch = [{"id": cid, "values": vec.tolist(), "metadata": meta}
+             for cid, vec, meta in zip(ids, vectors, metadata)]
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            index.upsert(vectors=batch, namespace=namespace)
+            return
+        except Exception:
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def write_manifest(snapshot, index_name: str, namespace: str):
+    data = {"index": index_name, "namespace": namespace,
+            "model": snapshot.info["model"], "dim": snapshot.info["dim"],
+            "chunks": dict(zip(snapshot.ids, snapshot.hashes))}
+    tmp = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--snapshot", default="latest", help="snapshot version under chunks/.snapshots")
+    ap.add_argument("--index", default=PINECONE_INDEX)
+    ap.add_argument("--namespace", default=NAMESPACE)
+    ap.add_argument("--batch", type=int, default=96)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--write-manifest", action="store_true",
+                    help="make the embed manifest point at this target and snapshot")
+    args = ap.parse_args()
+
+    snapshot = load_snapshot(SNAPSHOT_DIR, args.snapshot)
+    if snapshot is None:
+        raise SystemExit(f"No snapshot '{args.snapshot}' in {SNAPSHOT_DIR}; run embedding.py first.")
+    info = snapshot.info
+    print(f"Snapshot {snapshot.version}: {len(snapshot)} vectors, {info['model']} dim={info['dim']}")
+
+    if not PINECONE_API_KEY:
+        raise ValueError("PINECONE_API_KEY not found in environment variables.")
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    if args.index not in pc.list_indexes().names():
+        print(f"Creating Pinecone index: {args.index}...")
+        pc.create_index(
+            name=args.index,
+            dimension=info["dim"],
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION),
+        )
+    index = pc.Index(args.index)
+
+    t0 = time.time()
+    loaded = bulk_load(snapshot, lambda ids, vecs, metas: upsert_with_retry(index, args.namespace, ids, vecs, metas),
+                       batch_size=args.batch, workers=args.workers)
+    if args.write_manifest:
+        write_manifest(snapshot, args.index, args.namespace)
+    elapsed = time.time() - t0
+    print(f"✅ Loaded {loaded} vectors into {args.index}/{args.namespace} in {elapsed:.1f}s "
+          f"({loaded / max(elapsed, 1e-9):.1f} vec/s), 0 embedding calls")
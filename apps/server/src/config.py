@@ -6,6 +6,59 @@ from dataclasses import dataclass
 class Settings:
     SECRET_KEY: str
     SQLALCHEMY_DATABASE_URI: str
+    # Comma-separated emails allowed on /api/admin (matched against the JWT user's Users.email)
+    ADMIN_EMAILS: str
+    # Mood rollups: start the worker in create_app() (python app.py always does; set "1" on one
+    # gunicorn service), job interval (0 = don't start the worker), events per pass, min event age before rollup,
+    # how far back each pass re-folds recent buckets (catches ids committed after the watermark passed them)
+    MOOD_ROLLUP_ENABLED: bool
+    MOOD_ROLLUP_INTERVAL_S: float
+    MOOD_ROLLUP_BATCH: int
+    MOOD_ROLLUP_SETTLE_S: float
+    MOOD_ROLLUP_OVERLAP_S: float
+    # KB ingestion: source JSON dir, chunk output dir (chunking.py / embedding.py; ingest jobs run them)
+    KB_SOURCES_DIR: str
+    KB_CHUNKS_DIR: str
+    # Ingest worker: queue poll interval, progress/heartbeat interval, running job considered lost after
+    INGEST_POLL_S: float
+    INGEST_HEARTBEAT_S: float
+    INGEST_STALE_S: float
+    # KB chunk store file (scripts/chunk_store.py import); "" = use the text preview in Pinecone metadata
+    KB_CHUNK_STORE: str
+    # Seconds to cache the blue/green KB namespace pointer (embedding.py --versioned) per process
+    KB_NAMESPACE_TTL_S: float
+    # FER model: backend (eager|torchscript|onnx|auto), weights path, intra-op threads (0 = library default)
+    FER_BACKEND: str
+    FER_MODEL_PATH: str
+    FER_INTRA_OP_THREADS: int
+    # FER model registry: versioned artifacts dir ("" = serve FER_MODEL_PATH only), ACTIVE poll interval (0 = off)
+    FER_MODEL_DIR: str
+    FER_MODEL_POLL_S: float
+    # FER micro-batching: max crops per forward pass / max time to wait for peers
+    FER_BATCH_MAX_SIZE: int
+    FER_BATCH_MAX_WAIT_MS: float
+    # FER decode: reject larger uploads before decoding; Haar runs on a copy this size
+    FER_MAX_IMAGE_BYTES: int
+    FER_DETECT_MAX_SIDE: int
+    # FER worker processes (0 = run in the request thread), torch/ORT threads each, shared-memory frame slot size
+    FER_WORKERS: int
+    FER_WORKER_THREADS: int
+    FER_POOL_SLOT_BYTES: int
+    # FER WebSocket stream: EMA weight of the newest frame's probs
+    FER_STREAM_EMA_ALPHA: float
+    # FER batch endpoint: max images per request, max faces classified per image
+    FER_BATCH_MAX_IMAGES: int
+    FER_MAX_FACES_PER_IMAGE: int
+    # FER per-session perceptual-hash cache: dHash side (bits = side^2), max Hamming distance (<0 disables),
+    # entry TTL, entries per session
+    FER_CACHE_HASH_SIZE: int
+    FER_CACHE_MAX_DISTANCE: int
+    FER_CACHE_TTL_S: float
+    FER_CACHE_PER_SESSION: int
+    # FER per-session face tracking: track lifetime, ROI padding (fraction of box), LRU cap
+    FER_TRACK_TTL_S: float
+    FER_TRACK_PAD: float
+    FER_TRACK_MAX_SESSIONS: int
 
 def _default_db_uri() -> str:
     # Prefer DATABASE_URL if set. Fallback to local Postgres, then SQLite.
@@ -17,7 +70,45 @@ def _default_db_uri() -> str:
     # If you don't have Postgres yet, you can temporarily use:
     # return "sqlite:///dev.db"
 
+# scripts/kb_rag/rag (chunking.py, embedding.py)
+_KB_RAG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "kb_rag", "rag")
+
 settings = Settings(
     SECRET_KEY=os.getenv("SECRET_KEY", "dev-secret-key-change-me"),
     SQLALCHEMY_DATABASE_URI=_default_db_uri(),
+    ADMIN_EMAILS=os.getenv("ADMIN_EMAILS", ""),
+    MOOD_ROLLUP_ENABLED=os.getenv("MOOD_ROLLUP_ENABLED", "0") == "1",
+    MOOD_ROLLUP_INTERVAL_S=float(os.getenv("MOOD_ROLLUP_INTERVAL_S", "60")),
+    MOOD_ROLLUP_BATCH=int(os.getenv("MOOD_ROLLUP_BATCH", "5000")),
+    MOOD_ROLLUP_SETTLE_S=float(os.getenv("MOOD_ROLLUP_SETTLE_S", "5")),
+    MOOD_ROLLUP_OVERLAP_S=float(os.getenv("MOOD_ROLLUP_OVERLAP_S", "300")),
+    KB_SOURCES_DIR=os.getenv("KB_SOURCES_DIR", os.path.normpath(os.path.join(_KB_RAG_DIR, "..", "sources"))),
+    KB_CHUNKS_DIR=os.getenv("KB_CHUNKS_DIR", os.path.join(_KB_RAG_DIR, "chunks")),
+    INGEST_POLL_S=float(os.getenv("INGEST_POLL_S", "2")),
+    INGEST_HEARTBEAT_S=float(os.getenv("INGEST_HEARTBEAT_S", "2")),
+    INGEST_STALE_S=float(os.getenv("INGEST_STALE_S", "120")),
+    KB_CHUNK_STORE=os.getenv("KB_CHUNK_STORE", ""),
+    KB_NAMESPACE_TTL_S=float(os.getenv("KB_NAMESPACE_TTL_S", "30")),
+    FER_BACKEND=os.getenv("FER_BACKEND", "eager"),
+    FER_MODEL_PATH=os.getenv("FER_MODEL_PATH", "emotion_cnn.pth"),
+    FER_INTRA_OP_THREADS=int(os.getenv("FER_INTRA_OP_THREADS", "0")),
+    FER_MODEL_DIR=os.getenv("FER_MODEL_DIR", ""),
+    FER_MODEL_POLL_S=float(os.getenv("FER_MODEL_POLL_S", "5")),
+    FER_BATCH_MAX_SIZE=int(os.getenv("FER_BATCH_MAX_SIZE", "16")),
+    FER_BATCH_MAX_WAIT_MS=float(os.getenv("FER_BATCH_MAX_WAIT_MS", "5")),
+    FER_MAX_IMAGE_BYTES=int(os.getenv("FER_MAX_IMAGE_BYTES", str(10 * 1024 * 1024))),
+    FER_DETECT_MAX_SIDE=int(os.getenv("FER_DETECT_MAX_SIDE", "640")),
+    FER_WORKERS=int(os.getenv("FER_WORKERS", "0")),
+    FER_WORKER_THREADS=int(os.getenv("FER_WORKER_THREADS", "1")),
+    FER_POOL_SLOT_BYTES=int(os.getenv("FER_POOL_SLOT_BYTES", str(16 * 1024 * 1024))),
+    FER_STREAM_EMA_ALPHA=float(os.getenv("FER_STREAM_EMA_ALPHA", "0.3")),
+    FER_BATCH_MAX_IMAGES=int(os.getenv("FER_BATCH_MAX_IMAGES", "32")),
+    FER_MAX_FACES_PER_IMAGE=int(os.getenv("FER_MAX_FACES_PER_IMAGE", "16")),
+    FER_CACHE_HASH_SIZE=int(os.getenv("FER_CACHE_HASH_SIZE", "16")),
+    FER_CACHE_MAX_DISTANCE=int(os.getenv("FER_CACHE_MAX_DISTANCE", "6")),
+    FER_CACHE_TTL_S=float(os.getenv("FER_CACHE_TTL_S", "10")),
+    FER_CACHE_PER_SESSION=int(os.getenv("FER_CACHE_PER_SESSION", "8")),
+    FER_TRACK_TTL_S=float(os.getenv("FER_TRACK_TTL_S", "5")),
+    FER_TRACK_PAD=float(os.getenv("FER_TRACK_PAD", "0.5")),
+    FER_TRACK_MAX_SESSIONS=int(os.getenv("FER_TRACK_MAX_SESSIONS", "10000")),
 )
\ No newline at end of file
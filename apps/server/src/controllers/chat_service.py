@@ -1,13 +1,19 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import os
 import json
 import re
 import textwrap
+import threading
+import time
 import google.generativeai as genai
 from rank_bm25 import BM25Okapi
 from dotenv import load_dotenv
 from pinecone import Pinecone
 
+from src.config import settings
+from src.controllers.chunk_store import ChunkStore
+from src.controllers.kb_namespace import ActiveNamespace
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Config
@@ -28,9 +34,10 @@ EMBED_MODEL = "models/text-embedding-004"
 OUTPUT_DIM  = 768
 TOP_K       = 18      # Retrieve more, then re-rank
 FINAL_K     = 6
-NAMESPACE="ppd"
+NAMESPACE="ppd"   # served until a versioned reindex publishes the blue/green pointer
 pc = Pinecone(api_key=PINECONE_API_KEY)
 index = pc.Index(PINECONE_INDEX)
+active_namespace = ActiveNamespace(index, default=NAMESPACE, ttl_s=settings.KB_NAMESPACE_TTL_S)
 print("Clients initialized.")
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -171,7 +178,9 @@ def gemini_rag(user_text: str, context_items: List[Dict[str, str]]) -> str:
     RAG answer for intent==1 using provided context snippets.
     """
     grounding = "\n\n".join(
-        [f"- Source: {c.get('source', 'N/A')} | URL: {c.get('url', 'N/A')}\n  Snippet: {c.get('snippet', '')}"
+        [f"- Source: {c.get('source', 'N/A')} | URL: {c.get('url', 'N/A')}"
+         + (f" | Also at: {', '.join(c['alias_urls'])}" if c.get("alias_urls") else "")
+         + f"\n  Snippet: {c.get('snippet', '')}"
          for c in (context_items or [])]
     )
 
@@ -231,18 +240,87 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     )
     return result['embedding']
 
+_store_lock = threading.Lock()
+_store: Optional[ChunkStore] = None
+_store_stat = None
+# Replaced stores, closed once no request can still hold them: a reader keeps
+# the reference only for one vector_search, far below the grace period.
+_retired_stores: List[Tuple[ChunkStore, float]] = []
+_STORE_GRACE_S = 60.0
+
+
+def _close_retired_stores(now: float) -> None:
+    """Closes (fd + mmap) replaced stores past the grace period. Caller holds _store_lock."""
+    while _retired_stores and now - _retired_stores[0][1] >= _STORE_GRACE_S:
+        _retired_stores.pop(0)[0].close()
+
+
+def _chunk_store() -> Optional[ChunkStore]:
+    """The KB_CHUNK_STORE file, reopened when it is replaced (a new import)."""
+    global _store, _store_stat
+    path = settings.KB_CHUNK_STORE
+    if not path:
+        return None
+    if _retired_stores:
+        with _store_lock:
+            _close_retired_stores(time.monotonic())
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _store
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if key != _store_stat:
+        with _store_lock:
+            if key != _store_stat:
+                try:
+                    new = ChunkStore(path)
+                    if _store is not None:
+                        # requests that already grabbed the old store finish on it; closed after the grace period
+                        _retired_stores.append((_store, time.monotonic()))
+                    _store = new
+                except ValueError as e:
+                    print(f"Chunk store {path} not loaded: {e}")
+                _store_stat = key
+    return _store
+
+
+def _store_text(store: Optional[ChunkStore], md: Dict[str, Any], cid: str) -> Optional[str]:
+    """
+    Full chunk text from the local store, only if it is the text the vector
+    was built from: chunk ids are reused across re-chunks, so the store may be
+    older or newer than the namespace. Checks the span and length recorded in
+    the Pinecone metadata and that the stored text starts with its preview.
+    """
+    rec = store.get(cid) if store is not None else None
+    if rec is None:
+        return None
+    full, meta = rec["text"], rec["meta"]
+    if (len(full) != md.get("char_len")
+            or meta.get("start_char") != md.get("start_char")
+            or meta.get("end_char") != md.get("end_char")
+            or not full.startswith(md.get("text", ""))):
+        return None
+    return full
+
+
 def vector_search(query: str, k=TOP_K):
     """Performs a vector search in Pinecone and normalizes the results."""
     vec = embed_texts([query])[0]
     res = index.query(
-        vector=vec, top_k=k, include_metadata=True, namespace=NAMESPACE
+        vector=vec, top_k=k, include_metadata=True, namespace=active_namespace.get()
     )
     # The new pinecone-client returns a dict-like object
     matches = res.get("matches", [])
-    return [
-        {"id": m["id"], "score": m["score"], "metadata": m["metadata"]}
-        for m in matches
-    ]
+    store = _chunk_store()
+    out = []
+    for m in matches:
+        md = dict(m["metadata"] or {})
+        # Full chunk text from the local store (metadata only carries a truncated preview)
+        full = _store_text(store, md, m["id"])
+        if full is not None:
+            md["text"] = full
+        out.append({"id": m["id"], "score": m["score"], "metadata": md})
+    return out
 
 def bm25_rerank(query: str, matches: List[Dict[str, Any]], final_k=FINAL_K):
     """Re-ranks a list of matches using BM25 lexical search."""
@@ -297,6 +375,7 @@ def build_context(query: str, top_matches: List[Dict[str, Any]]):
             "source": md.get("source", ""),
             "section": md.get("section", ""),
             "doc_id": md.get("doc_id", ""),
+            "alias_urls": md.get("alias_urls", []),  # same passage on other pages (ingest dedup)
             "snippet": comp
         })
     return ctx
@@ -0,0 +1,299 @@
+# src/controllers/chunk_store.py
+"""
+Single-file, memory-mapped store for knowledge-base chunks.
+
+Replaces the `chunks/<doc>/chunk_XXXX.txt` tree (one small file per chunk,
+each with a text header) for everything that reads chunks: ingestion
+(embedding.py --store), evaluation and serving (chat_service fills full
+chunk text from it instead of the truncated Pinecone metadata).
+
+Layout (little-endian, all offsets absolute):
+
+    header   HEADER_FMT: magic, format version, flags, row count, hash slots,
+             offsets of the row table / hash table, offset+length of the
+             store info JSON
+    rows     count x ROW_FMT: (id off, id len, meta off, meta len,
+             text off, stored text len, raw text len)
+    table    slots x SLOT_FMT: (blake2b-64 of the id | 1, row + 1);
+             open addressing, linear probing, 0 = empty slot
+    blobs    ids (utf-8), per-chunk metadata (JSON), texts (utf-8, or one
+             zstd frame per chunk with FLAG_ZSTD so any chunk decodes alone)
+
+Opening a store parses only the header; a lookup by chunk id hashes the id,
+probes the table and slices the mmap — O(1), no per-chunk files or header
+parsing. zstd needs the optional `zstandard` package (write and read).
+
+Chunk ids are the vector ids used in Pinecone: "<doc_id>#chunk_0001".
+"""
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"KBCS"
+FORMAT_VERSION = 1
+FLAG_ZSTD = 0x1
+
+HEADER_FMT = "<4sHHIIQQQI"
+ROW_FMT = "<QIQIQII"
+SLOT_FMT = "<QQ"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+ROW_SIZE = struct.calcsize(ROW_FMT)
+SLOT_SIZE = struct.calcsize(SLOT_FMT)
+
+# Fields of the legacy per-file header ("URL: ...\nSOURCE: ...\n...\n\n<text>")
+HEADER_FIELDS = (("URL", "url"), ("SOURCE", "source"), ("SECTION", "section"),
+                 ("START", "start_char"), ("END", "end_char"))
+
+
+def _id_hash(cid: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(cid.encode("utf-8"), digest_size=8).digest(), "little")
+    return h | 1  # never 0, which marks an empty slot
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ValueError("zstd_unavailable") from e
+    return zstandard
+
+
+# ────────────────────────────────────────────────────────────────
+# 1) Legacy directory layout
+# ────────────────────────────────────────────────────────────────
+def parse_chunk_file(raw: str) -> Tuple[Dict[str, Any], str]:
+    """(meta, text) from one chunk_XXXX.txt body."""
+    header, _, body = raw.partition("\n\n")
+    meta: Dict[str, Any] = {"url": "", "source": "", "section": "", "start_char": None, "end_char": None}
+    for line in header.splitlines():
+        for label, key in HEADER_FIELDS:
+            if line.startswith(label + ":"):
+                v = line.split(":", 1)[1].strip()
+                if key in ("start_char", "end_char"):
+                    meta[key] = int(v) if v.isdigit() else None
+                else:
+                    meta[key] = v
+                break
+    return meta, body.strip()
+
+
+def format_chunk_file(meta: Dict[str, Any], text: str) -> str:
+    """Inverse of parse_chunk_file (the header chunking.py writes)."""
+    return (
+        f"URL: {meta.get('url', '')}\nSOURCE: {meta.get('source', '')}\n"
+        f"SECTION: {meta.get('section', '')}\n"
+        f"START: {meta.get('start_char')}\nEND: {meta.get('end_char')}\n\n{text}"
+    )
+
+
+def iter_chunk_dir(chunks_dir: str) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """(id, text, meta) for every non-empty chunk file, in (doc, chunk) order."""
+    root = pathlib.Path(chunks_dir)
+    for doc_dir in sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith(".")):
+        for cp in sorted(doc_dir.glob("chunk_*.txt")):
+            meta, text = parse_chunk_file(cp.read_text(encoding="utf-8", errors="ignore"))
+            if text:
+                yield f"{doc_dir.name}#{cp.stem}", text, {**meta, "doc_id": doc_dir.name}
+
+
+# ────────────────────────────────────────────────────────────────
+# 2) Writing
+# ────────────────────────────────────────────────────────────────
+def write_store(path: str,
+                records: Iterable[Tuple[str, str, Dict[str, Any]]],
+                *,
+                compress: bool = False,
+                level: int = 10,
+                info: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Writes (id, text, meta) records to `path` atomically (temp file + rename:
+    open readers keep their mapping of the old file). Returns rows written.
+    Raises ValueError('duplicate_chunk_id' | 'zstd_unavailable').
+    """
+    compressor = _zstd().ZstdCompressor(level=level) if compress else None
+    ids: List[bytes] = []
+    metas: List[bytes] = []
+    texts: List[Tuple[bytes, int]] = []
+    seen = set()
+    for cid, text, meta in records:
+        if cid in seen:
+            raise ValueError("duplicate_chunk_id")
+        seen.add(cid)
+        raw = text.encode("utf-8")
+        ids.append(cid.encode("utf-8"))
+        metas.append(json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        texts.append((compressor.compress(raw) if compressor else raw, len(raw)))
+
+    count = len(ids)
+    slots = 1
+    while slots < 2 * count:  # load factor <= 0.5 keeps probes short
+        slots <<= 1
+    info_blob = json.dumps(info or {}, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+    rows_off = HEADER_SIZE
+    table_off = rows_off + count * ROW_SIZE
+    blob_off = table_off + slots * SLOT_SIZE
+    info_off = blob_off
+    cursor = info_off + len(info_blob)
+
+    rows = bytearray(count * ROW_SIZE)
+    table = bytearray(slots * SLOT_SIZE)
+    for i in range(count):
+        id_off = cursor
+        cursor += len(ids[i])
+        meta_off = cursor
+        cursor += len(metas[i])
+        text_off = cursor
+        cursor += len(texts[i][0])
+        struct.pack_into(ROW_FMT, rows, i * ROW_SIZE, id_off, len(ids[i]), meta_off, len(metas[i]),
+                         text_off, len(texts[i][0]), texts[i][1])
+        h = _id_hash(ids[i].decode("utf-8"))
+        slot = h & (slots - 1)
+        while struct.unpack_from(SLOT_FMT, table, slot * SLOT_SIZE)[0]:
+            slot = (slot + 1) & (slots - 1)
+        struct.pack_into(SLOT_FMT, table, slot * SLOT_SIZE, h, i + 1)
+
+    header = struct.pack(HEADER_FMT, MAGIC, FORMAT_VERSION, FLAG_ZSTD if compress else 0,
+                         count, slots, rows_off, table_off, info_off, len(info_blob))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(rows)
+        f.write(table)
+        f.write(info_blob)
+        for i in range(count):
+            f.write(ids[i])
+            f.write(metas[i])
+            f.write(texts[i][0])
+    os.replace(tmp, path)
+    return count
+
+
+def import_dir(chunks_dir: str, path: str, *, compress: bool = False) -> int:
+    """Packs a chunks/<doc>/chunk_XXXX.txt tree into a single store file."""
+    return write_store(path, iter_chunk_dir(chunks_dir), compress=compress,
+                       info={"source_dir": os.path.abspath(chunks_dir)})
+
+
+def export_dir(path: str, chunks_dir: str) -> int:
+    """Writes a store back out as chunks/<doc>/chunk_XXXX.txt files."""
+    root = pathlib.Path(chunks_dir)
+    count = 0
+    with ChunkStore(path) as store:
+        for cid, text, meta in store.iter_records():
+            doc_id, _, name = cid.partition("#")
+            doc_dir = root / doc_id
+            doc_dir.mkdir(parents=True, exist_ok=True)
+            (doc_dir / f"{name}.txt").write_text(format_chunk_file(meta, text), encoding="utf-8")
+            count += 1
+    return count
+
+
+# ────────────────────────────────────────────────────────────────
+# 3) Reading
+# ────────────────────────────────────────────────────────────────
+class ChunkStore:
+    """Read-only view of a store file. Safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError("invalid_chunk_store")
+        try:
+            (magic, version, flags, self._count, self._slots,
+             self._rows_off, self._table_off, info_off, info_len) = struct.unpack_from(HEADER_FMT, self._mm, 0)
+        except struct.error:
+            self.close()
+            raise ValueError("invalid_chunk_store")
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError("invalid_chunk_store")
+        self.compressed = bool(flags & FLAG_ZSTD)
+        self._decompressor = _zstd().ZstdDecompressor() if self.compressed else None
+        self.info = json.loads(self._mm[info_off:info_off + info_len] or b"{}")
+
+    # ── lifecycle ────────────────────────────────────────────
+    def close(self) -> None:
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── lookups ──────────────────────────────────────────────
+    def __len__(self) -> int:
+        return self._count
+
+    def _row(self, i: int) -> Tuple[int, int, int, int, int, int, int]:
+        return struct.unpack_from(ROW_FMT, self._mm, self._rows_off + i * ROW_SIZE)
+
+    def _id_at(self, i: int) -> str:
+        id_off, id_len = self._row(i)[:2]
+        return self._mm[id_off:id_off + id_len].decode("utf-8")
+
+    def _find(self, cid: str) -> Optional[int]:
+        if not self._count:
+            return None
+        h = _id_hash(cid)
+        mask = self._slots - 1
+        slot = h & mask
+        while True:
+            slot_hash, row = struct.unpack_from(SLOT_FMT, self._mm, self._table_off + slot * SLOT_SIZE)
+            if not slot_hash:
+                return None
+            if slot_hash == h and self._id_at(row - 1) == cid:
+                return row - 1
+            slot = (slot + 1) & mask
+
+    def __contains__(self, cid: str) -> bool:
+        return self._find(cid) is not None
+
+    def _text_at(self, row) -> str:
+        text_off, text_len, raw_len = row[4:]
+        data = self._mm[text_off:text_off + text_len]
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data, max_output_size=raw_len)
+        return data.decode("utf-8")
+
+    def _meta_at(self, row) -> Dict[str, Any]:
+        meta_off, meta_len = row[2:4]
+        return json.loads(self._mm[meta_off:meta_off + meta_len])
+
+    def text(self, cid: str) -> Optional[str]:
+        i = self._find(cid)
+        return None if i is None else self._text_at(self._row(i))
+
+    def meta(self, cid: str) -> Optional[Dict[str, Any]]:
+        i = self._find(cid)
+        return None if i is None else self._meta_at(self._row(i))
+
+    def get(self, cid: str) -> Optional[Dict[str, Any]]:
+        """{"id", "text", "meta"} or None."""
+        i = self._find(cid)
+        if i is None:
+            return None
+        row = self._row(i)
+        return {"id": cid, "text": self._text_at(row), "meta": self._meta_at(row)}
+
+    def ids(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._id_at(i)
+
+    def iter_records(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """(id, text, meta) in insertion order."""
+        for i in range(self._count):
+            row = self._row(i)
+            yield self._id_at(i), self._text_at(row), self._meta_at(row)
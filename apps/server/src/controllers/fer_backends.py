@@ -0,0 +1,101 @@
+# src/controllers/fer_backends.py
+"""
+Interchangeable TinyCNN inference backends. Every backend takes a float32
+(N, 1, 48, 48) batch in [0, 1] and returns (N, C) softmax probabilities as
+NumPy, so fer_service never touches framework tensors.
+
+torch / onnxruntime are imported lazily: a process serving the ONNX backend
+never imports torch.
+"""
+import os
+from typing import Optional
+
+import numpy as np
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class EagerBackend:
+    """TinyCNN state_dict (.pth) run in eager-mode PyTorch."""
+    name = "eager"
+
+    def __init__(self, path: str, threads: int = 0):
+        import torch
+        from src.controllers.fer_model import TinyCNN
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self._torch = torch
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._model = TinyCNN().to(self.device)
+        self._model.load_state_dict(torch.load(path, map_location=self.device))
+        self._model.eval()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        torch = self._torch
+        with torch.no_grad():
+            logits = self._model(torch.from_numpy(batch).to(self.device))
+        return _softmax(logits.cpu().numpy())
+
+
+class TorchScriptBackend(EagerBackend):
+    """TorchScript archive (.pt), fp32 or dynamically quantized int8."""
+    name = "torchscript"
+
+    def __init__(self, path: str, threads: int = 0):
+        import torch
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self._torch = torch
+        # Quantized kernels are CPU-only; TorchScript models stay on the CPU.
+        self.device = "cpu"
+        self._model = torch.jit.load(path, map_location="cpu")
+        self._model.eval()
+
+
+class OnnxBackend:
+    """ONNX model (.onnx) on the onnxruntime CPU execution provider."""
+    name = "onnx"
+
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._sess = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input = self._sess.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        (logits,) = self._sess.run(None, {self._input: np.ascontiguousarray(batch, dtype=np.float32)})
+        return _softmax(logits)
+
+
+def resolve_backend(kind: str, path: str) -> str:
+    """'auto' picks by extension: .onnx -> onnx, .pth -> eager, anything else -> torchscript."""
+    kind = (kind or "auto").lower()
+    if kind != "auto":
+        if kind not in BACKENDS:
+            raise ValueError(f"unknown FER backend '{kind}' (expected one of {BACKENDS} or 'auto')")
+        return kind
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".onnx":
+        return "onnx"
+    if ext == ".pth":
+        return "eager"
+    return "torchscript"
+
+
+def load_backend(kind: str, path: str, threads: Optional[int] = 0):
+    kind = resolve_backend(kind, path)
+    cls = {"eager": EagerBackend, "torchscript": TorchScriptBackend, "onnx": OnnxBackend}[kind]
+    return cls(path, threads=threads or 0)
@@ -0,0 +1,83 @@
+# src/controllers/fer_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many request threads and hands them to
+    `run_batch` together, so a tiny model pays its per-call overhead once per
+    batch instead of once per request.
+
+    A single daemon thread waits for the first pending item, then keeps
+    collecting for at most `max_wait_ms` (or until `max_batch_size` items are
+    queued) before running the batch. Each caller blocks on its own Future.
+    With max_batch_size <= 1 or max_wait_ms <= 0 items run inline.
+    """
+
+    def __init__(self,
+                 run_batch: Callable[[List[Any]], List[Any]],
+                 *,
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0):
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1 and self.max_wait_s > 0
+
+    def submit(self, item: Any) -> Any:
+        """Blocks until `item` has been processed; returns its result."""
+        if not self.enabled:
+            return self._run_batch([item])[0]
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut.result()
+
+    # ────────────────────────────────────────────────────────────
+    # Worker
+    # ────────────────────────────────────────────────────────────
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="fer-micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _loop(self) -> None:
+        while True:
+            pending = self._collect()
+            items = [item for item, _ in pending]
+            try:
+                results = self._run_batch(items)
+            except Exception as e:
+                for _, fut in pending:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(pending, results):
+                fut.set_result(res)
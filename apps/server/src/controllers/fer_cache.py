@@ -0,0 +1,92 @@
+# src/controllers/fer_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def dhash(gray: np.ndarray, size: int = 16) -> int:
+    """
+    Difference hash of a grayscale frame: (size+1)xsize area-downscale, one bit
+    per horizontal gradient sign -> size*size bits. The classic 8 (64 bits) is
+    too coarse for FER, where the face is a small part of a mostly static frame.
+    """
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FrameHashCache:
+    """
+    Per-session cache of FER results keyed on a perceptual hash of the frame.
+
+    A lookup hits when a cached frame of the same size is within
+    `max_distance` bits (Hamming) of the new one and younger than `ttl_s`.
+    Each session keeps its `per_session` most recent entries; sessions are
+    evicted LRU beyond `max_sessions`.
+    """
+
+    def __init__(self, *, max_distance: int = 6, ttl_s: float = 10.0,
+                 per_session: int = 8, max_sessions: int = 10000):
+        self.max_distance = max_distance
+        self.ttl_s = ttl_s
+        self.per_session = per_session
+        self.max_sessions = max_sessions
+        # session_id -> [(hash, frame_shape, stored_at, result)], newest last
+        self._entries: "OrderedDict[str, List[Tuple[int, Tuple[int, int], float, Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance >= 0 and self.per_session > 0
+
+    def get(self, session_id: str, frame_hash: int, frame_shape) -> Optional[Dict]:
+        now = time.monotonic()
+        shape = tuple(frame_shape[:2])
+        with self._lock:
+            entries = self._entries.get(session_id)
+            if entries:
+                entries[:] = [e for e in entries if now - e[2] <= self.ttl_s]
+                best = None
+                for h, s, _, result in entries:
+                    if s != shape:
+                        continue
+                    d = _hamming(h, frame_hash)
+                    if d <= self.max_distance and (best is None or d < best[0]):
+                        best = (d, result)
+                if best is not None:
+                    self._entries.move_to_end(session_id)
+                    self.hits += 1
+                    return best[1]
+            self.misses += 1
+            return None
+
+    def put(self, session_id: str, frame_hash: int, frame_shape, result: Dict) -> None:
+        with self._lock:
+            entries = self._entries.setdefault(session_id, [])
+            entries.append((frame_hash, tuple(frame_shape[:2]), time.monotonic(), result))
+            del entries[:-self.per_session]
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+            "sessions": len(self._entries),
+        }
@@ -0,0 +1,267 @@
+# src/controllers/fer_pool.py
+"""
+Process pool for FER detection + inference, so concurrent requests use every
+core instead of contending for the GIL and torch's intra-op thread pool.
+
+Decoded grayscale frames are copied once into a fixed set of shared-memory
+slots; only (task_id, slot, shape, roi) goes over the task queue and
+(box, probs) comes back, so no pixel data is ever pickled. Each worker pins
+its own torch/onnxruntime/OpenCV thread counts.
+
+Nothing heavy is imported at module level: workers are spawned fresh and must
+set their thread env vars before fer_service (and torch) are imported.
+"""
+import atexit
+import itertools
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+_RESULT_TIMEOUT_S = 30.0
+_HEALTH_CHECK_S = 1.0  # dispatcher checks worker liveness / expired tasks this often
+
+
+# ────────────────────────────────────────────────────────────────
+# Worker process
+# ────────────────────────────────────────────────────────────────
+def _worker_main(task_q, result_q, shm_names: List[str], threads: int, max_batch: int) -> None:
+    threads = max(1, threads)
+    os.environ["FER_WORKERS"] = "0"
+    os.environ["FER_MODEL_POLL_S"] = "0"  # the parent tells us which version to run
+    os.environ["FER_INTRA_OP_THREADS"] = str(threads)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    import cv2
+    cv2.setNumThreads(1)
+    from src.controllers import fer_service as fs
+
+    # Spawned children share the parent's resource tracker; the parent unlinks.
+    shms = [shared_memory.SharedMemory(name=n) for n in shm_names]
+    stop = False
+    while not stop:
+        first = task_q.get()
+        if first is None:
+            break
+        tasks = [first]
+        # Drain whatever else is already waiting so the forward pass is batched.
+        # A worker consumes at most one stop sentinel.
+        while len(tasks) < max_batch:
+            try:
+                t = task_q.get_nowait()
+            except queue.Empty:
+                break
+            if t is None:
+                stop = True
+                break
+            tasks.append(t)
+
+        # All tasks in a drain run on the newest requested model version.
+        model = fs._registry.current()
+        wanted = tasks[-1][-1]
+        if wanted and wanted != model.version:
+            try:
+                model = fs._registry.activate(wanted, persist=False)
+            except Exception as e:
+                print(f"fer worker: cannot load model {wanted}: {e!r}")
+
+        crops, found = [], []
+        for task_id, slot, h, w, roi, min_face, _ in tasks:
+            try:
+                gray = np.ndarray((h, w), dtype=np.uint8, buffer=shms[slot].buf)
+                box, roi_hit = fs._detect_with_hint(gray, roi, min_face)
+                if box is None:
+                    result_q.put((task_id, slot, None, roi_hit, None, None, None))
+                    continue
+                crops.append(fs._crop_face(gray, box))  # copies out of the slot
+                found.append((task_id, slot, box, roi_hit))
+            except Exception as e:
+                result_q.put((task_id, slot, None, None, None, None, repr(e)))
+
+        if not found:
+            continue
+        try:
+            probs = model.predict(np.stack(crops))
+        except Exception as e:
+            for task_id, slot, _, _ in found:
+                result_q.put((task_id, slot, None, None, None, None, repr(e)))
+            continue
+        for (task_id, slot, box, roi_hit), p in zip(found, probs):
+            result_q.put((task_id, slot, box, roi_hit, p, model.version, None))
+
+    for shm in shms:
+        shm.close()
+
+
+# ────────────────────────────────────────────────────────────────
+# Parent-side pool
+# ────────────────────────────────────────────────────────────────
+class FerWorkerPool:
+    """
+    `submit(gray, roi, min_face, version)` -> (box, roi_hit, probs, version)
+    computed in a worker; workers load the requested model version on demand.
+    Blocks for a free slot when all `2 * workers` slots are in flight.
+
+    Each worker has its own task queue and gets the next task when it has
+    the fewest in flight. A worker that dies can't poison a queue shared with
+    the others, and its in-flight tasks are known: the dispatcher fails them,
+    returns their slots and respawns the worker on a fresh queue. Tasks still
+    pending _RESULT_TIMEOUT_S after submission (a hung worker) are failed and
+    their slots returned too.
+    """
+
+    def __init__(self, *, workers: int, threads_per_worker: int = 1,
+                 slot_bytes: int = 16 * 1024 * 1024, max_batch: int = 16):
+        self._ctx = mp.get_context("spawn")
+        self.slot_bytes = slot_bytes
+        n_slots = max(2, workers * 2)
+        self._shms = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(n_slots)]
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for i in range(n_slots):
+            self._free.put(i)
+
+        self._results = self._ctx.Queue()
+        # task_id -> (future, slot, deadline, worker index)
+        self._pending: Dict[int, Tuple[Future, int, float, int]] = {}
+        self._inflight = [0] * workers
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+
+        self._worker_args = ([s.name for s in self._shms], threads_per_worker, max_batch)
+        self._closing = False
+        self._task_qs: List = [None] * workers
+        self._procs: List = [None] * workers
+        for i in range(workers):
+            self._spawn(i)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="fer-pool-results", daemon=True)
+        self._dispatcher.start()
+        atexit.register(self.close)
+
+    def _spawn(self, i: int) -> None:
+        """(Re)starts worker i on a fresh task queue."""
+        names, threads, max_batch = self._worker_args
+        task_q = self._ctx.Queue()
+        p = self._ctx.Process(target=_worker_main, name=f"fer-worker-{i}",
+                              args=(task_q, self._results, names, threads, max_batch),
+                              daemon=True)
+        p.start()
+        old = self._task_qs[i]
+        self._task_qs[i], self._procs[i] = task_q, p
+        if old is not None:
+            old.cancel_join_thread()
+            old.close()
+
+    def submit(self, gray: np.ndarray, roi: Optional[Box] = None, min_face: int = 0,
+               version: Optional[str] = None
+               ) -> Tuple[Optional[Box], Optional[bool], Optional[np.ndarray], Optional[str]]:
+        # Frames larger than a slot are shrunk to fit; boxes are mapped back afterwards.
+        scale = 1.0
+        if gray.nbytes > self.slot_bytes:
+            import cv2
+            scale = math.sqrt(self.slot_bytes / float(gray.nbytes))
+            h, w = gray.shape[:2]
+            gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))),
+                              interpolation=cv2.INTER_AREA)
+            if roi is not None:
+                roi = tuple(int(v * scale) for v in roi)
+            min_face = int(min_face * scale)
+
+        h, w = gray.shape[:2]
+        try:
+            slot = self._free.get(timeout=_RESULT_TIMEOUT_S)
+        except queue.Empty:
+            raise TimeoutError(f"fer pool: no free slot within {_RESULT_TIMEOUT_S:.0f}s")
+        np.ndarray((h, w), dtype=np.uint8, buffer=self._shms[slot].buf)[:] = gray
+
+        task_id = next(self._ids)
+        fut: Future = Future()
+        with self._pending_lock:
+            worker = min(range(len(self._inflight)), key=self._inflight.__getitem__)
+            self._inflight[worker] += 1
+            self._pending[task_id] = (fut, slot, time.monotonic() + _RESULT_TIMEOUT_S, worker)
+            task_q = self._task_qs[worker]
+        task_q.put((task_id, slot, h, w, roi, min_face, version))
+
+        box, roi_hit, probs, version = fut.result(timeout=_RESULT_TIMEOUT_S)
+        if box is not None and scale != 1.0:
+            box = tuple(int(round(v / scale)) for v in box)
+        return box, roi_hit, probs, version
+
+    def _take(self, task_id: int) -> Optional[Tuple[Future, int, float, int]]:
+        """Removes a pending task (caller holds _pending_lock)."""
+        entry = self._pending.pop(task_id, None)
+        if entry is not None:
+            self._inflight[entry[3]] -= 1
+        return entry
+
+    def _dispatch(self) -> None:
+        next_check = time.monotonic() + _HEALTH_CHECK_S
+        while True:
+            if time.monotonic() >= next_check:
+                self._check_health()
+                next_check = time.monotonic() + _HEALTH_CHECK_S
+            try:
+                msg = self._results.get(timeout=_HEALTH_CHECK_S)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if msg is None:
+                return
+            task_id, slot, box, roi_hit, probs, version, error = msg
+            with self._pending_lock:
+                entry = self._take(task_id)
+            if entry is None:
+                continue  # already failed (worker lost / expired) and its slot returned
+            self._free.put(slot)
+            fut = entry[0]
+            if error:
+                fut.set_exception(RuntimeError(f"fer worker failed: {error}"))
+            else:
+                fut.set_result((box, roi_hit, probs, version))
+
+    def _check_health(self) -> None:
+        if self._closing:
+            return
+        now = time.monotonic()
+        dead = []
+        for i, p in enumerate(self._procs):
+            if not p.is_alive():
+                print(f"fer pool: {p.name} died (exit code {p.exitcode}); respawning")
+                dead.append(i)
+        with self._pending_lock:
+            lost = [tid for tid, e in self._pending.items() if e[3] in dead or e[2] <= now]
+            entries = [self._take(tid) for tid in lost]
+            for i in dead:
+                self._spawn(i)
+        for fut, slot, deadline, worker in entries:
+            self._free.put(slot)
+            if not fut.done():
+                reason = "died" if worker in dead else "did not answer"
+                fut.set_exception(RuntimeError(f"fer worker {reason}"))
+
+    def close(self) -> None:
+        if self._closing:
+            return
+        self._closing = True
+        for q in self._task_qs:
+            q.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self._results.put(None)
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
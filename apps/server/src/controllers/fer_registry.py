@@ -0,0 +1,186 @@
+# src/controllers/fer_registry.py
+"""
+Versioned FER model registry with hot swaps.
+
+A model directory holds one artifact per version (`<version>.pth|.pt|.onnx`,
+backend picked by extension) plus an `ACTIVE` pointer file naming the
+version to serve. Activating a version loads it, runs a smoke inference and
+only then swaps it in with a single reference assignment: requests already
+holding the previous ModelVersion finish on it, and the new model is warm
+before its first request. Every process polls `ACTIVE`, so one activation
+rolls out to all workers without a restart.
+
+Without a model directory the registry serves FER_MODEL_PATH as a single
+version, as before.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.controllers.fer_backends import load_backend
+
+ACTIVE_FILE = "ACTIVE"
+MODEL_EXTS = (".pth", ".pt", ".onnx")
+# Versions are bare file stems inside the model directory: no separators, no '..'
+_VERSION_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+def _check_version(version) -> str:
+    if not isinstance(version, str) or not _VERSION_RE.match(version) or ".." in version:
+        raise ValueError("invalid_version")
+    return version
+
+
+class ModelVersion:
+    """An immutable (version, backend) pair; grab it once per request."""
+    __slots__ = ("version", "path", "backend", "loaded_at")
+
+    def __init__(self, version: str, path: str, backend):
+        self.version = version
+        self.path = path
+        self.backend = backend
+        self.loaded_at = time.time()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.backend.predict(batch)
+
+
+def _version_of(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def validate_backend(backend, num_classes: int) -> None:
+    """Smoke inference: (N, C) finite probabilities summing to 1. Raises ValueError('model_validation_failed')."""
+    rng = np.random.default_rng(0)
+    batch = np.concatenate([
+        np.zeros((1, 1, 48, 48), dtype=np.float32),
+        rng.random((3, 1, 48, 48), dtype=np.float32),
+    ])
+    try:
+        probs = np.asarray(backend.predict(batch))
+    except Exception as e:
+        raise ValueError("model_validation_failed") from e
+    if (probs.shape != (len(batch), num_classes)
+            or not np.isfinite(probs).all()
+            or not np.allclose(probs.sum(axis=1), 1.0, atol=1e-3)):
+        raise ValueError("model_validation_failed")
+
+
+class ModelRegistry:
+    def __init__(self, *, model_dir: str, default_path: str, backend_kind: str,
+                 threads: int, num_classes: int):
+        self.model_dir = model_dir
+        self.default_path = default_path
+        self.backend_kind = backend_kind
+        self.threads = threads
+        self.num_classes = num_classes
+        self._lock = threading.Lock()  # serialises loads; readers never take it
+        self._watcher: Optional[threading.Thread] = None
+
+        pinned = self._read_pointer()
+        if pinned:
+            self._active = self._load(pinned)
+        else:
+            self._active = self._load_path(default_path, backend_kind)
+
+    # ── lookups ──────────────────────────────────────────────
+    def current(self) -> ModelVersion:
+        return self._active
+
+    def _path_for(self, version: str) -> str:
+        _check_version(version)
+        if self.model_dir:
+            for ext in MODEL_EXTS:
+                path = os.path.join(self.model_dir, version + ext)
+                if os.path.isfile(path):
+                    return path
+        if version == _version_of(self.default_path):
+            return self.default_path
+        raise ValueError("unknown_model_version")
+
+    def versions(self) -> List[Dict]:
+        found = {}
+        if self.model_dir and os.path.isdir(self.model_dir):
+            for name in sorted(os.listdir(self.model_dir)):
+                if os.path.splitext(name)[1] in MODEL_EXTS:
+                    path = os.path.join(self.model_dir, name)
+                    found.setdefault(_version_of(name), path)
+        found.setdefault(_version_of(self.default_path), self.default_path)
+        active = self._active.version
+        return [{"version": v, "path": p, "active": v == active} for v, p in found.items()]
+
+    # ── loading / swapping ───────────────────────────────────
+    def _load_path(self, path: str, kind: str) -> ModelVersion:
+        try:
+            backend = load_backend(kind, path, self.threads)
+        except Exception as e:  # unreadable / mismatched weights
+            raise ValueError("model_validation_failed") from e
+        validate_backend(backend, self.num_classes)
+        return ModelVersion(_version_of(path), path, backend)
+
+    def _load(self, version: str) -> ModelVersion:
+        path = self._path_for(version)
+        # The configured backend applies to FER_MODEL_PATH; directory versions go by extension.
+        kind = self.backend_kind if path == self.default_path else "auto"
+        return self._load_path(path, kind)
+
+    def activate(self, version: str, *, persist: bool = True) -> ModelVersion:
+        """
+        Loads + validates `version`, then swaps it in. With `persist`, also
+        points ACTIVE at it so the other processes follow.
+        Raises ValueError('invalid_version' | 'unknown_model_version' | 'model_validation_failed').
+        """
+        _check_version(version)
+        with self._lock:
+            if version != self._active.version:
+                self._active = self._load(version)
+            if persist:
+                self._write_pointer(version)
+            return self._active
+
+    # ── ACTIVE pointer ───────────────────────────────────────
+    def _pointer_path(self) -> Optional[str]:
+        return os.path.join(self.model_dir, ACTIVE_FILE) if self.model_dir else None
+
+    def _read_pointer(self) -> Optional[str]:
+        path = self._pointer_path()
+        if not path or not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            return f.read().strip() or None
+
+    def _write_pointer(self, version: str) -> None:
+        path = self._pointer_path()
+        if not path:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp, path)
+
+    def watch(self, interval_s: float) -> None:
+        """Starts a daemon thread that follows ACTIVE every `interval_s` seconds."""
+        if not self.model_dir or interval_s <= 0 or self._watcher is not None:
+            return
+
+        def loop():
+            failed = None  # don't reload a broken version every tick
+            while True:
+                time.sleep(interval_s)
+                pinned = None
+                try:
+                    pinned = self._read_pointer()
+                    if pinned and pinned != self._active.version and pinned != failed:
+                        self.activate(pinned, persist=False)
+                        print(f"FER model switched to {pinned}")
+                except Exception as e:
+                    # Keep serving the current model.
+                    failed = pinned
+                    print(f"FER model reload failed ({pinned}): {e!r}")
+
+        self._watcher = threading.Thread(target=loop, name="fer-model-watch", daemon=True)
+        self._watcher.start()
@@ -1,122 +1,372 @@
 # src/services/fer_service.py
 import io
 import base64
-from typing import Dict, Optional, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import cv2
-from PIL import Image, ImageOps
+from PIL import Image
 
-import torch
-import torch.nn.functional as F
-from torchvision import transforms
-import torch.nn as nn
+from src.config import settings
+from src.controllers.fer_batcher import MicroBatcher
+from src.controllers.fer_cache import FrameHashCache, dhash
+from src.controllers.fer_pool import FerWorkerPool
+from src.controllers.fer_registry import ModelRegistry
+from src.controllers.fer_tracker import FaceTracker
 
 
 # ────────────────────────────────────────────────────────────────
-# 1) Model definition (same as your script)
+# 1) Load model & preprocessing (module import = 1-time cost)
 # ────────────────────────────────────────────────────────────────
-class TinyCNN(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = nn.Conv2d(1, 16, 3, padding=1)
-        self.conv2 = nn.Conv2d(16, 32, 3, padding=1)
-        self.pool = nn.MaxPool2d(2, 2)
-        self.fc1 = nn.Linear(32 * 12 * 12, 64)
-        self.fc2 = nn.Linear(64, 3)
-
-    def forward(self, x):
-        x = self.pool(torch.relu(self.conv1(x)))
-        x = self.pool(torch.relu(self.conv2(x)))
-        x = x.view(x.size(0), -1)
-        x = torch.relu(self.fc1(x))
-        x = self.fc2(x)
-        return x
+_classes = ["happy", "sad", "neutral"]
 
+# FER_BACKEND: eager (.pth state_dict) | torchscript (.pt) | onnx (.onnx) | auto (by extension)
+# FER_MODEL_PATH is relative to the working directory, e.g. apps/server/emotion_cnn.pth
+# FER_MODEL_DIR (optional) holds versioned artifacts + an ACTIVE pointer; see fer_registry.
+_registry = ModelRegistry(
+    model_dir=settings.FER_MODEL_DIR,
+    default_path=settings.FER_MODEL_PATH,
+    backend_kind=settings.FER_BACKEND,
+    threads=settings.FER_INTRA_OP_THREADS,
+    num_classes=len(_classes),
+)
+_registry.watch(settings.FER_MODEL_POLL_S)
+_FACE_SIZE = 48
 
-# ────────────────────────────────────────────────────────────────
-# 2) Load model & preprocessing (module import = 1-time cost)
-# ────────────────────────────────────────────────────────────────
-device = "cuda" if torch.cuda.is_available() else "cpu"
-_model = TinyCNN().to(device)
+# Haar cascade. detectMultiScale mutates the classifier's internal state, so a
+# shared instance returns wrong boxes under concurrent requests: one per thread.
+_face_cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+_cascades = threading.local()
 
-# Adjust the path if your weight file lives elsewhere
-_STATE_PATH = "emotion_cnn.pth"  # e.g. apps/server/emotion_cnn.pth
-_state = torch.load(_STATE_PATH, map_location=device)
-_model.load_state_dict(_state)
-_model.eval()
 
-_classes = ["happy", "sad", "neutral"]
+def _face_cascade() -> "cv2.CascadeClassifier":
+    cascade = getattr(_cascades, "cascade", None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(_face_cascade_path)
+        if cascade.empty():
+            raise RuntimeError(f"Failed to load Haar cascade at {_face_cascade_path}")
+        _cascades.cascade = cascade
+    return cascade
 
-_transform = transforms.Compose([
-    transforms.Resize((48, 48)),
-    transforms.Grayscale(),
-    transforms.ToTensor(),
-])
 
-# Haar cascade
-_face_cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-_face_cascade = cv2.CascadeClassifier(_face_cascade_path)
-if _face_cascade.empty():
-    raise RuntimeError(f"Failed to load Haar cascade at {_face_cascade_path}")
+_face_cascade()  # fail fast at import if the cascade file is missing
+
+# EXIF orientation tag -> cheap in-place array ops on the decoded grayscale frame
+# (same mapping as PIL.ImageOps.exif_transpose).
+_EXIF_ORIENTATION_TAG = 0x0112
+_ORIENT_OPS = {
+    2: lambda a: cv2.flip(a, 1),
+    3: lambda a: cv2.rotate(a, cv2.ROTATE_180),
+    4: lambda a: cv2.flip(a, 0),
+    5: lambda a: cv2.transpose(a),
+    6: lambda a: cv2.rotate(a, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda a: cv2.flip(cv2.transpose(a), -1),
+    8: lambda a: cv2.rotate(a, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
 
 
 # ────────────────────────────────────────────────────────────────
-# 3) Helpers
+# 2) Helpers
 # ────────────────────────────────────────────────────────────────
-def _decode_base64_image(data_uri: str) -> Image.Image:
-    """Accepts pure base64 or data URL; returns RGB PIL with EXIF fixed."""
+def _b64_to_bytes(data_uri: str) -> bytes:
+    """Accepts pure base64 or data URL. Rejects oversize payloads before decoding."""
     if "," in data_uri:
         _, b64 = data_uri.split(",", 1)
     else:
         b64 = data_uri
-    img_bytes = base64.b64decode(b64)
-    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+    if len(b64) * 3 // 4 > settings.FER_MAX_IMAGE_BYTES:
+        raise ValueError("payload_too_large")
+    return base64.b64decode(b64)
+
+
+def _exif_orientation(img_bytes: bytes) -> int:
+    """Reads only the image header (no pixel decode); 1 if absent/unreadable."""
     try:
-        img = ImageOps.exif_transpose(img)
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            return int(im.getexif().get(_EXIF_ORIENTATION_TAG, 1))
     except Exception:
-        pass
-    return img
+        return 1
 
 
-def _detect_largest_face(bgr_img: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
-    """(x, y, w, h) of the largest face, or None."""
-    gray = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2GRAY)
-    faces = _face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-    if len(faces) == 0:
-        return None
-    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-    return int(x), int(y), int(w), int(h)
+def _decode_image_bytes(img_bytes: bytes) -> np.ndarray:
+    """Encoded image -> upright uint8 grayscale (H, W), decoded once by OpenCV."""
+    if len(img_bytes) > settings.FER_MAX_IMAGE_BYTES:
+        raise ValueError("payload_too_large")
+    buf = np.frombuffer(img_bytes, dtype=np.uint8)
+    gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE | cv2.IMREAD_IGNORE_ORIENTATION)
+    if gray is None:
+        raise ValueError("invalid_image")
+    op = _ORIENT_OPS.get(_exif_orientation(img_bytes))
+    return op(gray) if op else gray
 
 
-# ────────────────────────────────────────────────────────────────
-# 4) Public API (call from your route)
-# ────────────────────────────────────────────────────────────────
-def classify_base64_image(image_b64: str) -> Dict:
+def _decode_base64_image(data_uri: str) -> np.ndarray:
+    """Accepts pure base64 or data URL; returns upright grayscale ndarray."""
+    return _decode_image_bytes(_b64_to_bytes(data_uri))
+
+
+def _detect_faces(gray: np.ndarray,
+                  roi: Optional[Tuple[int, int, int, int]] = None,
+                  min_face: int = 0) -> List[Tuple[int, int, int, int]]:
     """
-    decode base64 -> detect face -> crop -> transform -> predict
-    Returns: { prediction, probs, face_box }
-    Raises ValueError('no_face_detected') if no face found.
+    (x, y, w, h) of every face in full-resolution coordinates, largest first.
+    Searches only `roi` (x, y, w, h) when given. Detection runs on a copy
+    downscaled to FER_DETECT_MAX_SIDE; faces narrower than `min_face`
+    full-resolution pixels are skipped.
     """
-    pil_img = _decode_base64_image(image_b64)
-    np_rgb = np.array(pil_img)
-    np_bgr = cv2.cvtColor(np_rgb, cv2.COLOR_RGB2BGR)
+    ox, oy = 0, 0
+    region = gray
+    if roi is not None:
+        ox, oy, rw, rh = roi
+        region = gray[oy:oy + rh, ox:ox + rw]
+
+    h_reg, w_reg = region.shape[:2]
+    if h_reg == 0 or w_reg == 0:
+        return []
+    scale = min(1.0, settings.FER_DETECT_MAX_SIDE / float(max(h_reg, w_reg)))
+    small = region if scale == 1.0 else cv2.resize(
+        region, (max(1, round(w_reg * scale)), max(1, round(h_reg * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
+    min_side = int(min_face * scale)
+    if min_side > min(small.shape[:2]):
+        return []
+    faces = _face_cascade().detectMultiScale(
+        small, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side)
+    )
+    h_img, w_img = gray.shape[:2]
+    boxes = []
+    for f in sorted(faces, key=lambda f: f[2] * f[3], reverse=True):
+        x, y, w, h = (v / scale for v in f)
+        x, y = max(0, int(x) + ox), max(0, int(y) + oy)
+        boxes.append((x, y, min(int(round(w)), w_img - x), min(int(round(h)), h_img - y)))
+    return boxes
+
+
+def _detect_largest_face(gray: np.ndarray,
+                         roi: Optional[Tuple[int, int, int, int]] = None,
+                         min_face: int = 0) -> Optional[Tuple[int, int, int, int]]:
+    """(x, y, w, h) of the largest face (see _detect_faces), or None."""
+    faces = _detect_faces(gray, roi=roi, min_face=min_face)
+    return faces[0] if faces else None
+
+
+def _roi_hint(session_id: Optional[str], shape) -> Tuple[Optional[Tuple[int, int, int, int]], int]:
+    """(roi, min_face) from the session's fresh track, or (None, 0)."""
+    if not session_id:
+        return None, 0
+    hint = _tracker.roi_for(session_id, shape)
+    if hint is None:
+        return None, 0
+    roi, last_box = hint
+    # The face barely moves between captures, so it can't shrink to a fraction of the last one.
+    return roi, int(last_box[2] * 0.5)
 
-    box = _detect_largest_face(np_bgr)
+
+def _detect_with_hint(gray: np.ndarray,
+                      roi: Optional[Tuple[int, int, int, int]],
+                      min_face: int) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[bool]]:
+    """
+    Searches `roi` first and falls back to the full frame when it misses.
+    Returns (box, roi_hit); roi_hit is None when no ROI was given.
+    """
+    box, roi_hit = None, None
+    if roi is not None:
+        box = _detect_largest_face(gray, roi=roi, min_face=min_face)
+        roi_hit = box is not None
     if box is None:
-        raise ValueError("no_face_detected")
+        box = _detect_largest_face(gray)
+    return box, roi_hit
+
+
+def _track_result(session_id: Optional[str], shape, box, roi_hit: Optional[bool]) -> None:
+    if roi_hit is not None:
+        _tracker.record(roi_hit)
+    if session_id:
+        _tracker.update(session_id, shape, box)
+
+
+def _locate_face(gray: np.ndarray, session_id: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Tries the session's tracked ROI first and falls back to the full frame
+    when there is no fresh track or the ROI misses.
+    """
+    roi, min_face = _roi_hint(session_id, gray.shape)
+    box, roi_hit = _detect_with_hint(gray, roi, min_face)
+    _track_result(session_id, gray.shape, box, roi_hit)
+    return box
 
+
+def _crop_face(gray: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+    """Crop + resize straight to the (1, 48, 48) float32 [0, 1] model input."""
     x, y, w, h = box
-    face_pil = pil_img.crop((x, y, x + w, y + h))
+    face = cv2.resize(gray[y:y + h, x:x + w], (_FACE_SIZE, _FACE_SIZE), interpolation=cv2.INTER_AREA)
+    return (face.astype(np.float32) * (1.0 / 255.0))[None, :, :]
+
+
+def _forward_batch(crops: List[np.ndarray]) -> List[Tuple[np.ndarray, str]]:
+    """One forward pass over N (1, 48, 48) crops; returns N (softmax vector, model version)."""
+    model = _registry.current()
+    return [(p, model.version) for p in model.predict(np.stack(crops))]
+
+
+_tracker = FaceTracker(
+    ttl_s=settings.FER_TRACK_TTL_S,
+    pad=settings.FER_TRACK_PAD,
+    max_sessions=settings.FER_TRACK_MAX_SESSIONS,
+)
+
+# Near-duplicate frames from the same session reuse the last result (no detection/inference).
+_cache = FrameHashCache(
+    max_distance=settings.FER_CACHE_MAX_DISTANCE,
+    ttl_s=settings.FER_CACHE_TTL_S,
+    per_session=settings.FER_CACHE_PER_SESSION,
+    max_sessions=settings.FER_TRACK_MAX_SESSIONS,
+)
+
+# Shared by all request threads; concurrent crops are coalesced into one forward.
+_batcher = MicroBatcher(
+    _forward_batch,
+    max_batch_size=settings.FER_BATCH_MAX_SIZE,
+    max_wait_ms=settings.FER_BATCH_MAX_WAIT_MS,
+)
+
 
-    img_t = _transform(face_pil).unsqueeze(0).to(device)
-    with torch.no_grad():
-        logits = _model(img_t)
-        probs = F.softmax(logits, dim=1).cpu().numpy()[0]
+# FER_WORKERS > 0 moves detection + inference into worker processes (created on first use).
+_pool: Optional[FerWorkerPool] = None
+_pool_lock = threading.Lock()
 
+
+def _get_pool() -> FerWorkerPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = FerWorkerPool(
+                    workers=settings.FER_WORKERS,
+                    threads_per_worker=settings.FER_WORKER_THREADS,
+                    slot_bytes=settings.FER_POOL_SLOT_BYTES,
+                )
+    return _pool
+
+
+# ────────────────────────────────────────────────────────────────
+# 3) Public API (call from your route)
+# ────────────────────────────────────────────────────────────────
+def _classify_gray(gray: np.ndarray, session_id: Optional[str]) -> Dict:
+    frame_hash = None
+    if session_id and _cache.enabled:
+        frame_hash = dhash(gray, settings.FER_CACHE_HASH_SIZE)
+        # Keyed per model version: a swap never serves the previous model's results.
+        cache_key = f"{_registry.current().version}:{session_id}"
+        cached = _cache.get(cache_key, frame_hash, gray.shape)
+        if cached is not None:
+            return dict(cached)
+
+    result = _detect_and_predict(gray, session_id)
+    if frame_hash is not None:
+        _cache.put(f"{result['model_version']}:{session_id}", frame_hash, gray.shape, result)
+    return dict(result)
+
+
+def _detect_and_predict(gray: np.ndarray, session_id: Optional[str]) -> Dict:
+    if settings.FER_WORKERS > 0:
+        roi, min_face = _roi_hint(session_id, gray.shape)
+        box, roi_hit, probs, version = _get_pool().submit(
+            gray, roi, min_face, version=_registry.current().version
+        )
+        _track_result(session_id, gray.shape, box, roi_hit)
+        if box is None:
+            raise ValueError("no_face_detected")
+    else:
+        box = _locate_face(gray, session_id)
+        if box is None:
+            raise ValueError("no_face_detected")
+        probs, version = _batcher.submit(_crop_face(gray, box))
+
+    return _face_result(box, probs, version)
+
+
+def _face_result(box: Tuple[int, int, int, int], probs: np.ndarray, version: str) -> Dict:
+    x, y, w, h = box
     top_idx = int(np.argmax(probs))
     return {
         "prediction": _classes[top_idx],
         "probs": {_classes[i]: float(probs[i]) for i in range(len(_classes))},
         "face_box": {"x": x, "y": y, "w": w, "h": h},
-    }
\ No newline at end of file
+        "model_version": version,
+    }
+
+
+def classify_base64_image(image_b64: str, session_id: Optional[str] = None) -> Dict:
+    """
+    decode base64 -> grayscale -> detect face -> crop/resize -> predict
+    Pass `session_id` to reuse the session's last face box as a search ROI.
+    Returns: { prediction, probs, face_box, model_version }
+    Raises ValueError('no_face_detected' | 'payload_too_large' | 'invalid_image').
+    """
+    return _classify_gray(_decode_base64_image(image_b64), session_id)
+
+
+def classify_image_bytes(img_bytes: bytes, session_id: Optional[str] = None) -> Dict:
+    """Same as classify_base64_image for an already-binary encoded image (JPEG/PNG/...)."""
+    return _classify_gray(_decode_image_bytes(img_bytes), session_id)
+
+
+def classify_batch(images: List[Union[str, bytes]], max_faces: Optional[int] = None) -> List[Dict]:
+    """
+    Classifies every detected face (largest first, at most `max_faces`) in each
+    image; images are base64/data URL strings or encoded bytes. All crops
+    from all images go through the backend in one forward pass.
+    Returns one entry per image, in order: { faces: [{ prediction, probs,
+    face_box, model_version }], count } or { error } for an image that failed to decode.
+    Always runs in-process (no session tracking, cache or worker pool).
+    """
+    if max_faces is None:
+        max_faces = settings.FER_MAX_FACES_PER_IMAGE
+
+    results: List[Dict] = []
+    crops: List[np.ndarray] = []
+    owners: List[Tuple[int, Tuple[int, int, int, int]]] = []
+    for i, img in enumerate(images):
+        try:
+            gray = _decode_base64_image(img) if isinstance(img, str) else _decode_image_bytes(img)
+        except ValueError as ve:
+            results.append({"error": str(ve)})
+            continue
+        results.append({"faces": [], "count": 0})
+        for box in _detect_faces(gray)[:max_faces]:
+            crops.append(_crop_face(gray, box))
+            owners.append((i, box))
+
+    if crops:
+        model = _registry.current()
+        probs = model.predict(np.stack(crops))
+        for (i, box), p in zip(owners, probs):
+            results[i]["faces"].append(_face_result(box, p, model.version))
+            results[i]["count"] += 1
+    return results
+
+
+def list_models() -> List[Dict]:
+    """Known model versions ({ version, path, active })."""
+    return _registry.versions()
+
+
+def activate_model(version: str) -> str:
+    """
+    Loads, smoke-tests and swaps in `version`, and points every other process
+    at it. In-flight requests finish on the previous model.
+    Raises ValueError('invalid_version' | 'unknown_model_version' | 'model_validation_failed').
+    """
+    return _registry.activate(version).version
+
+
+def fer_stats() -> Dict:
+    """Active model version and counters for the per-session result cache and ROI tracker."""
+    return {
+        "model_version": _registry.current().version,
+        "cache": _cache.stats(),
+        "tracker": {"roi_hits": _tracker.roi_hits, "roi_misses": _tracker.roi_misses},
+    }
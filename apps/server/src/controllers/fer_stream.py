@@ -0,0 +1,113 @@
+# src/controllers/fer_stream.py
+import threading
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+from src.controllers.fer_service import classify_base64_image, classify_image_bytes
+
+Frame = Union[bytes, str]  # binary encoded image, or base64 / data URL text
+
+
+class MoodStream:
+    """
+    Live mood estimation for one WebSocket connection.
+
+    The receive loop calls `offer` for every incoming frame; frames land in a
+    single-slot mailbox, so when inference falls behind older unprocessed
+    frames are overwritten (dropped) instead of queueing up latency.
+    `run` processes the newest frame, smooths `probs` with an EMA and calls
+    `push` only when the smoothed prediction changes.
+    """
+
+    def __init__(self, *, session_id: Optional[str], alpha: float = 0.3):
+        self.session_id = session_id
+        self.alpha = alpha
+        self.frames = 0
+        self.processed = 0
+        self.dropped = 0
+        self._pending: Optional[Frame] = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._ema: Optional[np.ndarray] = None
+        self._classes = None
+        self._last_label: Optional[str] = None
+
+    def offer(self, frame: Frame) -> None:
+        with self._cond:
+            self.frames += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = frame
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _next(self) -> Optional[Frame]:
+        with self._cond:
+            while self._pending is None and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            frame, self._pending = self._pending, None
+            return frame
+
+    def update(self, result: Dict) -> Optional[Dict]:
+        """Folds one prediction into the EMA; returns a message when the mood changed."""
+        if self._classes is None:
+            self._classes = list(result["probs"].keys())
+        probs = np.array([result["probs"][c] for c in self._classes], dtype=np.float64)
+        self._ema = probs if self._ema is None else self.alpha * probs + (1.0 - self.alpha) * self._ema
+
+        label = self._classes[int(np.argmax(self._ema))]
+        if label == self._last_label:
+            return None
+        self._last_label = label
+        return {
+            "prediction": label,
+            "probs": {c: float(p) for c, p in zip(self._classes, self._ema)},
+            "face_box": result["face_box"],
+            "model_version": result.get("model_version"),
+            "frames": self.frames,
+            "dropped": self.dropped,
+        }
+
+    def run(self, push: Callable[[Dict], None], end: Optional[Callable[[], None]] = None) -> None:
+        """
+        Worker loop. A frame that fails to classify is skipped; a failing
+        `push` (client gone) ends the stream and calls `end` to close the socket.
+        """
+        while True:
+            frame = self._next()
+            if frame is None:
+                return
+            try:
+                if isinstance(frame, str):
+                    result = classify_base64_image(frame, session_id=self.session_id)
+                else:
+                    result = classify_image_bytes(frame, session_id=self.session_id)
+                self.processed += 1
+                msg = self.update(result)
+            except ValueError:
+                # no face / unreadable frame: keep the current estimate
+                continue
+            except Exception as e:
+                # pool timeout, worker crash, decoder error: skip the frame, keep streaming
+                print(f"fer stream: frame failed: {e!r}")
+                continue
+            if msg is None:
+                continue
+            try:
+                push(msg)
+            except Exception as e:
+                print(f"fer stream: push failed, closing: {e!r}")
+                self.close()
+                if end is not None:
+                    try:
+                        end()
+                    except Exception:
+                        pass
+                return
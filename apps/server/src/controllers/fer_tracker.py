@@ -0,0 +1,74 @@
+# src/controllers/fer_tracker.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+Box = Tuple[int, int, int, int]  # (x, y, w, h)
+
+
+@dataclass
+class _Track:
+    box: Box
+    frame_shape: Tuple[int, int]
+    seen_at: float
+
+
+class FaceTracker:
+    """
+    Remembers the last face box per session so the next capture can be
+    searched in a padded region of interest instead of the whole frame.
+
+    A track is only offered while it is younger than `ttl_s` and the new frame
+    has the same size; callers fall back to full-frame detection otherwise, and
+    report the outcome with `update` (None forgets the session).
+    Sessions are kept in LRU order and capped at `max_sessions`.
+    """
+
+    def __init__(self, *, ttl_s: float = 5.0, pad: float = 0.5, max_sessions: int = 10000):
+        self.ttl_s = ttl_s
+        self.pad = pad
+        self.max_sessions = max_sessions
+        self._tracks: "OrderedDict[str, _Track]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.roi_hits = 0
+        self.roi_misses = 0
+
+    def roi_for(self, session_id: str, frame_shape: Tuple[int, int]) -> Optional[Tuple[Box, Box]]:
+        """
+        Returns (roi, last_box) for a fresh track, else None.
+        `roi` is (x, y, w, h) in frame coordinates, clipped to the frame.
+        """
+        with self._lock:
+            track = self._tracks.get(session_id)
+            if track is None:
+                return None
+            if time.monotonic() - track.seen_at > self.ttl_s or track.frame_shape != frame_shape[:2]:
+                del self._tracks[session_id]
+                return None
+            self._tracks.move_to_end(session_id)
+
+        h_img, w_img = frame_shape[:2]
+        x, y, w, h = track.box
+        px, py = int(w * self.pad), int(h * self.pad)
+        x0, y0 = max(0, x - px), max(0, y - py)
+        x1, y1 = min(w_img, x + w + px), min(h_img, y + h + py)
+        return (x0, y0, x1 - x0, y1 - y0), track.box
+
+    def update(self, session_id: str, frame_shape: Tuple[int, int], box: Optional[Box]) -> None:
+        with self._lock:
+            if box is None:
+                self._tracks.pop(session_id, None)
+                return
+            self._tracks[session_id] = _Track(box, tuple(frame_shape[:2]), time.monotonic())
+            self._tracks.move_to_end(session_id)
+            while len(self._tracks) > self.max_sessions:
+                self._tracks.popitem(last=False)
+
+    def record(self, roi_hit: bool) -> None:
+        # Plain counters; a lost increment under contention is harmless.
+        if roi_hit:
+            self.roi_hits += 1
+        else:
+            self.roi_misses += 1
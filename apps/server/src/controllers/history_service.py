@@ -0,0 +1,110 @@
+# src/controllers/history_service.py
+import base64
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from src.extensions import db
+from src.models.messages import Messages
+
+
+# ────────────────────────────────────────────────────────────────
+# 1) Config
+# ────────────────────────────────────────────────────────────────
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the columns the chat UI renders. `user_id` / `session_id` are already
+# known to the caller, so they are never shipped back.
+_HISTORY_COLUMNS = (
+    Messages.message_id,
+    Messages.role,
+    Messages.content,
+    Messages.mood_label,
+    Messages.created_at,
+)
+
+
+# ────────────────────────────────────────────────────────────────
+# 2) Cursor helpers
+# ────────────────────────────────────────────────────────────────
+def encode_cursor(created_at: datetime, message_id: uuid.UUID) -> str:
+    """Opaque, URL-safe cursor for the (created_at, message_id) keyset."""
+    raw = f"{created_at.isoformat()}|{message_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor. Raises ValueError('invalid_cursor')."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts, mid = raw.split("|", 1)
+        return datetime.fromisoformat(ts), uuid.UUID(mid)
+    except Exception:
+        raise ValueError("invalid_cursor")
+
+
+# ────────────────────────────────────────────────────────────────
+# 3) Public API (call from your route)
+# ────────────────────────────────────────────────────────────────
+def get_history_page(user_id: str,
+                     session_id: str,
+                     *,
+                     limit: int = DEFAULT_PAGE_SIZE,
+                     cursor: Optional[str] = None) -> Dict:
+    """
+    Newest-first page of a conversation, keyset-paginated on
+    (created_at, message_id).
+
+    The WHERE clause pins the equality prefix of idx_messages_user_session
+    (user_id, session_id) and walks created_at DESC from the cursor, so every
+    page is a bounded index range scan regardless of how deep it is. message_id
+    only breaks ties between rows sharing a timestamp.
+
+    Returns: { messages: [...], next_cursor: str | None }
+    Raises ValueError('invalid_session_id' | 'invalid_cursor').
+    """
+    try:
+        session_uuid = uuid.UUID(str(session_id))
+    except ValueError:
+        raise ValueError("invalid_session_id")
+
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    q = (
+        db.session.query(*_HISTORY_COLUMNS)
+        .filter(Messages.user_id == user_id, Messages.session_id == session_uuid)
+    )
+    if cursor:
+        c_created_at, c_message_id = decode_cursor(cursor)
+        # `created_at <= ts` is the sargable range bound on the index; the OR only
+        # filters the handful of rows that share the cursor's timestamp.
+        q = q.filter(and_(
+            Messages.created_at <= c_created_at,
+            or_(Messages.created_at < c_created_at, Messages.message_id < c_message_id),
+        ))
+
+    # Fetch one extra row to know whether another page exists without a COUNT(*).
+    rows = (
+        q.order_by(Messages.created_at.desc(), Messages.message_id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    messages: List[Dict] = [
+        {
+            "message_id": str(r.message_id),
+            "role": r.role,
+            "content": r.content,
+            "mood_label": r.mood_label,
+            "created_at": r.created_at.isoformat(),
+        }
+        for r in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].message_id) if has_more else None
+    return {"messages": messages, "next_cursor": next_cursor}
@@ -0,0 +1,211 @@
+# src/controllers/ingest_service.py
+"""
+Persisted queue of knowledge-base ingestion jobs.
+
+Admins enqueue jobs through /api/admin/ingest/jobs; they only insert a row.
+scripts/ingest_worker.py (a separate process, never a request thread)
+claims queued jobs, runs chunking.py / embedding.py as subprocesses and
+writes progress, a heartbeat and the final state back here. Cancellation is
+a flag the worker checks at every heartbeat.
+
+Jobs run one at a time across all workers: they share the chunk directory
+and the embed manifest.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from src.config import settings
+from src.extensions import db
+from src.models.ingest_jobs import IngestJobs
+
+
+# ────────────────────────────────────────────────────────────────
+# 1) Config
+# ────────────────────────────────────────────────────────────────
+# Options each job kind accepts (-> script flags), with their types.
+# "store" means KB_CHUNK_STORE: chunk repacks into it, embed reads from it.
+JOB_ARGS = {
+    "chunk": {"engine": str, "force": bool, "store": bool},
+    "embed": {"force": bool, "versioned": bool, "no_dedup": bool, "store": bool},
+}
+JOB_ARGS["reindex"] = {**JOB_ARGS["chunk"], **JOB_ARGS["embed"]}   # chunk, then embed
+# Embeds publish blue/green unless asked otherwise: once serving follows the
+# namespace pointer, an in-place update of the base namespace is never served.
+JOB_DEFAULTS = {"versioned": True}
+ENGINES = ("gemini", "local")
+FINISHED = ("succeeded", "failed", "cancelled")
+STATUSES = ("queued", "running") + FINISHED
+
+_CLAIM_LOCK_KEY = 0x696E6773  # 'ings': claims are serialised so only one job runs at a time
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_id(job_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(job_id))
+    except ValueError:
+        raise ValueError("job_not_found")
+
+
+def _serialize(job: IngestJobs) -> Dict[str, Any]:
+    ts = lambda v: v.isoformat() if v else None  # noqa: E731
+    return {
+        "job_id": str(job.job_id),
+        "kind": job.kind,
+        "args": job.args or {},
+        "status": job.status,
+        "cancel_requested": job.cancel_requested,
+        "progress": job.progress,
+        "log_tail": job.log_tail,
+        "error": job.error,
+        "exit_code": job.exit_code,
+        "created_by": job.created_by,
+        "worker": job.worker,
+        "created_at": ts(job.created_at),
+        "started_at": ts(job.started_at),
+        "heartbeat_at": ts(job.heartbeat_at),
+        "finished_at": ts(job.finished_at),
+    }
+
+
+# ────────────────────────────────────────────────────────────────
+# 2) Admin API
+# ────────────────────────────────────────────────────────────────
+def enqueue_job(kind: str, args: Optional[Dict[str, Any]] = None, *, created_by: Optional[str] = None) -> Dict:
+    """Queues a job. Raises ValueError('invalid_kind' | 'invalid_args' | 'chunk_store_not_configured')."""
+    if kind not in JOB_ARGS:
+        raise ValueError("invalid_kind")
+    args = args or {}
+    allowed = JOB_ARGS[kind]
+    if not isinstance(args, dict) or any(k not in allowed or not isinstance(v, allowed[k]) for k, v in args.items()):
+        raise ValueError("invalid_args")
+    if "engine" in args and args["engine"] not in ENGINES:
+        raise ValueError("invalid_args")
+    if args.get("store") and not settings.KB_CHUNK_STORE:
+        raise ValueError("chunk_store_not_configured")
+
+    args = {**{k: v for k, v in JOB_DEFAULTS.items() if k in allowed}, **args}
+
+    job = IngestJobs(kind=kind, args=args, status="queued", cancel_requested=False, created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    return _serialize(job)
+
+
+def list_jobs(*, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+    """Newest first. Raises ValueError('invalid_status')."""
+    q = IngestJobs.query
+    if status:
+        if status not in STATUSES:
+            raise ValueError("invalid_status")
+        q = q.filter(IngestJobs.status == status)
+    rows = q.order_by(IngestJobs.created_at.desc()).limit(max(1, min(limit, 200))).all()
+    return [_serialize(j) for j in rows]
+
+
+def get_job(job_id: str) -> Dict:
+    job = db.session.get(IngestJobs, _parse_id(job_id))
+    if job is None:
+        raise ValueError("job_not_found")
+    return _serialize(job)
+
+
+def cancel_job(job_id: str) -> Dict:
+    """
+    Queued jobs are cancelled at once; running ones are flagged and stopped
+    by their worker within INGEST_HEARTBEAT_S.
+    Raises ValueError('job_not_found' | 'job_finished').
+    """
+    job = db.session.get(IngestJobs, _parse_id(job_id), with_for_update=True)
+    if job is None:
+        db.session.rollback()
+        raise ValueError("job_not_found")
+    if job.status in FINISHED:
+        db.session.rollback()
+        raise ValueError("job_finished")
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = _now()
+    job.cancel_requested = True
+    db.session.commit()
+    return _serialize(job)
+
+
+# ────────────────────────────────────────────────────────────────
+# 3) Worker side
+# ────────────────────────────────────────────────────────────────
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reap_stale_jobs() -> int:
+    """Fails running jobs whose worker stopped heartbeating (crashed / killed). Returns jobs reaped."""
+    cutoff = _now() - timedelta(seconds=settings.INGEST_STALE_S)
+    n = (
+        IngestJobs.query
+        .filter(IngestJobs.status == "running", IngestJobs.heartbeat_at < cutoff)
+        .update({"status": "failed", "error": "worker_lost", "finished_at": _now()}, synchronize_session=False)
+    )
+    db.session.commit()
+    return n
+
+
+def claim_next_job(worker: str) -> Optional[Dict]:
+    """Marks the oldest queued job running and returns it; None if idle or another job is running."""
+    # Transaction-scoped lock: concurrent claims queue up here and see each other's commits.
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _CLAIM_LOCK_KEY})
+    if IngestJobs.query.filter(IngestJobs.status == "running").first() is not None:
+        db.session.commit()
+        return None
+    job = (
+        IngestJobs.query
+        .filter(IngestJobs.status == "queued")
+        .order_by(IngestJobs.created_at)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.session.commit()
+        return None
+    now = _now()
+    job.status = "running"
+    job.worker = worker
+    job.started_at = now
+    job.heartbeat_at = now
+    job.progress = {"phase": "starting"}
+    db.session.commit()
+    return _serialize(job)
+
+
+def heartbeat(job_id: str, progress: Dict[str, Any], log_tail: str) -> bool:
+    """Stores progress + heartbeat; returns True when cancellation was requested."""
+    job = db.session.get(IngestJobs, _parse_id(job_id))
+    job.progress = progress
+    job.log_tail = log_tail
+    job.heartbeat_at = _now()
+    cancel = bool(job.cancel_requested)
+    db.session.commit()
+    return cancel
+
+
+def finish_job(job_id: str, status: str, *, exit_code: Optional[int] = None,
+               error: Optional[str] = None, progress: Optional[Dict[str, Any]] = None,
+               log_tail: Optional[str] = None) -> None:
+    job = db.session.get(IngestJobs, _parse_id(job_id))
+    job.status = status
+    job.exit_code = exit_code
+    job.error = error
+    if progress is not None:
+        job.progress = progress
+    if log_tail is not None:
+        job.log_tail = log_tail
+    job.finished_at = _now()
+    db.session.commit()
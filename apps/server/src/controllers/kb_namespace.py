@@ -0,0 +1,92 @@
+# src/controllers/kb_namespace.py
+"""
+Blue/green knowledge-base namespaces in Pinecone.
+
+`embedding.py --versioned` builds every reindex into a fresh namespace
+(`<base>-<version>`), smoke-tests it, and only then flips the pointer: one
+record (`POINTER_ID`) in the `META_NAMESPACE` namespace of the same index,
+whose metadata names the namespace to serve. A single upsert switches every
+server; until then they keep querying the previous, complete namespace.
+
+Servers read the pointer through ActiveNamespace (cached for a TTL) and fall
+back to the legacy fixed namespace while no pointer exists.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+META_NAMESPACE = "_meta"
+POINTER_ID = "active"
+
+
+def read_active(index) -> Optional[Dict[str, Any]]:
+    """Pointer metadata ({"namespace", "version", ...}) or None if never published."""
+    res = index.fetch(ids=[POINTER_ID], namespace=META_NAMESPACE)
+    rec = res.vectors.get(POINTER_ID)
+    if rec is None or not rec.metadata or not rec.metadata.get("namespace"):
+        return None
+    return dict(rec.metadata)
+
+
+def write_active(index, namespace: str, dim: int, **extra: Any) -> Dict[str, Any]:
+    """Points serving at `namespace` (atomic: one record upsert). Returns the new pointer."""
+    metadata = {**extra, "namespace": namespace, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    # Dense indexes reject all-zero vectors; the pointer's values are never queried.
+    values = [1.0] + [0.0] * (dim - 1)
+    index.upsert(vectors=[{"id": POINTER_ID, "values": values, "metadata": metadata}], namespace=META_NAMESPACE)
+    return metadata
+
+
+def namespace_counts(index) -> Dict[str, int]:
+    """{namespace: vector count} from index stats."""
+    stats = index.describe_index_stats()
+    return {ns: int(s.vector_count) for ns, s in (stats.namespaces or {}).items()}
+
+
+def versioned_namespaces(index, base: str) -> List[str]:
+    """Namespaces built by versioned runs for `base`, oldest first (versions sort by time)."""
+    return sorted(ns for ns in namespace_counts(index) if ns.startswith(base + "-"))
+
+
+def gc_namespaces(index, base: str, *, protect: Iterable[str], keep: int) -> List[str]:
+    """Deletes versioned namespaces beyond the newest `keep`, never touching `protect`. Returns those deleted."""
+    protect = set(protect)
+    versions = versioned_namespaces(index, base)
+    stale = versions[:-keep] if keep > 0 else versions
+    deleted = []
+    for ns in stale:
+        if ns in protect:
+            continue
+        index.delete(delete_all=True, namespace=ns)
+        deleted.append(ns)
+    return deleted
+
+
+class ActiveNamespace:
+    """
+    Cached pointer lookup for the request path: at most one fetch per `ttl_s`
+    per process. If a refresh fails, the last known namespace keeps serving.
+    """
+
+    def __init__(self, index, *, default: str, ttl_s: float):
+        self.index = index
+        self.default = default
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._namespace: Optional[str] = None
+        self._checked_at = 0.0
+
+    def get(self) -> str:
+        now = time.monotonic()
+        if self._namespace is not None and now - self._checked_at < self.ttl_s:
+            return self._namespace
+        with self._lock:
+            if self._namespace is None or time.monotonic() - self._checked_at >= self.ttl_s:
+                try:
+                    pointer = read_active(self.index)
+                    self._namespace = pointer["namespace"] if pointer else self.default
+                except Exception as e:
+                    print(f"KB namespace pointer unavailable ({e!r}); serving {self._namespace or self.default}")
+                    self._namespace = self._namespace or self.default
+                self._checked_at = time.monotonic()
+            return self._namespace
@@ -0,0 +1,182 @@
+# src/controllers/kb_snapshot.py
+"""
+Versioned local snapshots of the KB embeddings.
+
+embedding.py writes one after every run, next to the chunk corpus:
+
+    <root>/<version>/vectors.npy     float32 (N, dim), np.load(mmap_mode="r")
+    <root>/<version>/records.jsonl   row i: {"id", "hash", "metadata"} (vector record
+                                     metadata + content hash, same as the embed manifest)
+    <root>/<version>/snapshot.json   {"version", "model", "dim", "count", "created_at", ...}
+    <root>/LATEST                    name of the newest complete snapshot
+
+A version directory is written under a temp name and renamed into place, so
+readers only ever see complete snapshots. Reloading a vector backend
+(bulk_load) or re-embedding into a new index/namespace with the same model
+reads vectors from here instead of calling the embedding API.
+"""
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LATEST_FILE = "LATEST"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl"
+INFO_FILE = "snapshot.json"
+
+
+class Snapshot:
+    """A loaded snapshot; `vectors` is memory-mapped, rows align with `ids`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, INFO_FILE), "r", encoding="utf-8") as f:
+            self.info: Dict[str, Any] = json.load(f)
+        self.ids: List[str] = []
+        self.hashes: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        with open(os.path.join(path, RECORDS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                self.ids.append(rec["id"])
+                self.hashes.append(rec["hash"])
+                self.metadata.append(rec["metadata"])
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        if self.vectors.shape != (len(self.ids), self.info["dim"]):
+            raise ValueError("invalid_snapshot")
+        self._rows = {cid: i for i, cid in enumerate(self.ids)}
+
+    @property
+    def version(self) -> str:
+        return self.info["version"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def matches(self, model: str, dim: int) -> bool:
+        """Vectors are reusable only for the same embedding model and dimension."""
+        return self.info.get("model") == model and self.info.get("dim") == dim
+
+    def vector(self, cid: str, content_hash: Optional[str] = None) -> Optional[np.ndarray]:
+        """The stored vector for `cid`; None if absent or embedded from different content."""
+        i = self._rows.get(cid)
+        if i is None or (content_hash is not None and self.hashes[i] != content_hash):
+            return None
+        return self.vectors[i]
+
+    def batches(self, batch_size: int) -> Iterator[Tuple[List[str], np.ndarray, List[Dict[str, Any]]]]:
+        """(ids, vectors, metadata) slices in row order."""
+        for start in range(0, len(self.ids), batch_size):
+            end = start + batch_size
+            yield self.ids[start:end], np.asarray(self.vectors[start:end]), self.metadata[start:end]
+
+
+def _new_version() -> str:
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+
+
+def list_snapshots(root: str) -> List[str]:
+    """Complete snapshot versions under `root`, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isfile(os.path.join(root, name, INFO_FILE))
+    )
+
+
+def load_snapshot(root: str, version: str = "latest") -> Optional[Snapshot]:
+    """Snapshot `version` (or the LATEST one) under `root`; None if there is none."""
+    if version == "latest":
+        try:
+            with open(os.path.join(root, LATEST_FILE), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            versions = list_snapshots(root)
+            if not versions:
+                return None
+            version = versions[-1]
+    path = os.path.join(root, version)
+    if not os.path.isfile(os.path.join(path, INFO_FILE)):
+        return None
+    return Snapshot(path)
+
+
+def write_snapshot(root: str,
+                   rows: Sequence[Tuple[str, str, Dict[str, Any], Sequence[float]]],
+                   *,
+                   model: str,
+                   dim: int,
+                   extra: Optional[Dict[str, Any]] = None,
+                   keep: int = 3) -> str:
+    """
+    Writes (id, hash, metadata, vector) rows as a new version, points LATEST
+    at it and drops all but the newest `keep` versions. Returns the version.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = _new_version()
+    while os.path.exists(os.path.join(root, version)):
+        time.sleep(1)
+        version = _new_version()
+    tmp = os.path.join(root, f".tmp-{version}-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    vectors = np.lib.format.open_memmap(os.path.join(tmp, VECTORS_FILE), mode="w+",
+                                        dtype=np.float32, shape=(len(rows), dim))
+    with open(os.path.join(tmp, RECORDS_FILE), "w", encoding="utf-8") as f:
+        for i, (cid, h, meta, vec) in enumerate(rows):
+            vectors[i] = vec
+            f.write(json.dumps({"id": cid, "hash": h, "metadata": meta}, ensure_ascii=False) + "\n")
+    vectors.flush()
+    del vectors
+
+    info = {**(extra or {}), "version": version, "model": model, "dim": dim,
+            "count": len(rows), "dtype": "float32",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    with open(os.path.join(tmp, INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(root, version))
+
+    pointer_tmp = os.path.join(root, f"{LATEST_FILE}.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(pointer_tmp, os.path.join(root, LATEST_FILE))
+
+    for old in list_snapshots(root)[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+def bulk_load(snapshot: Snapshot,
+              upsert: Callable[[List[str], np.ndarray, List[Dict[str, Any]]], None],
+              *,
+              batch_size: int = 100,
+              workers: int = 4) -> int:
+    """
+    Streams every row into a vector backend through `upsert(ids, vectors,
+    metadata)` (called concurrently from `workers` threads; retries are the
+    callback's job). Returns rows loaded.
+    """
+    def load(ids, vecs, metas) -> int:
+        upsert(ids, vecs, metas)
+        return len(ids)
+
+    loaded = 0
+    workers = max(1, workers)
+    in_flight: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ids, vecs, metas in snapshot.batches(batch_size):
+            # Bounded window: only a few batches are paged in from the mmap at a time
+            if len(in_flight) >= 2 * workers:
+                loaded += in_flight.popleft().result()
+            in_flight.append(pool.submit(load, ids, vecs, metas))
+        while in_flight:
+            loaded += in_flight.popleft().result()
+    return loaded
@@ -0,0 +1,242 @@
+# src/controllers/mood_service.py
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Float, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.config import settings
+from src.extensions import db
+from src.models.mood import MoodEvents, MoodRollups, MoodRollupState
+
+
+# ────────────────────────────────────────────────────────────────
+# 1) Config
+# ────────────────────────────────────────────────────────────────
+MOOD_CLASSES = ("happy", "sad", "neutral")  # FER class order (fer_service._classes)
+SOURCES = ("fer", "chat")
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Longest range a single trends query may cover, per granularity (bounds rows read).
+MAX_RANGE = {"hour": timedelta(days=31), "day": timedelta(days=366)}
+
+_STATE_NAME = "mood_rollups"
+_ADVISORY_LOCK_KEY = 0x6D6F6F64  # 'mood': one rollup runner at a time across workers
+
+
+# ────────────────────────────────────────────────────────────────
+# 2) Writes
+# ────────────────────────────────────────────────────────────────
+def record_mood_event(user_id: str,
+                      source: str,
+                      label: str,
+                      *,
+                      probs: Optional[Dict[str, float]] = None,
+                      session_id: Optional[str] = None) -> None:
+    """Appends one observation. Callers on a request path should not fail on errors here."""
+    if source not in SOURCES:
+        raise ValueError("invalid_source")
+    db.session.add(MoodEvents(
+        user_id=user_id,
+        session_id=session_id,
+        source=source,
+        label=label,
+        probs=probs,
+    ))
+    db.session.commit()
+
+
+# ────────────────────────────────────────────────────────────────
+# 3) Rollups
+# ────────────────────────────────────────────────────────────────
+def _bucket_start(ts: datetime, granularity: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _recompute_bucket(user_id, granularity: str, start: datetime) -> None:
+    """Rebuilds one bucket from raw events (idempotent) and upserts it."""
+    end = start + GRANULARITIES[granularity]
+    prob_cols = [func.sum(MoodEvents.probs[c].astext.cast(Float)) for c in MOOD_CLASSES]
+    rows = (
+        db.session.query(MoodEvents.label, func.count(), func.count(MoodEvents.probs), *prob_cols)
+        .filter(
+            MoodEvents.user_id == user_id,
+            MoodEvents.created_at >= start,
+            MoodEvents.created_at < end,
+        )
+        .group_by(MoodEvents.label)
+        .all()
+    )
+    counts: Dict[str, int] = {}
+    sums = {c: 0.0 for c in MOOD_CLASSES}
+    prob_n = 0
+    for label, n, n_probs, *class_sums in rows:
+        counts[label] = int(n)
+        prob_n += int(n_probs)
+        for c, v in zip(MOOD_CLASSES, class_sums):
+            sums[c] += float(v or 0.0)
+
+    values = dict(
+        user_id=user_id,
+        granularity=granularity,
+        bucket_start=start,
+        n=sum(counts.values()),
+        counts=counts,
+        prob_n=prob_n,
+        prob_sums=sums,
+    )
+    stmt = pg_insert(MoodRollups).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "granularity", "bucket_start"],
+        set_={
+            **{k: stmt.excluded[k] for k in ("n", "counts", "prob_n", "prob_sums")},
+            "updated_at": func.now(),
+        },
+    )
+    db.session.execute(stmt)
+
+
+def run_rollup_once(batch_size: Optional[int] = None) -> int:
+    """
+    Folds events past the watermark into their hourly and daily buckets.
+
+    created_at is the inserting transaction's start time while event_id is
+    drawn at insert, so neither orders commits. The watermark therefore only
+    advances through the leading run of events older than
+    MOOD_ROLLUP_SETTLE_S and stops at the first younger one. Each pass also
+    re-folds the buckets of events created in the last MOOD_ROLLUP_OVERLAP_S
+    at or below the watermark: a slow transaction may commit an id the
+    watermark already passed. Buckets are rebuilt from raw events, so the
+    overlap is harmless. Returns events newly past the watermark.
+    """
+    batch_size = batch_size or settings.MOOD_ROLLUP_BATCH
+    # Other workers may run the same job; only one proceeds per round.
+    got_lock = db.session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _ADVISORY_LOCK_KEY}
+    ).scalar()
+    if not got_lock:
+        db.session.rollback()
+        return 0
+
+    state = db.session.get(MoodRollupState, _STATE_NAME, with_for_update=True)
+    if state is None:
+        state = MoodRollupState(name=_STATE_NAME, last_event_id=0)
+        db.session.add(state)
+
+    settle = datetime.now(timezone.utc) - timedelta(seconds=settings.MOOD_ROLLUP_SETTLE_S)
+    events: List[Tuple[int, object, datetime]] = (
+        db.session.query(MoodEvents.event_id, MoodEvents.user_id, MoodEvents.created_at)
+        .filter(MoodEvents.event_id > state.last_event_id)
+        .order_by(MoodEvents.event_id)
+        .limit(batch_size)
+        .all()
+    )
+    settled = 0
+    while settled < len(events) and events[settled][2] < settle:
+        settled += 1
+    events = events[:settled]
+
+    late: List[Tuple[object, datetime]] = (
+        db.session.query(MoodEvents.user_id, MoodEvents.created_at)
+        .filter(
+            MoodEvents.event_id <= state.last_event_id,
+            MoodEvents.created_at >= settle - timedelta(seconds=settings.MOOD_ROLLUP_OVERLAP_S),
+            MoodEvents.created_at < settle,
+        )
+        .all()
+    )
+
+    touched: Set[Tuple[object, str, datetime]] = set()
+    for user_id, created_at in [(e[1], e[2]) for e in events] + late:
+        for g in GRANULARITIES:
+            touched.add((user_id, g, _bucket_start(created_at, g)))
+    for user_id, g, start in sorted(touched, key=lambda t: (str(t[0]), t[1], t[2])):
+        _recompute_bucket(user_id, g, start)
+
+    if events:
+        state.last_event_id = events[-1][0]
+    db.session.commit()
+    return len(events)
+
+
+def start_rollup_worker(app) -> Optional[threading.Thread]:
+    """Runs run_rollup_once every MOOD_ROLLUP_INTERVAL_S in a daemon thread (0 disables)."""
+    interval = settings.MOOD_ROLLUP_INTERVAL_S
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    # Drain a backlog in consecutive batches
+                    while run_rollup_once() >= settings.MOOD_ROLLUP_BATCH:
+                        pass
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Mood rollup failed")
+
+    t = threading.Thread(target=loop, name="mood-rollups", daemon=True)
+    t.start()
+    return t
+
+
+# ────────────────────────────────────────────────────────────────
+# 4) Public API (call from your route)
+# ────────────────────────────────────────────────────────────────
+def _serialize(row: MoodRollups) -> Dict:
+    counts = row.counts or {}
+    mean_probs = (
+        {c: row.prob_sums.get(c, 0.0) / row.prob_n for c in MOOD_CLASSES} if row.prob_n else None
+    )
+    dominant = max(counts, key=counts.get) if counts else None
+    return {
+        "bucket_start": row.bucket_start.isoformat(),
+        "n": row.n,
+        "counts": counts,
+        "mean_probs": mean_probs,
+        "dominant": dominant,
+    }
+
+
+def get_trends(user_id: str,
+               *,
+               granularity: str = "day",
+               start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Dict:
+    """
+    Rollup buckets for [start, end) — default: the last 30 days (day) or
+    48 hours (hour). Reads at most one row per bucket, however many raw
+    events the user has. Raises ValueError('invalid_granularity' | 'invalid_range').
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError("invalid_granularity")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - (timedelta(days=30) if granularity == "day" else timedelta(hours=48))
+    if start.tzinfo is None or end.tzinfo is None:
+        raise ValueError("invalid_range")
+    if start >= end or end - start > MAX_RANGE[granularity]:
+        raise ValueError("invalid_range")
+
+    rows: Iterable[MoodRollups] = (
+        MoodRollups.query
+        .filter(
+            MoodRollups.user_id == user_id,
+            MoodRollups.granularity == granularity,
+            MoodRollups.bucket_start >= _bucket_start(start, granularity),
+            MoodRollups.bucket_start < end,
+        )
+        .order_by(MoodRollups.bucket_start)
+        .all()
+    )
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": [_serialize(r) for r in rows],
+    }
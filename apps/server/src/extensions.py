@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_sock import Sock
 
 db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+sock = Sock()
\ No newline at end of file
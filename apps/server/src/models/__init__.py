@@ -1,5 +1,7 @@
 from .users import Users
 from .active_sessions import ActiveSessions
 from .messages import Messages
+from .mood import MoodEvents, MoodRollups, MoodRollupState
+from .ingest_jobs import IngestJobs
 
-__all__ = ["Users", "ActiveSessions", "Messages"]
\ No newline at end of file
+__all__ = ["Users", "ActiveSessions", "Messages", "MoodEvents", "MoodRollups", "MoodRollupState", "IngestJobs"]
\ No newline at end of file
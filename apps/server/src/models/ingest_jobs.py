@@ -0,0 +1,42 @@
+from sqlalchemy import func, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from src.extensions import db
+
+
+class IngestJobs(db.Model):
+    """Knowledge-base chunk / embed jobs, queued via /api/admin and run by scripts/ingest_worker.py."""
+    __tablename__ = "ingest_jobs"
+
+    job_id = db.Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()"),
+        nullable=False,
+    )
+    kind = db.Column(db.Text, nullable=False)                  # 'chunk' | 'embed' | 'reindex'
+    args = db.Column(JSONB, nullable=False, default=dict)      # whitelisted script options
+    # 'queued' -> 'running' -> 'succeeded' | 'failed' | 'cancelled'
+    status = db.Column(db.Text, nullable=False, default="queued")
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    progress = db.Column(JSONB, nullable=True)                 # {"phase", "message", counters...}
+    log_tail = db.Column(db.Text, nullable=True)               # last lines of script output
+    error = db.Column(db.Text, nullable=True)
+    exit_code = db.Column(db.Integer, nullable=True)
+    created_by = db.Column(db.Text, nullable=True)             # admin email
+    worker = db.Column(db.Text, nullable=True)                 # host:pid that claimed it
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest queued job; the admin list filters by status
+        Index("idx_ingest_jobs_status_created", "status", "created_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<IngestJobs job_id={self.job_id} kind={self.kind} status={self.status}>"
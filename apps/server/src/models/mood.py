@@ -0,0 +1,74 @@
+from sqlalchemy import func, Index, ForeignKey, BigInteger
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from src.extensions import db
+
+
+class MoodEvents(db.Model):
+    """Append-only mood observations (FER predictions, chat mood labels)."""
+    __tablename__ = "mood_events"
+
+    event_id = db.Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = db.Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # Client-chosen capture / conversation id; free-form, so no FK.
+    session_id = db.Column(db.Text, nullable=True)
+    source = db.Column(db.Text, nullable=False)        # 'fer' | 'chat'
+    label = db.Column(db.Text, nullable=False)
+    probs = db.Column(JSONB, nullable=True)            # {class: p}; FER only
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        # Bucket recomputes scan one user's events in a time range
+        Index("idx_mood_events_user_created", "user_id", "created_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<MoodEvents event_id={self.event_id} user_id={self.user_id} label={self.label}>"
+
+
+class MoodRollups(db.Model):
+    """Per-user hourly / daily aggregates of MoodEvents, maintained by the rollup job."""
+    __tablename__ = "mood_rollups"
+
+    user_id = db.Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    granularity = db.Column(db.Text, primary_key=True)          # 'hour' | 'day'
+    bucket_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+
+    n = db.Column(db.Integer, nullable=False)                   # events in the bucket
+    counts = db.Column(JSONB, nullable=False)                   # {label: n}
+    prob_n = db.Column(db.Integer, nullable=False)              # events that carried probs
+    prob_sums = db.Column(JSONB, nullable=False)                # {class: sum p}; mean = sum / prob_n
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"<MoodRollups user_id={self.user_id} {self.granularity} {self.bucket_start} n={self.n}>"
+
+
+class MoodRollupState(db.Model):
+    """Watermark of the rollup job: every event_id <= last_event_id is aggregated."""
+    __tablename__ = "mood_rollup_state"
+
+    name = db.Column(db.Text, primary_key=True)
+    last_event_id = db.Column(BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -0,0 +1,130 @@
+# src/routes/admin.py
+from functools import wraps
+
+from flask import Blueprint, g, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.config import settings
+from src.controllers.fer_service import activate_model, list_models
+from src.controllers.ingest_service import cancel_job, enqueue_job, get_job, list_jobs
+from src.models.users import Users
+
+admin_bp = Blueprint("admin", __name__)
+
+
+def admin_required(fn):
+    """
+    JWT required, and its user's email must be listed in ADMIN_EMAILS.
+    The email is read from Users by the token's identity, not from its
+    'email' claim, which older refreshed tokens lack. It is left in
+    g.admin_email for the view.
+    """
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        admins = {e.strip().lower() for e in settings.ADMIN_EMAILS.split(",") if e.strip()}
+        user = Users.query.filter_by(user_id=get_jwt_identity()).first()
+        if user is None or user.email.lower() not in admins:
+            return jsonify({"error": "forbidden"}), 403
+        g.admin_email = user.email
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route("/fer/models", methods=["GET"])
+@admin_required
+def fer_models():
+    """Known FER model versions and which one this process serves."""
+    return jsonify({"models": list_models()}), 200
+
+
+@admin_bp.route("/fer/models/activate", methods=["POST"])
+@admin_required
+def fer_activate():
+    """
+    POST JSON { "version": "<name>" }
+    Loads + smoke-tests the version, swaps it in here and points the other
+    workers at it (they follow within FER_MODEL_POLL_S). A version that is not
+    a bare file name (path separators, '..') is rejected with 422 invalid_version.
+    """
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if not version:
+        return jsonify({"error": "missing 'version'"}), 400
+    try:
+        return jsonify({"active": activate_model(version)}), 200
+    except ValueError as ve:
+        if str(ve) == "unknown_model_version":
+            return jsonify({"error": str(ve)}), 404
+        return jsonify({"error": str(ve)}), 422
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+def _ingest_error(ve: ValueError):
+    code = str(ve)
+    if code == "job_not_found":
+        return jsonify({"error": code}), 404
+    if code == "job_finished":
+        return jsonify({"error": code}), 409
+    return jsonify({"error": code}), 400
+
+
+@admin_bp.route("/ingest/jobs", methods=["POST"])
+@admin_required
+def ingest_enqueue():
+    """
+    POST JSON { "kind": "chunk" | "embed" | "reindex", "args": {...} }
+    Only queues the job; scripts/ingest_worker.py runs it. Embeds are
+    blue/green ("versioned": true) unless args say otherwise.
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind")
+    if not kind:
+        return jsonify({"error": "missing 'kind'"}), 400
+    try:
+        job = enqueue_job(kind, data.get("args"), created_by=g.admin_email)
+        return jsonify({"job": job}), 202
+    except ValueError as ve:
+        return _ingest_error(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+@admin_bp.route("/ingest/jobs", methods=["GET"])
+@admin_required
+def ingest_list():
+    """GET ?status=queued|running|succeeded|failed|cancelled&limit=50"""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"error": "invalid_limit"}), 400
+    try:
+        return jsonify({"jobs": list_jobs(status=request.args.get("status"), limit=limit)}), 200
+    except ValueError as ve:
+        return _ingest_error(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+@admin_bp.route("/ingest/jobs/<job_id>", methods=["GET"])
+@admin_required
+def ingest_get(job_id):
+    """Status, progress counters and the tail of the script output."""
+    try:
+        return jsonify({"job": get_job(job_id)}), 200
+    except ValueError as ve:
+        return _ingest_error(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+@admin_bp.route("/ingest/jobs/<job_id>/cancel", methods=["POST"])
+@admin_required
+def ingest_cancel(job_id):
+    """Queued jobs are cancelled at once; running ones stop at the worker's next heartbeat."""
+    try:
+        return jsonify({"job": cancel_job(job_id)}), 200
+    except ValueError as ve:
+        return _ingest_error(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
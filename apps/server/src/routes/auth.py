@@ -71,7 +71,11 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     user_id = get_jwt_identity()
-    new_access = create_access_token(identity=user_id)
+    user = Users.query.filter_by(user_id=user_id).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    # Same claims as /login: admin checks and clients read the email
+    new_access = create_access_token(identity=user_id, additional_claims={"email": user.email})
     return jsonify({"access_token": new_access}), 200
 
 
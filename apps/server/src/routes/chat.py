@@ -4,6 +4,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from uuid import uuid4
 
 from src.controllers.chat_service import gemini_answer  # renamed import
+from src.controllers.history_service import get_history_page, DEFAULT_PAGE_SIZE
+from src.controllers.mood_service import record_mood_event
+from src.extensions import db
 
 chat_bp = Blueprint("chat", __name__)
 
@@ -22,6 +25,15 @@ def chat():
     # if user_id_from_body and str(user_id_from_body) != user_id_from_jwt:
     #     return jsonify({"error": "user_id mismatch"}), 403
 
+    # Mood the client attached to this message (e.g. its latest FER result) -> mood history
+    mood_label = payload.get("mood_label")
+    if isinstance(mood_label, str) and mood_label:
+        try:
+            record_mood_event(user_id_from_jwt, "chat", mood_label, session_id=payload.get("session_id"))
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Failed to record chat mood event")
+
     try:
         reply_text = gemini_answer(text, user_id=user_id_from_jwt)
     except Exception as e:
@@ -39,4 +51,33 @@ def chat():
             "used_guardrail": False,
             "retrieved_k": 0,
         },
-    }), 200
\ No newline at end of file
+    }), 200
+
+@chat_bp.route("/history", methods=["GET"])
+@jwt_required()
+def history():
+    """
+    GET ?session_id=<uuid>&limit=<n>&cursor=<opaque>
+    Returns { messages: [...newest first], next_cursor } for the caller's session.
+    Pass `next_cursor` back as `cursor` to fetch the next (older) page.
+    """
+    session_id = request.args.get("session_id")
+    if not session_id:
+        return jsonify({"error": "Query param 'session_id' is required"}), 400
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+
+    try:
+        page = get_history_page(
+            str(get_jwt_identity()),
+            session_id,
+            limit=limit,
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    return jsonify(page), 200
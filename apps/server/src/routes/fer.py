@@ -1,13 +1,66 @@
 # src/routes/fer.py
-from flask import Blueprint, request, jsonify
-from src.controllers.fer_service import classify_base64_image
+import json
+import threading
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from src.config import settings
+from src.extensions import db, sock
+from src.controllers.fer_service import (
+    classify_base64_image, classify_batch, classify_image_bytes, fer_stats,
+)
+from src.controllers.fer_stream import MoodStream
+from src.controllers.mood_service import record_mood_event
 
 fer_bp = Blueprint("fer", __name__)
 
+_READ_CHUNK = 64 * 1024
+
+
+def _error_response(ve: ValueError):
+    if str(ve) == "no_face_detected":
+        return jsonify({"error": "No face detected"}), 422
+    if str(ve) == "payload_too_large":
+        return jsonify({"error": "Image too large"}), 413
+    return jsonify({"error": str(ve)}), 400
+
+
+def _read_limited(stream, limit: int) -> bytes:
+    """Reads a body stream into one buffer, bailing out as soon as it passes `limit`."""
+    buf = bytearray()
+    while True:
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            return bytes(buf)
+        buf += chunk
+        if len(buf) > limit:
+            raise ValueError("payload_too_large")
+
+
+def _record_mood(result, session_id) -> None:
+    """Appends the prediction to the caller's mood history when a valid JWT is sent; anonymous calls skip it."""
+    try:
+        if not verify_jwt_in_request(optional=True):
+            return
+        user_id = get_jwt_identity()
+    except Exception:
+        return
+    if not user_id:
+        return
+    try:
+        record_mood_event(str(user_id), "fer", result["prediction"],
+                          probs=result["probs"], session_id=session_id)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to record FER mood event")
+
+
 @fer_bp.route("/detect_emotion", methods=["POST"])
 def detect_emotion():
     """
     POST JSON with one of: 'photo', 'photo_base64', 'image_base64'
+    Optional 'session_id' lets repeat captures reuse the last face location.
+    With a valid JWT the prediction is also added to the user's mood history.
     Returns { prediction, probs, face_box } or { error }.
     """
     data = request.get_json(silent=True) or {}
@@ -17,11 +70,120 @@ def detect_emotion():
         return jsonify({"error": "missing 'photo' (or 'photo_base64'/'image_base64')"}), 400
 
     try:
-        result = classify_base64_image(image_b64)
+        result = classify_base64_image(image_b64, session_id=data.get("session_id"))
+        _record_mood(result, data.get("session_id"))
         return jsonify(result), 200
     except ValueError as ve:
-        if str(ve) == "no_face_detected":
-            return jsonify({"error": "No face detected"}), 422
-        return jsonify({"error": str(ve)}), 400
+        return _error_response(ve)
     except Exception as e:
-        return jsonify({"error": "internal_error"}), 500
\ No newline at end of file
+        return jsonify({"error": "internal_error"}), 500
+
+
+@fer_bp.route("/stats", methods=["GET"])
+def stats():
+    """Per-process FER cache / ROI tracker counters."""
+    return jsonify(fer_stats()), 200
+
+
+@fer_bp.route("/detect_emotion/upload", methods=["POST"])
+def detect_emotion_upload():
+    """
+    Binary variant of /detect_emotion (no JSON, no base64):
+      - raw body with Content-Type image/jpeg, image/png, ... or application/octet-stream
+      - multipart/form-data with a 'photo' file part
+    Optional 'session_id' as a query param (or form field for multipart).
+    Returns the same { prediction, probs, face_box } or { error }.
+    """
+    limit = settings.FER_MAX_IMAGE_BYTES
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": "Image too large"}), 413
+
+    session_id = request.args.get("session_id")
+    try:
+        if request.mimetype == "multipart/form-data":
+            upload = request.files.get("photo")
+            if upload is None:
+                return jsonify({"error": "missing 'photo' file part"}), 400
+            session_id = session_id or request.form.get("session_id")
+            img_bytes = _read_limited(upload.stream, limit)
+        else:
+            img_bytes = _read_limited(request.stream, limit)
+
+        if not img_bytes:
+            return jsonify({"error": "empty body"}), 400
+
+        result = classify_image_bytes(img_bytes, session_id=session_id)
+        _record_mood(result, session_id)
+        return jsonify(result), 200
+    except ValueError as ve:
+        return _error_response(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+@fer_bp.route("/detect_emotion_batch", methods=["POST"])
+def detect_emotion_batch():
+    """
+    Many images, every face per image, one forward pass:
+      - JSON { "images": [<base64 or data URL>, ...], "max_faces"?: int }
+      - multipart/form-data with one or more 'photos' file parts
+    Returns { results: [{ faces: [{ prediction, probs, face_box }], count } | { error }] }
+    in request order; an undecodable image fails only its own entry.
+    """
+    max_images = settings.FER_BATCH_MAX_IMAGES
+    # base64 inflates by 4/3; multipart bodies are also bounded per part by _read_limited
+    body_limit = settings.FER_MAX_IMAGE_BYTES * max_images * 4 // 3
+    if request.content_length is not None and request.content_length > body_limit:
+        return jsonify({"error": "Request too large"}), 413
+
+    try:
+        if request.mimetype == "multipart/form-data":
+            uploads = request.files.getlist("photos")
+            max_faces = request.form.get("max_faces", type=int)
+            if len(uploads) > max_images:
+                return jsonify({"error": f"at most {max_images} images per request"}), 400
+            images = [_read_limited(u.stream, settings.FER_MAX_IMAGE_BYTES) for u in uploads]
+        else:
+            data = request.get_json(silent=True) or {}
+            images = data.get("images")
+            max_faces = data.get("max_faces")
+            if not isinstance(images, list) or not all(isinstance(i, str) for i in images):
+                return jsonify({"error": "'images' must be a list of base64 strings"}), 400
+            if len(images) > max_images:
+                return jsonify({"error": f"at most {max_images} images per request"}), 400
+
+        if not images:
+            return jsonify({"error": "no images"}), 400
+        if max_faces is not None:
+            if not isinstance(max_faces, int) or max_faces < 1:
+                return jsonify({"error": "'max_faces' must be a positive integer"}), 400
+            max_faces = min(max_faces, settings.FER_MAX_FACES_PER_IMAGE)
+
+        return jsonify({"results": classify_batch(images, max_faces=max_faces)}), 200
+    except ValueError as ve:
+        return _error_response(ve)
+    except Exception as e:
+        return jsonify({"error": "internal_error"}), 500
+
+
+@sock.route("/stream", bp=fer_bp)
+def stream(ws):
+    """
+    WebSocket /api/fer/stream?session_id=<id>
+    Client sends one encoded image per message (binary JPEG/PNG, or base64 text).
+    Server pushes { prediction, probs, face_box, frames, dropped } whenever the
+    EMA-smoothed mood changes; frames arriving faster than inference are dropped.
+    """
+    mood = MoodStream(session_id=request.args.get("session_id"), alpha=settings.FER_STREAM_EMA_ALPHA)
+    worker = threading.Thread(
+        target=mood.run, args=(lambda msg: ws.send(json.dumps(msg)), ws.close), name="fer-stream", daemon=True
+    )
+    worker.start()
+    try:
+        while True:
+            frame = ws.receive()
+            if frame is None:
+                continue
+            mood.offer(frame)
+    finally:
+        mood.close()
@@ -0,0 +1,40 @@
+# src/routes/mood.py
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from src.controllers.mood_service import get_trends
+
+mood_bp = Blueprint("mood", __name__)
+
+
+def _parse_ts(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("invalid_range")
+
+
+@mood_bp.route("/trends", methods=["GET"])
+@jwt_required()
+def trends():
+    """
+    GET ?granularity=hour|day&start=<iso8601>&end=<iso8601>
+    Returns { granularity, start, end, buckets: [{ bucket_start, n, counts,
+    mean_probs, dominant }] } for the caller, oldest bucket first. Served
+    from pre-aggregated rollups (refreshed every MOOD_ROLLUP_INTERVAL_S).
+    """
+    try:
+        result = get_trends(
+            str(get_jwt_identity()),
+            granularity=request.args.get("granularity", "day"),
+            start=_parse_ts(request.args.get("start")),
+            end=_parse_ts(request.args.get("end")),
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    return jsonify(result), 200
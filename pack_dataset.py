@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# -----------------------------
+# Packed dataset layout (shared by train_emotions.py and train_fer2013.py)
+#
+#   <root>/classes.json           ["class0", "class1", ...]
+#   <root>/<split>_images.npy     uint8 (N, 48, 48) grayscale
+#   <root>/<split>_labels.npy     int64 (N,)
+#
+# Plain .npy files, opened with mmap_mode="r": decoding happens once here,
+# training only pages in the rows each batch needs.
+# -----------------------------
+IMG_SIZE = 48
+IMG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".ppm", ".bmp", ".pgm", ".tif", ".tiff", ".webp")
+
+
+def split_paths(root, split):
+    return (os.path.join(root, f"{split}_images.npy"),
+            os.path.join(root, f"{split}_labels.npy"))
+
+
+def create_split(root, split, n):
+    """Writable (images, labels) memmaps for `n` samples."""
+    os.makedirs(root, exist_ok=True)
+    img_path, lbl_path = split_paths(root, split)
+    images = np.lib.format.open_memmap(img_path, mode="w+", dtype=np.uint8, shape=(n, IMG_SIZE, IMG_SIZE))
+    labels = np.lib.format.open_memmap(lbl_path, mode="w+", dtype=np.int64, shape=(n,))
+    return images, labels
+
+
+def open_split(root, split):
+    """Read-only (images, labels) memmaps."""
+    img_path, lbl_path = split_paths(root, split)
+    return np.load(img_path, mmap_mode="r"), np.load(lbl_path, mmap_mode="r")
+
+
+def write_classes(root, classes):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "classes.json"), "w") as f:
+        json.dump(list(classes), f)
+
+
+def read_classes(root):
+    with open(os.path.join(root, "classes.json")) as f:
+        return json.load(f)
+
+
+# -----------------------------
+# ImageFolder -> packed splits
+# -----------------------------
+def scan_image_folder(src):
+    """(classes, [(path, label)]) with the same class order as torchvision's ImageFolder."""
+    classes = sorted(e.name for e in os.scandir(src) if e.is_dir())
+    samples = []
+    for label, cls in enumerate(classes):
+        for dirpath, _, files in sorted(os.walk(os.path.join(src, cls), followlinks=True)):
+            for name in sorted(files):
+                if name.lower().endswith(IMG_EXTENSIONS):
+                    samples.append((os.path.join(dirpath, name), label))
+    return classes, samples
+
+
+def decode(path):
+    # Same steps the old per-epoch transform ran: Grayscale() then Resize((48,48))
+    with Image.open(path) as img:
+        return np.asarray(img.convert("L").resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR), dtype=np.uint8)
+
+
+def pack_image_folder(src, out, val_frac=0.2, seed=0, workers=None):
+    classes, samples = scan_image_folder(src)
+    if not samples:
+        raise SystemExit(f"No images found under {src}")
+    order = np.random.default_rng(seed).permutation(len(samples))
+    n_val = int(round(val_frac * len(samples)))
+    splits = {"train": order[n_val:], "val": order[:n_val]}
+
+    write_classes(out, classes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for split, idx in splits.items():
+            images, labels = create_split(out, split, len(idx))
+            paths = [samples[i][0] for i in idx]
+            for j, arr in enumerate(pool.map(decode, paths, chunksize=64)):
+                images[j] = arr
+            labels[:] = [samples[i][1] for i in idx]
+            images.flush()
+            labels.flush()
+            print(f"{split}: {len(idx)} images -> {split_paths(out, split)[0]}")
+    return classes
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Decode an ImageFolder tree once into 48x48 uint8 memmap splits.")
+    ap.add_argument("--src", default="train_dataset")
+    ap.add_argument("--out", default="packed/emotions")
+    ap.add_argument("--val-frac", type=float, default=0.2)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="decode processes (default: all CPUs)")
+    args = ap.parse_args()
+
+    classes = pack_image_folder(args.src, args.out, args.val_frac, args.seed, args.workers)
+    print(f"✅ Packed {args.src} into {args.out} (classes: {', '.join(classes)})")
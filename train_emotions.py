@@ -1,21 +1,26 @@
+import argparse
+import math
 import os
+import time
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
-from torchvision import datasets, transforms
-from torch.utils.data import DataLoader, random_split
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+from pack_dataset import open_split, read_classes
 
 # -----------------------------
 # 1. CNN model
 # -----------------------------
 class TinyCNN(nn.Module):
-    def __init__(self):
+    def __init__(self, num_classes=3):
         super().__init__()
         self.conv1 = nn.Conv2d(1, 16, 3, padding=1)
         self.conv2 = nn.Conv2d(16, 32, 3, padding=1)
         self.pool = nn.MaxPool2d(2,2)
         self.fc1 = nn.Linear(32*12*12, 64)
-        self.fc2 = nn.Linear(64, 3)
+        self.fc2 = nn.Linear(64, num_classes)
 
     def forward(self, x):
         x = self.pool(torch.relu(self.conv1(x)))
@@ -26,84 +31,219 @@ class TinyCNN(nn.Module):
         return x
 
 # -----------------------------
-# 2. Device
+# 2. Data (packed by pack_dataset.py)
 # -----------------------------
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = TinyCNN().to(device)
+class PackedDataset(Dataset):
+    """
+    One packed split. Indexed with a list of indices (see make_loader) and
+    returns the whole batch: uint8 (B, 48, 48) images and int64 (B,) labels,
+    sliced straight out of the memmap. Each worker opens its own memmap.
+    """
+    def __init__(self, root, split):
+        self.root, self.split = root, split
+        self._arrays = None
+        self._len = len(open_split(root, split)[1])
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx):
+        if self._arrays is None:
+            self._arrays = open_split(self.root, self.split)
+        images, labels = self._arrays
+        idx = sorted(idx)  # sorted reads are sequential page-ins; the sampler already shuffled
+        return torch.from_numpy(images[idx]), torch.from_numpy(labels[idx])
+
+
+def make_loader(dataset, batch_size, shuffle, num_workers, device):
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,  # the dataset already returns batches
+        num_workers=num_workers,
+        pin_memory=(device == "cuda"),
+        persistent_workers=num_workers > 0,
+    )
 
 # -----------------------------
-# 3. Data + Augmentation
+# 3. Augmentation (batched, on device)
 # -----------------------------
-transform = transforms.Compose([
-    transforms.Grayscale(),
-    transforms.Resize((48,48)),
-    transforms.RandomHorizontalFlip(),
-    transforms.RandomRotation(10),
-    transforms.ToTensor()
-])
-
-dataset = datasets.ImageFolder("train_dataset", transform=transform)
+def to_input(images, device):
+    """uint8 (B, 48, 48) -> float (B, 1, 48, 48) in [0, 1], like ToTensor()."""
+    return images.to(device, non_blocking=True).unsqueeze(1).float().div_(255.0)
 
-# Optional: split into train + validation (80/20)
-train_size = int(0.8 * len(dataset))
-val_size = len(dataset) - train_size
-train_data, val_data = random_split(dataset, [train_size, val_size])
 
-train_loader = DataLoader(train_data, batch_size=32, shuffle=True)
-val_loader = DataLoader(val_data, batch_size=32, shuffle=False)
+def augment(x, max_degrees=10.0):
+    """RandomHorizontalFlip + RandomRotation(max_degrees) for a whole batch at once."""
+    b = x.size(0)
+    flip = torch.rand(b, device=x.device) < 0.5
+    x = torch.where(flip[:, None, None, None], x.flip(-1), x)
 
-# -----------------------------
-# 4. Loss + Optimizer
-# -----------------------------
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
+    theta = (torch.rand(b, device=x.device) * 2 - 1) * math.radians(max_degrees)
+    cos, sin = theta.cos(), theta.sin()
+    zero = torch.zeros_like(theta)
+    affine = torch.stack([torch.stack([cos, -sin, zero], 1), torch.stack([sin, cos, zero], 1)], 1)
+    grid = F.affine_grid(affine, list(x.shape), align_corners=False)
+    return F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
 
 # -----------------------------
-# 5. Training loop
+# 4. Training loop
 # -----------------------------
-num_epochs = 50
-
-for epoch in range(num_epochs):
-    model.train()
-    total_loss = 0
-    correct = 0
-    total = 0
-
-    for images, labels in train_loader:
-        images, labels = images.to(device), labels.to(device)
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
-        total_loss += loss.item()
-
-        _, preds = torch.max(outputs, 1)
-        correct += (preds == labels).sum().item()
-        total += labels.size(0)
-
-    train_acc = 100 * correct / total
-
-    # Validation accuracy
+def evaluate(model, loader, device):
+    """Accuracy (%) over a loader, without augmentation. Counts stay on device until the end."""
     model.eval()
-    val_correct = 0
-    val_total = 0
+    correct = torch.zeros((), dtype=torch.long, device=device)
+    total = 0
     with torch.no_grad():
-        for images, labels in val_loader:
-            images, labels = images.to(device), labels.to(device)
+        for images, labels in loader:
+            images = to_input(images, device)
+            labels = labels.to(device, non_blocking=True)
             outputs = model(images)
-            _, preds = torch.max(outputs, 1)
-            val_correct += (preds == labels).sum().item()
-            val_total += labels.size(0)
-    val_acc = 100 * val_correct / val_total
-
-    print(f"Epoch [{epoch+1}/{num_epochs}] | "
-          f"Loss: {total_loss/len(train_loader):.4f} | "
-          f"Train Acc: {train_acc:.2f}% | Val Acc: {val_acc:.2f}%")
-
-# -----------------------------
-# 6. Save model
-# -----------------------------
-os.makedirs("models", exist_ok=True)
-torch.save(model.state_dict(), "models/emotion_cnn.pth")
-print("✅ Training complete. Model saved at models/emotion_cnn.pth")
+            correct += (outputs.argmax(1) == labels).sum()
+            total += labels.size(0)
+    return 100 * correct.item() / total
+
+
+def save_checkpoint(path, state):
+    tmp = f"{path}.tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)  # an interrupted save never clobbers the last good checkpoint
+
+
+def load_checkpoint(path, model, optimizer, device):
+    """Restores model, optimizer and RNG state; returns the checkpoint's bookkeeping."""
+    state = torch.load(path, map_location=device)
+    model.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    torch.set_rng_state(state["rng"]["torch"])
+    if torch.cuda.is_available() and state["rng"]["cuda"]:
+        torch.cuda.set_rng_state_all(state["rng"]["cuda"])
+    return state
+
+
+def fit(model, train_loader, val_loader, device, num_epochs, lr=0.001,
+        out=None, checkpoint=None, resume=False, patience=0):
+    """
+    Trains for up to num_epochs and returns the best validation accuracy.
+
+    - out: the best weights so far are saved here after every improving
+      epoch, and loaded back into `model` at the end.
+    - checkpoint: model, optimizer, RNG state and early-stopping bookkeeping,
+      written after every epoch. With resume=True training continues from it.
+    - patience: stop after this many epochs without a better validation
+      accuracy (0 = never).
+    """
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    start_epoch, best_acc, best_epoch = 0, -1.0, 0
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint, model, optimizer, device)
+        start_epoch, best_acc, best_epoch = state["epoch"] + 1, state["best_acc"], state["best_epoch"]
+        print(f"Resumed from {checkpoint} at epoch {start_epoch+1} (best Val Acc {best_acc:.2f}% at epoch {best_epoch+1})")
+
+    for epoch in range(start_epoch, num_epochs):
+        if patience and epoch - best_epoch > patience:
+            print(f"Early stopping: no Val Acc improvement for {patience} epochs (best {best_acc:.2f}% at epoch {best_epoch+1})")
+            break
+
+        model.train()
+        # Running sums stay on device: no per-batch .item() sync
+        loss_sum = torch.zeros((), device=device)
+        correct = torch.zeros((), dtype=torch.long, device=device)
+        total = 0
+        data_time = 0.0
+        t_epoch = time.perf_counter()
+
+        batches = iter(train_loader)
+        while True:
+            t_data = time.perf_counter()
+            batch = next(batches, None)
+            if batch is None:
+                break
+            images, labels = batch
+            images = augment(to_input(images, device))
+            labels = labels.to(device, non_blocking=True)
+            data_time += time.perf_counter() - t_data
+
+            optimizer.zero_grad()
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+            loss.backward()
+            optimizer.step()
+
+            loss_sum += loss.detach() * labels.size(0)
+            correct += (outputs.argmax(1) == labels).sum()
+            total += labels.size(0)
+
+        train_loss = loss_sum.item() / total  # first sync of the epoch: compute time includes queued GPU work
+        train_acc = 100 * correct.item() / total
+        train_time = time.perf_counter() - t_epoch
+
+        # Validation accuracy
+        t_val = time.perf_counter()
+        val_acc = evaluate(model, val_loader, device)
+        val_time = time.perf_counter() - t_val
+
+        improved = val_acc > best_acc
+        if improved:
+            best_acc, best_epoch = val_acc, epoch
+            if out:
+                os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+                save_checkpoint(out, model.state_dict())
+
+        print(f"Epoch [{epoch+1}/{num_epochs}] | "
+              f"Loss: {train_loss:.4f} | "
+              f"Train Acc: {train_acc:.2f}% | Val Acc: {val_acc:.2f}%{' *' if improved else ''} | "
+              f"{total / train_time:.0f} samples/s | "
+              f"data {data_time:.1f}s, compute {train_time - data_time:.1f}s, val {val_time:.1f}s")
+
+        if checkpoint:
+            save_checkpoint(checkpoint, {
+                "epoch": epoch,
+                "model": model.state_dict(),
+                "optimizer": optimizer.state_dict(),
+                "best_acc": best_acc,
+                "best_epoch": best_epoch,
+                "rng": {"torch": torch.get_rng_state(),
+                        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else []},
+            })
+
+    if out and os.path.exists(out):
+        model.load_state_dict(torch.load(out, map_location=device))
+    return best_acc
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default="packed/emotions", help="output of pack_dataset.py")
+    ap.add_argument("--epochs", type=int, default=50)
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--out", default="models/emotion_cnn.pth", help="best weights (by Val Acc)")
+    ap.add_argument("--ckpt", default="models/emotion_cnn.ckpt", help="per-epoch checkpoint for --resume")
+    ap.add_argument("--resume", action="store_true", help="continue from --ckpt if it exists")
+    ap.add_argument("--patience", type=int, default=10, help="early-stopping patience in epochs (0 = off)")
+    args = ap.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, "classes.json")):
+        raise SystemExit(f"{args.data} not found: run `python pack_dataset.py --src train_dataset --out {args.data}` first")
+
+    # -----------------------------
+    # 5. Device
+    # -----------------------------
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    classes = read_classes(args.data)
+    model = TinyCNN(num_classes=len(classes)).to(device)
+    print(f"Classes: {classes}")
+
+    train_loader = make_loader(PackedDataset(args.data, "train"), args.batch_size, True, args.workers, device)
+    val_loader = make_loader(PackedDataset(args.data, "val"), args.batch_size, False, args.workers, device)
+
+    # -----------------------------
+    # 6. Train (best model saved at --out as it improves)
+    # -----------------------------
+    best_acc = fit(model, train_loader, val_loader, device, args.epochs,
+                   out=args.out, checkpoint=args.ckpt, resume=args.resume, patience=args.patience)
+    print(f"✅ Training complete. Best model (Val Acc {best_acc:.2f}%) saved at {args.out}")
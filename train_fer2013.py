@@ -0,0 +1,151 @@
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+import torch
+
+from pack_dataset import IMG_SIZE, create_split, read_classes, write_classes
+from train_emotions import PackedDataset, TinyCNN, evaluate, fit, make_loader
+
+# -----------------------------
+# 1. FER2013 format
+# -----------------------------
+# fer2013.csv: emotion,pixels,Usage ; pixels = 2304 space-separated 0-255 values
+FER_CLASSES = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+USAGE_SPLITS = {"Training": "train", "PublicTest": "val", "PrivateTest": "test"}
+
+# --moods: keep only the emotions the server's 3-class model serves, in its
+# label order (src/controllers/fer_service.py: happy, sad, neutral).
+MOOD_CLASSES = ["happy", "sad", "neutral"]
+MOOD_MAP = {3: 0, 4: 1, 6: 2}
+
+CHUNK_ROWS = 4096
+PIXELS = IMG_SIZE * IMG_SIZE
+
+
+def _columns(header):
+    cols = [h.strip().lower() for h in header]
+    return cols.index("emotion"), cols.index("pixels"), cols.index("usage")
+
+
+def iter_chunks(csv_path, chunk_rows=CHUNK_ROWS):
+    """Yields (emotions int64 (n,), pixel strings [n], usages [n]) for up to chunk_rows rows at a time."""
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        e_col, p_col, u_col = _columns(next(reader))
+        emotions, pixels, usages = [], [], []
+        for row in reader:
+            if not row:
+                continue
+            emotions.append(int(row[e_col]))
+            pixels.append(row[p_col])
+            usages.append(row[u_col].strip())
+            if len(emotions) == chunk_rows:
+                yield np.array(emotions, dtype=np.int64), pixels, usages
+                emotions, pixels, usages = [], [], []
+        if emotions:
+            yield np.array(emotions, dtype=np.int64), pixels, usages
+
+
+def parse_pixels(pixel_strings):
+    """All of a chunk's pixel strings in one vectorized parse -> uint8 (n, 48, 48)."""
+    flat = np.fromstring(" ".join(pixel_strings), dtype=np.uint8, sep=" ")
+    if flat.size != len(pixel_strings) * PIXELS:
+        raise ValueError(f"expected {PIXELS} pixels per row, got {flat.size / max(1, len(pixel_strings)):.1f} on average")
+    return flat.reshape(-1, IMG_SIZE, IMG_SIZE)
+
+
+def map_labels(emotions, moods):
+    """(labels, keep mask): identity over the 7 classes, or MOOD_MAP with other emotions dropped."""
+    if not moods:
+        return emotions, np.ones(len(emotions), dtype=bool)
+    lut = np.full(len(FER_CLASSES), -1, dtype=np.int64)
+    for src, dst in MOOD_MAP.items():
+        lut[src] = dst
+    labels = lut[emotions]
+    return labels, labels >= 0
+
+
+# -----------------------------
+# 2. CSV -> packed train/val/test memmaps
+# -----------------------------
+def pack_fer2013(csv_path, out, moods=False, chunk_rows=CHUNK_ROWS):
+    """
+    Two streaming passes with bounded memory: the first sizes every split
+    (labels only), the second parses CHUNK_ROWS rows at a time and writes
+    them straight into the split memmaps.
+    """
+    t0 = time.time()
+    counts = {split: 0 for split in USAGE_SPLITS.values()}
+    for emotions, _, usages in iter_chunks(csv_path, chunk_rows):
+        _, keep = map_labels(emotions, moods)
+        for usage, k in zip(usages, keep):
+            if k and usage in USAGE_SPLITS:
+                counts[USAGE_SPLITS[usage]] += 1
+
+    splits = {split: create_split(out, split, n) for split, n in counts.items()}
+    offsets = {split: 0 for split in counts}
+    for emotions, pixel_strings, usages in iter_chunks(csv_path, chunk_rows):
+        images = parse_pixels(pixel_strings)
+        labels, keep = map_labels(emotions, moods)
+        usages = np.array(usages)
+        for usage, split in USAGE_SPLITS.items():
+            sel = keep & (usages == usage)
+            n = int(sel.sum())
+            if not n:
+                continue
+            dst_images, dst_labels = splits[split]
+            o = offsets[split]
+            dst_images[o:o + n] = images[sel]
+            dst_labels[o:o + n] = labels[sel]
+            offsets[split] = o + n
+
+    for images, labels in splits.values():
+        images.flush()
+        labels.flush()
+    write_classes(out, MOOD_CLASSES if moods else FER_CLASSES)
+    print(f"Packed {csv_path} into {out} in {time.time() - t0:.1f}s: "
+          + ", ".join(f"{split} {n}" for split, n in counts.items()))
+    return counts
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default="fer2013.csv")
+    ap.add_argument("--data", default=None, help="packed splits (default: packed/fer2013[-moods])")
+    ap.add_argument("--moods", action="store_true", help="map to the 3 served moods (3->happy, 4->sad, 6->neutral), drop the rest")
+    ap.add_argument("--repack", action="store_true", help="re-parse the CSV even if --data exists")
+    ap.add_argument("--epochs", type=int, default=50)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--out", default=None, help="best model path (default: models/fer2013[_moods]_cnn.pth)")
+    ap.add_argument("--resume", action="store_true", help="continue from the checkpoint next to --out")
+    ap.add_argument("--patience", type=int, default=10, help="early-stopping patience in epochs (0 = off)")
+    args = ap.parse_args()
+
+    suffix = "-moods" if args.moods else ""
+    data = args.data or f"packed/fer2013{suffix}"
+    out = args.out or f"models/fer2013{suffix.replace('-', '_')}_cnn.pth"
+
+    if args.repack or not os.path.exists(os.path.join(data, "classes.json")):
+        pack_fer2013(args.csv, data, moods=args.moods)
+
+    # -----------------------------
+    # 3. Train
+    # -----------------------------
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    classes = read_classes(data)
+    model = TinyCNN(num_classes=len(classes)).to(device)
+    print(f"Classes: {classes}")
+
+    train_loader = make_loader(PackedDataset(data, "train"), args.batch_size, True, args.workers, device)
+    val_loader = make_loader(PackedDataset(data, "val"), args.batch_size, False, args.workers, device)
+    test_loader = make_loader(PackedDataset(data, "test"), args.batch_size, False, args.workers, device)
+
+    # fit() leaves the best (by Val Acc) weights in the model and at `out`
+    fit(model, train_loader, val_loader, device, args.epochs, out=out,
+        checkpoint=os.path.splitext(out)[0] + ".ckpt", resume=args.resume, patience=args.patience)
+    print(f"Test Acc: {evaluate(model, test_loader, device):.2f}%")
+    print(f"✅ Training complete. Best model saved at {out}")